@@ -1,14 +1,20 @@
 from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
 import json
 import logging
+import threading
 from datetime import datetime
 import random
 
 # Import our services
+from app.core.config import settings
 from services.recommendation_engine import RecommendationEngine
 from services.data_processor import DataProcessor
+from services.model_artifacts import load_engine
+from services.model_holder import ModelHolder
+from services.sharding import ShardedModelHolder
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,7 +24,6 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Initialize services
-recommendation_engine = RecommendationEngine()
 data_processor = DataProcessor()
 
 # Mock data - in a real app, this would come from your database
@@ -96,8 +101,51 @@ MOCK_USER_PROFILES = [
     }
 ]
 
-# Train the recommendation engine with mock data
-recommendation_engine.train(MOCK_USER_PROFILES, MOCK_PRODUCTS)
+def _create_model_holder() -> Union[ModelHolder, ShardedModelHolder]:
+    if settings.RECOMMENDATION_SHARDS:
+        # Shard workers own the users; this process only routes requests to them
+        holder = ShardedModelHolder(
+            settings.RECOMMENDATION_SHARDS,
+            MOCK_USER_PROFILES,
+            MOCK_PRODUCTS,
+            artifact_dir=settings.MODEL_ARTIFACT_DIR
+        )
+        logger.info(f"Serving recommendations from {settings.RECOMMENDATION_SHARDS} shard workers")
+        return holder
+    # Map a prebuilt model artifact if configured, otherwise train on mock data
+    if settings.MODEL_ARTIFACT_DIR:
+        recommendation_engine = load_engine(settings.MODEL_ARTIFACT_DIR)
+        logger.info(f"Loaded recommendation model artifact from {settings.MODEL_ARTIFACT_DIR}")
+    else:
+        recommendation_engine = RecommendationEngine()
+        recommendation_engine.train(MOCK_USER_PROFILES, MOCK_PRODUCTS)
+    # Requests read model_holder.current once; retrains publish a new engine atomically
+    return ModelHolder(recommendation_engine)
+
+_model_holder: Optional[Union[ModelHolder, ShardedModelHolder]] = None
+_model_holder_lock = threading.Lock()
+
+def get_model_holder() -> Union[ModelHolder, ShardedModelHolder]:
+    """The process's model holder, created on first use (or by the app's startup hook).
+
+    Not created at import: spawned shard workers re-import the parent's
+    main module, which imports this one, so starting workers at import
+    would start them again in every worker.
+    """
+    global _model_holder
+    if _model_holder is None:
+        with _model_holder_lock:
+            if _model_holder is None:
+                _model_holder = _create_model_holder()
+    return _model_holder
+
+def close_model_holder():
+    """Stop shard workers, if any; the next request starts a fresh holder."""
+    global _model_holder
+    with _model_holder_lock:
+        holder, _model_holder = _model_holder, None
+    if isinstance(holder, ShardedModelHolder):
+        holder.close()
 
 class PersonalizationRequest(BaseModel):
     contentType: str
@@ -127,24 +175,33 @@ async def get_personalized_content(
         ab_group = random.choice(["A", "B"])
         logger.info(f"User {user_id} assigned to A/B group: {ab_group}")
         # --- Route to different strategies ---
+        # One snapshot serves the whole request even if a retrain publishes meanwhile
+        model_holder = await run_in_threadpool(get_model_holder)
+        recommendation_engine = model_holder.current
+        # Scoring (or waiting on a shard's pipe) blocks, so it runs off the event loop;
+        # concurrent requests then proceed in parallel, across shards when sharded
         if ab_group == "A":
-        recommendations = recommendation_engine.get_recommendations(
-            user_id=user_id if user_id.startswith("u") else None,
-            context=context,
-            n_recommendations=8
-        )
+            recommendations = await run_in_threadpool(
+                recommendation_engine.get_recommendations,
+                user_id=user_id if user_id.startswith("u") else None,
+                context=context,
+                n_recommendations=8,
+                budget_ms=settings.RECOMMENDATION_BUDGET_MS
+            )
             strategy_used = "collaborative_filtering"
         else:
             # Use matrix factorization recommender for group B
-            recommendations = recommendation_engine.get_recommendations(
+            recommendations = await run_in_threadpool(
+                recommendation_engine.get_recommendations,
                 user_id=user_id if user_id.startswith("u") else None,
                 context=context,
                 n_recommendations=8,
-                strategy="matrix_factorization"
+                strategy="matrix_factorization",
+                budget_ms=settings.RECOMMENDATION_BUDGET_MS
             )
             strategy_used = "matrix_factorization"
         # --- Log recommendations and group ---
-        logger.info(f"Recommendations for user {user_id} (group {ab_group}, strategy {strategy_used}): {recommendations['recommended_products']}")
+        logger.info(f"Recommendations for user {user_id} (group {ab_group}, strategy {strategy_used}, served by {recommendations.get('served_by')}): {recommendations['recommended_products']}")
         # ... existing code for response ...
         response = {
             "timestamp": datetime.utcnow().isoformat(),
@@ -152,6 +209,7 @@ async def get_personalized_content(
             "explanation": recommendations["explanation"],
             "ab_group": ab_group,
             "strategy_used": strategy_used,
+            "served_by": recommendations.get("served_by"),
             "content": {
                 "heroBanner": {
                     "title": "Welcome to Our Store",
@@ -212,14 +270,35 @@ async def track_event(request: Request):
         if event_data.get("event_type") == "conversion":
             logger.info(f"Conversion event detected for user {event_data.get('user_id')}, details: {event_data}")
             # Here you could update conversion stats, user profiles, etc.
+        # Fold product interactions into the MF model so the next request reflects them
+        user_id = event_data.get("user_id") or event_data.get("userId")
+        product_id = event_data.get("product_id") or (event_data.get("data") or {}).get("product_id")
+        if user_id and product_id:
+            model_holder = await run_in_threadpool(get_model_holder)
+            await run_in_threadpool(
+                model_holder.record_interaction,
+                user_id,
+                product_id,
+                event_data.get("event_type") or event_data.get("event")
+            )
         # In a real app, you would:
         # 1. Validate the event data
         # 2. Store it in your analytics database
-        # 3. Update user profiles in real-time (see below)
+        # 3. Update user profiles in real-time
         # 4. Trigger any relevant automations
-        # --- Real-time personalization note ---
-        # Future: update user profile in real-time here for instant personalization
         return {"status": "success", "message": "Event tracked successfully"}
     except Exception as e:
         logger.error(f"Error tracking event: {str(e)}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/api/models/reload")
+async def reload_models():
+    """Rebuild the recommendation engine in the background and swap it in when ready."""
+    model_holder = await run_in_threadpool(get_model_holder)
+    if settings.MODEL_ARTIFACT_DIR:
+        await run_in_threadpool(model_holder.reload, settings.MODEL_ARTIFACT_DIR)
+    else:
+        await run_in_threadpool(model_holder.retrain, MOCK_USER_PROFILES, MOCK_PRODUCTS)
+    # Sharded holders ask every worker for its version
+    current_version = await run_in_threadpool(lambda: model_holder.version)
+    return {"status": "accepted", "current_version": current_version}
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "E-Commerce Personalization API"
@@ -18,6 +18,13 @@ class Settings(BaseSettings):
     # Recommendation Settings
     RECOMMENDATION_LIMIT: int = 10
     SESSION_TIMEOUT: int = 1800  # 30 minutes in seconds
+    # Latency budget per recommendation call; slower strategies degrade to cheaper tiers
+    RECOMMENDATION_BUDGET_MS: Optional[float] = 50.0
+    # Directory written by services.model_artifacts.save_engine; workers map it instead of training
+    MODEL_ARTIFACT_DIR: Optional[str] = None
+    # >0 serves users from this many worker processes partitioned by user id hash
+    # (artifacts are then read from MODEL_ARTIFACT_DIR/shard-<i>)
+    RECOMMENDATION_SHARDS: int = 0
     
     class Config:
         case_sensitive = True
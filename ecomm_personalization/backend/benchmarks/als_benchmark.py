@@ -0,0 +1,53 @@
+"""
+Time ImplicitALSRecommender.fit on synthetic implicit-feedback data.
+
+Interactions follow a Zipf-like item popularity so the CSR rows look like
+real view logs. Prints end-to-end fit time (DataFrame and CSR build
+included) and the average time per ALS iteration.
+
+    python benchmarks/als_benchmark.py --interactions 1000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.recommendation_engine import ImplicitALSRecommender
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--interactions', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--factors', type=int, default=32)
+    parser.add_argument('--iterations', type=int, default=15)
+    parser.add_argument('--jobs', type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    popularity = 1.0 / np.arange(1, args.items + 1) ** 0.8
+    users = rng.integers(0, args.users, size=args.interactions)
+    items = rng.choice(args.items, size=args.interactions, p=popularity / popularity.sum())
+    interactions = [
+        {'user_id': f'u{u}', 'item_id': f'p{i}', 'rating': 1}
+        for u, i in zip(users.tolist(), items.tolist())
+    ]
+
+    model = ImplicitALSRecommender(factors=args.factors, iterations=args.iterations, n_jobs=args.jobs)
+    start = time.perf_counter()
+    model.fit(interactions)
+    elapsed = time.perf_counter() - start
+
+    print(f"interactions:  {args.interactions:,} ({model.user_items.nnz:,} unique pairs)")
+    print(f"matrix:        {model.user_items.shape[0]:,} users x {model.user_items.shape[1]:,} items")
+    print(f"factors:       {args.factors}, iterations: {args.iterations}, threads: {model.n_jobs}")
+    print(f"fit time:      {elapsed:.2f}s ({elapsed / args.iterations:.2f}s per iteration)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark the IVF inner-product index against exact MF scoring.
+
+Reports recall@N and p50/p99 query latency for several ``n_probe`` settings
+on synthetic item factors shaped like a trained SVD model.
+
+    python benchmarks/ann_benchmark.py --items 200000 --factors 100
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.ann_index import InnerProductIndex
+
+
+def exact_top_n(items: np.ndarray, query: np.ndarray, n: int) -> np.ndarray:
+    scores = items @ query
+    best = np.argpartition(-scores, n - 1)[:n]
+    return best[np.argsort(-scores[best])]
+
+
+def timed(fn, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--factors', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--n', type=int, default=10)
+    parser.add_argument('--lists', type=int, default=None)
+    parser.add_argument('--probes', type=int, nargs='+', default=[8, 16, 32, 64, 128])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # SVD factors are small and roughly Gaussian; the last column carries the item bias
+    items = rng.normal(scale=0.1, size=(args.items, args.factors + 1))
+    queries = np.hstack([
+        rng.normal(scale=0.1, size=(args.queries, args.factors)),
+        np.ones((args.queries, 1))
+    ])
+
+    start = time.perf_counter()
+    index = InnerProductIndex(n_lists=args.lists).fit(items)
+    print(f"Built {index.n_lists} lists over {args.items:,} items in {time.perf_counter() - start:.2f}s")
+
+    exact, exact_ms = timed(lambda q: exact_top_n(items, q, args.n), queries)
+    print(f"{'method':<14}{'recall@' + str(args.n):>10}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{np.percentile(exact_ms, 50):>10.3f}{np.percentile(exact_ms, 99):>10.3f}")
+
+    for n_probe in args.probes:
+        approx, approx_ms = timed(lambda q: index.search(q, args.n, n_probe=n_probe)[0], queries)
+        recall = np.mean([len(np.intersect1d(a, e)) / args.n for a, e in zip(approx, exact)])
+        print(f"{'ivf probe=' + str(n_probe):<14}{recall:>10.3f}"
+              f"{np.percentile(approx_ms, 50):>10.3f}{np.percentile(approx_ms, 99):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark get_recommendations_batch against a per-user get_recommendations loop.
+
+Trains an engine on synthetic profiles, then times both paths for the
+default (neighbour) strategy and for matrix factorization, and checks the
+results are identical.
+
+    python benchmarks/batch_benchmark.py --users 20000 --products 2000 --batch 5000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.recommendation_engine import RecommendationEngine
+
+
+def make_data(n_users, n_products, history, seed=0):
+    rng = np.random.default_rng(seed)
+    products = [{'id': f'p{i}', 'popularity': float(rng.random())} for i in range(n_products)]
+    # Zipf-like item popularity so neighbours share items
+    weights = 1.0 / np.arange(1, n_products + 1)
+    weights /= weights.sum()
+    profiles = [
+        {
+            'user_id': f'u{u}',
+            'total_sessions': int(rng.integers(1, 50)),
+            'total_page_views': int(rng.integers(0, 500)),
+            'total_purchases': int(rng.integers(0, 10)),
+            'conversion_rate': float(rng.random()),
+            'products_viewed': [f'p{i}' for i in rng.choice(n_products, history, replace=False, p=weights)]
+        }
+        for u in range(n_users)
+    ]
+    return profiles, products
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--history', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--n', type=int, default=10)
+    args = parser.parse_args()
+
+    profiles, products = make_data(args.users, args.products, args.history)
+    engine = RecommendationEngine(mf_top_k=0)
+    start = time.perf_counter()
+    engine.train(profiles, products)
+    print(f"train:        {time.perf_counter() - start:.2f}s ({args.users:,} users, {args.products:,} products)")
+
+    rng = np.random.default_rng(1)
+    user_ids = [f'u{u}' for u in rng.integers(0, args.users, args.batch)]
+    for strategy in [None, 'matrix_factorization']:
+        start = time.perf_counter()
+        loop = [engine.get_recommendations(u, n_recommendations=args.n, strategy=strategy) for u in user_ids]
+        loop_time = time.perf_counter() - start
+        start = time.perf_counter()
+        batch = engine.get_recommendations_batch(user_ids, n=args.n, strategy=strategy)
+        batch_time = time.perf_counter() - start
+        assert batch == loop, "batch results differ from the per-user loop"
+        print(f"{strategy or 'neighbours':<22} loop {1e6 * loop_time / args.batch:8.1f} us/user   "
+              f"batch {1e6 * batch_time / args.batch:8.1f} us/user   speedup {loop_time / batch_time:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark DataProcessor.load_data (chunked, column-pruned) against the
+original single ``pd.read_csv`` of every column with ``low_memory=False``.
+
+Writes a synthetic ``dataset1_final.csv`` with the export's free-text
+columns, then loads it once per mode in a fresh process and reports
+rows/sec and how far the load raised the process's peak resident memory.
+
+    python benchmarks/ingest_benchmark.py --rows 5000000 --chunksize 500000
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+
+
+def write_activity_csv(path, n_rows, n_users, seed=0, block=1000000):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2024-01-01T00:00:00')
+    for offset in range(0, n_rows, block):
+        n = min(block, n_rows - offset)
+        items = rng.integers(0, 50000, n)
+        pd.DataFrame({
+            'user_pseudo_id': np.char.add('u', rng.integers(0, n_users, n).astype(str)),
+            'event_timestamp': start + rng.integers(0, 30 * 86400, n).astype('timedelta64[s]'),
+            'event_name': rng.choice(['page_view', 'view_item', 'add_to_cart', 'purchase', 'scroll'], n),
+            'page_title': np.char.add('Product page ', items.astype(str)),
+            'page_location': np.char.add('https://shop.example.com/products/', items.astype(str)),
+            'device_category': rng.choice(['mobile', 'desktop', 'tablet'], n),
+            'country': rng.choice(['India', 'United States', 'Germany'], n),
+            'region': rng.choice(['Maharashtra', 'California', 'Bavaria', 'Karnataka'], n),
+            'city': rng.choice(['Mumbai', 'San Jose', 'Munich', 'Bengaluru'], n),
+            'source': rng.choice(['google', '(direct)', 'newsletter'], n),
+            'medium': rng.choice(['organic', '(none)', 'email'], n),
+            'campaign': rng.choice(['(organic)', 'spring_sale'], n),
+            'item_id': np.char.add('SKU', items.astype(str)),
+            'item_name': np.char.add('Item ', items.astype(str)),
+            'item_category': rng.choice(['Apparel', 'Electronics', 'Home'], n),
+            'page_type': rng.choice(['product', 'home', 'cart'], n),
+            'category': rng.choice(['Apparel', 'Electronics', 'Home'], n)
+        }).to_csv(path, mode='a' if offset else 'w', header=not offset, index=False)
+
+
+def peak_rss():
+    """Peak resident set size of this process in KiB.
+
+    Read from /proc (Linux) rather than ``ru_maxrss``, which a child
+    inherits from the parent that wrote the CSV.
+    """
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+
+
+def load(mode, data_dir, chunksize):
+    """Load the file in this process; prints rows, seconds, peak RSS growth and frame size."""
+    import data_processor
+    baseline = peak_rss()
+    start = time.perf_counter()
+    if mode == 'chunked':
+        processor = data_processor.DataProcessor(data_dir, models_dir=data_dir)
+        processor.load_data(chunksize=chunksize)
+        frame = processor.activity_df
+    else:
+        # The original loader: one read of every column
+        frame = pd.read_csv(Path(data_dir) / 'dataset1_final.csv', low_memory=False, parse_dates=['event_timestamp'])
+        frame['date'] = frame['event_timestamp'].dt.date
+        frame['hour'] = frame['event_timestamp'].dt.hour
+        frame['time_of_day'] = frame['hour'].apply(data_processor.get_time_of_day)
+    elapsed = time.perf_counter() - start
+    peak = (peak_rss() - baseline) / 1024
+    print(f"{len(frame)} {elapsed} {peak} {frame.memory_usage(deep=True).sum() / 2**20}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000000)
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--chunksize', type=int, default=500000)
+    parser.add_argument('--mode', choices=['single', 'chunked'])
+    parser.add_argument('--data-dir')
+    args = parser.parse_args()
+
+    if args.mode:
+        load(args.mode, args.data_dir, args.chunksize)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        write_activity_csv(Path(tmp) / 'dataset1_final.csv', args.rows, args.users)
+        size = (Path(tmp) / 'dataset1_final.csv').stat().st_size / 2**20
+        print(f"write:        {time.perf_counter() - start:7.2f}s ({args.rows:,} rows, {size:,.0f} MiB)")
+        for mode in ['single', 'chunked']:
+            # A fresh process per mode so peak RSS is not shared; cwd keeps the log file out of the tree
+            output = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), '--mode', mode, '--data-dir', tmp,
+                 '--chunksize', str(args.chunksize)],
+                cwd=tmp, capture_output=True, text=True, check=True
+            ).stdout.split()
+            rows, elapsed, peak, frame_size = int(output[0]), float(output[1]), float(output[2]), float(output[3])
+            print(f"{mode + ':':13} {elapsed:7.2f}s ({rows / elapsed:,.0f} rows/sec, peak RSS +{peak:,.0f} MiB, "
+                  f"frame {frame_size:,.0f} MiB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare float64, float32 and int8 storage for the engine's dense matrices.
+
+Trains one engine per storage mode on the same synthetic profiles and
+reports the resident bytes of the matrices MF serving reads (factors,
+biases and ANN list vectors), plus recall@n of MF recommendations (full
+scan and ANN with exact re-rank) against the float64 engine.
+
+    python benchmarks/quantization_benchmark.py --users 20000 --products 5000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batch_benchmark import make_data
+from services.quantization import STORAGE_MODES
+from services.recommendation_engine import RecommendationEngine
+
+
+def model_bytes(engine):
+    mf = engine.mf_model
+    sizes = {
+        'user_factors': mf.user_factors.nbytes,
+        'item_factors': mf.item_factors.nbytes,
+        'biases': sum(b.nbytes for b in (mf.user_bias, mf.item_bias) if b is not None),
+        'ann_index': mf.ann_index[1].nbytes if mf.ann_index is not None else 0
+    }
+    sizes['total'] = sum(sizes.values())
+    return sizes
+
+
+def recall(reference, results, n):
+    return float(np.mean([len(set(a) & set(b)) / n for a, b in zip(reference, results)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--history', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--n-probe', type=int, default=8)
+    parser.add_argument('--n', type=int, default=10)
+    args = parser.parse_args()
+
+    profiles, products = make_data(args.users, args.products, args.history)
+    rng = np.random.default_rng(1)
+    user_ids = [f'u{u}' for u in rng.choice(args.users, args.queries, replace=False)]
+
+    reference = None
+    for storage in STORAGE_MODES:
+        engine = RecommendationEngine(mf_top_k=0, ann_n_probe=args.n_probe, ann_min_items=0, storage=storage)
+        engine.train(profiles, products)
+        mf = engine.mf_model
+        item_ids = list(engine.product_features.keys())
+
+        start = time.perf_counter()
+        exact = mf.recommend_batch(user_ids, item_ids, n=args.n)
+        scan_time = time.perf_counter() - start
+        start = time.perf_counter()
+        approximate = [mf.recommend_approximate(u, n=args.n) for u in user_ids]
+        ann_time = time.perf_counter() - start
+
+        sizes = model_bytes(engine)
+        if reference is None:
+            reference = (exact, approximate, sizes)
+        print(f"{storage:<8} " + "  ".join(f"{name} {size / 1e6:6.2f}MB" for name, size in sizes.items()))
+        print(f"{'':<8} memory {reference[2]['total'] / sizes['total']:4.1f}x smaller   "
+              f"recall@{args.n} scan {recall(reference[0], exact, args.n):.4f} "
+              f"({1e6 * scan_time / args.queries:6.1f} us/user)   "
+              f"ann {recall(reference[1], approximate, args.n):.4f} "
+              f"({1e6 * ann_time / args.queries:6.1f} us/user)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+Benchmark DataProcessor.extract_session_features and create_user_profiles
+against the original per-session / per-user loops.
+
+Generates a synthetic event log, sessionizes it (reporting the memory the
+dictionary-encoded activity columns save), and times the vectorized
+session aggregation on all of it. The sessionization kernel is compared
+with the original groupby ``diff``/``cumsum`` on the same events. Profiles are timed on synthetic session
+features for ``--profile-users`` users. The original loops (kept here as
+references) run on small subsets only and the results are checked to be
+identical. The streaming sessionizer is timed over the same log fed in
+time-ordered chunks, reporting throughput and the peak open-session count.
+With ``--jobs`` above 1, features and profiles are also built over
+user-hash partitions in that many worker processes and checked against
+the single-process results. Finally a ``--batch-sessions`` batch is
+folded into a ``ProfileStore`` holding the profile sessions, compared
+with recomputing every profile.
+
+    python benchmarks/session_benchmark.py --events 3000000 --profile-users 1000000
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.data_processor import DataProcessor, sessionize
+from services.profile_aggregates import ProfileStore
+from services.sessionizer import StreamingSessionizer
+
+
+def make_events(n_events, n_users, n_products, days=1, seed=0):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2024-01-01T00:00:00')
+    products = np.array([f'p{i}' for i in range(n_products)], dtype=object)
+    return pd.DataFrame({
+        'user_id': np.array([f'u{u}' for u in range(n_users)], dtype=object)[rng.integers(0, n_users, n_events)],
+        'timestamp': start + rng.integers(0, days * 86400, n_events).astype('timedelta64[s]'),
+        'action_type': rng.choice(['page_view', 'product_view', 'add_to_cart', 'purchase', 'search'], n_events,
+                                  p=[0.5, 0.3, 0.1, 0.03, 0.07]),
+        'device_type': rng.choice(['mobile', 'desktop', 'tablet'], n_events, p=[0.6, 0.3, 0.1]),
+        'product_id': np.where(rng.random(n_events) < 0.5, products[rng.integers(0, n_products, n_events)], None),
+        'category': np.where(rng.random(n_events) < 0.5, rng.choice(['electronics', 'home', 'sports'], n_events), None)
+    })
+
+
+def reference_sessionize(events, session_timeout):
+    """The original groupby sessionization."""
+    df = events.sort_values(['user_id', 'timestamp'])
+    time_diff = df.groupby('user_id')['timestamp'].diff()
+    return df.index.to_numpy(), ((time_diff.isna()) | (time_diff > session_timeout)).cumsum().to_numpy()
+
+
+def reference_session_features(session_data):
+    """The original per-session loop."""
+    features = []
+    for session_id, session in session_data.groupby('session_id'):
+        session_features = {
+            'session_id': session_id,
+            'user_id': session['user_id'].iloc[0],
+            'start_time': session['timestamp'].min(),
+            'end_time': session['timestamp'].max(),
+            'duration_seconds': (session['timestamp'].max() - session['timestamp'].min()).total_seconds(),
+            'num_actions': len(session),
+            'page_views': (session['action_type'] == 'page_view').sum(),
+            'product_views': (session['action_type'] == 'product_view').sum(),
+            'add_to_cart': (session['action_type'] == 'add_to_cart').sum(),
+            'purchase': (session['action_type'] == 'purchase').sum(),
+            'devices_used': session['device_type'].nunique(),
+            'unique_products_viewed': session[session['product_id'].notna()]['product_id'].nunique(),
+            'categories_viewed': session[session['category'].notna()]['category'].nunique(),
+            'products_viewed': session[session['product_id'].notna()]['product_id'].tolist(),
+            'categories': session[session['category'].notna()]['category'].tolist()
+        }
+        features.append(session_features)
+    return pd.DataFrame(features)
+
+
+def make_session_features(n_users, sessions_per_user, seed=0):
+    rng = np.random.default_rng(seed)
+    n_sessions = n_users * sessions_per_user
+    start = np.datetime64('2024-01-01T00:00:00') + rng.integers(0, 30 * 86400, n_sessions).astype('timedelta64[s]')
+    duration = rng.integers(0, 3600, n_sessions)
+    categories = np.array(['electronics', 'home', 'sports', 'beauty', 'fashion'], dtype=object)
+    lengths = rng.integers(0, 5, n_sessions)
+    products = rng.integers(0, 20000, lengths.sum())
+    bounds = np.cumsum(lengths).tolist()
+    starts = [0] + bounds[:-1]
+    product_ids = [f'p{p}' for p in products.tolist()]
+    category_ids = categories[products % 5].tolist()
+    return pd.DataFrame({
+        'session_id': np.arange(n_sessions),
+        'user_id': np.array([f'u{u}' for u in range(n_users)], dtype=object)[rng.integers(0, n_users, n_sessions)],
+        'start_time': start,
+        'end_time': start + duration.astype('timedelta64[s]'),
+        'duration_seconds': duration.astype(np.float64),
+        'num_actions': lengths + 1,
+        'page_views': rng.integers(0, 5, n_sessions),
+        'product_views': lengths,
+        'add_to_cart': rng.integers(0, 2, n_sessions),
+        'purchase': rng.integers(0, 2, n_sessions),
+        'devices_used': np.ones(n_sessions, dtype=np.int64),
+        'unique_products_viewed': lengths,
+        'categories_viewed': lengths,
+        'products_viewed': [product_ids[a:b] for a, b in zip(starts, bounds)],
+        'categories': [category_ids[a:b] for a, b in zip(starts, bounds)]
+    })
+
+
+def reference_user_profiles(sessions_df):
+    """The original per-user loop."""
+    user_profiles = []
+    for user_id, user_sessions in sessions_df.groupby('user_id'):
+        profile = {
+            'user_id': user_id,
+            'first_seen': user_sessions['start_time'].min(),
+            'last_seen': user_sessions['end_time'].max(),
+            'total_sessions': len(user_sessions),
+            'total_duration_seconds': user_sessions['duration_seconds'].sum(),
+            'avg_session_duration': user_sessions['duration_seconds'].mean(),
+            'total_page_views': user_sessions['page_views'].sum(),
+            'total_product_views': user_sessions['product_views'].sum(),
+            'total_add_to_cart': user_sessions['add_to_cart'].sum(),
+            'total_purchases': user_sessions['purchase'].sum(),
+            'conversion_rate': user_sessions['purchase'].sum() / len(user_sessions),
+            'unique_products_viewed': len(set(p for sublist in user_sessions['products_viewed'].dropna() for p in sublist)),
+            'unique_categories_viewed': len(set(c for sublist in user_sessions['categories'].dropna() for c in sublist))
+        }
+        category_counts = {}
+        for categories in user_sessions['categories'].dropna():
+            for category in categories:
+                category_counts[category] = category_counts.get(category, 0) + 1
+        if category_counts:
+            profile['top_categories'] = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:3]
+        user_profiles.append(profile)
+    return pd.DataFrame(user_profiles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=3000000)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--reference-events', type=int, default=30000)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--profile-users', type=int, default=1000000)
+    parser.add_argument('--sessions-per-user', type=int, default=5)
+    parser.add_argument('--reference-users', type=int, default=10000)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-sessions', type=int, default=10000)
+    args = parser.parse_args()
+
+    processor = DataProcessor()
+    events = make_events(args.events, args.users, args.products, args.days)
+    start = time.perf_counter()
+    sessions = processor.process_user_activity(events.to_dict('records'))
+    print(f"sessionize:   {time.perf_counter() - start:7.2f}s ({len(events):,} events)")
+    columns = [column for column in DataProcessor.CATEGORICAL_COLUMNS if column in sessions.columns]
+    encoded = sessions[columns].memory_usage(deep=True, index=False).sum()
+    plain = sessions[columns].astype(object).memory_usage(deep=True, index=False).sum()
+    print(f"categorical:  {plain / 2**20:7.1f} MiB as strings, {encoded / 2**20:.1f} MiB encoded "
+          f"({plain / encoded:.1f}x, {', '.join(columns)})")
+
+    start = time.perf_counter()
+    order, session_ids = reference_sessionize(events, processor.session_timeout)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    kernel_order, _, _, kernel_ids = sessionize(events['user_id'], events['timestamp'], processor.session_timeout,
+                                                first_session_id=1)
+    kernel_time = time.perf_counter() - start
+    assert np.array_equal(order, kernel_order) and np.array_equal(session_ids, kernel_ids)
+    print(f"kernel:       groupby {loop_time:6.2f}s   kernel {kernel_time:6.2f}s   "
+          f"speedup {loop_time / kernel_time:6.1f}x ({session_ids[-1]:,} sessions)")
+
+    start = time.perf_counter()
+    features = processor.extract_session_features(sessions)
+    elapsed = time.perf_counter() - start
+    print(f"vectorized:   {elapsed:7.2f}s ({len(features):,} sessions, {len(sessions) / elapsed:,.0f} events/s)")
+
+    subset = processor.process_user_activity(events.iloc[:args.reference_events].to_dict('records'))
+    start = time.perf_counter()
+    expected = reference_session_features(subset)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = processor.extract_session_features(subset)
+    vector_time = time.perf_counter() - start
+    pd.testing.assert_frame_equal(actual, expected)
+    print(f"reference:    loop {loop_time:7.2f}s   vectorized {vector_time:6.3f}s   "
+          f"speedup {loop_time / vector_time:6.1f}x ({len(subset):,} events)")
+
+    if args.jobs > 1:
+        profiles = processor.create_user_profiles(features)
+        start = time.perf_counter()
+        parallel_features, parallel_profiles = processor._process_partitions(sessions, args.jobs, None)
+        elapsed = time.perf_counter() - start
+        pd.testing.assert_frame_equal(parallel_features, features)
+        pd.testing.assert_frame_equal(parallel_profiles, profiles)
+        print(f"parallel:     {elapsed:7.2f}s ({args.jobs} workers, {len(sessions) / elapsed:,.0f} events/s, "
+              f"features and profiles)")
+
+    sessionizer = StreamingSessionizer(processor.session_timeout)
+    ordered = events.sort_values('timestamp', kind='stable')
+    start = time.perf_counter()
+    n_sessions = peak = 0
+    for offset in range(0, len(ordered), args.chunk_size):
+        n_sessions += len(sessionizer.process(ordered.iloc[offset:offset + args.chunk_size]))
+        peak = max(peak, len(sessionizer.open_sessions))
+    n_sessions += len(sessionizer.flush())
+    elapsed = time.perf_counter() - start
+    print(f"streaming:    {elapsed:7.2f}s ({n_sessions:,} sessions, {len(ordered) / elapsed:,.0f} events/s, "
+          f"peak {peak:,} open users)")
+
+    session_features = make_session_features(args.profile_users, args.sessions_per_user)
+    start = time.perf_counter()
+    profiles = processor.create_user_profiles(session_features)
+    elapsed = time.perf_counter() - start
+    print(f"profiles:     {elapsed:7.2f}s ({len(profiles):,} users, {len(session_features):,} sessions)")
+
+    subset = make_session_features(args.reference_users, args.sessions_per_user, seed=1)
+    start = time.perf_counter()
+    expected = reference_user_profiles(subset)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = processor.create_user_profiles(subset)
+    vector_time = time.perf_counter() - start
+    pd.testing.assert_frame_equal(actual, expected)
+    print(f"reference:    loop {loop_time:7.2f}s   vectorized {vector_time:6.3f}s   "
+          f"speedup {loop_time / vector_time:6.1f}x ({len(subset):,} sessions)")
+
+    store = ProfileStore()
+    start = time.perf_counter()
+    store.update(session_features)
+    print(f"store:        {time.perf_counter() - start:7.2f}s ({len(store):,} users folded from scratch)")
+    batch = make_session_features(args.profile_users, 1, seed=2).iloc[:args.batch_sessions]
+    batch['start_time'] += np.timedelta64(30, 'D')
+    batch['end_time'] += np.timedelta64(30, 'D')
+    start = time.perf_counter()
+    touched = store.update(batch)
+    fold_time = time.perf_counter() - start
+    everything = pd.concat([session_features, batch], ignore_index=True)
+    start = time.perf_counter()
+    expected = processor.create_user_profiles(everything)
+    full_time = time.perf_counter() - start
+    expected = expected[expected['user_id'].isin(touched)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(store.profiles(touched), expected)
+    print(f"incremental:  fold {fold_time:6.3f}s   recompute {full_time:6.2f}s   "
+          f"speedup {full_time / fold_time:6.1f}x ({len(batch):,} new sessions, {len(touched):,} users)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import logging
+import time
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Union, Tuple, Any
@@ -26,30 +27,125 @@ except ImportError:
     logger.warning("scikit-learn not available. Some features will be disabled.")
     SKLEARN_AVAILABLE = False
 
+def get_time_of_day(hour):
+    """Categorize time of day"""
+    if 5 <= hour < 12:
+        return 'morning'
+    elif 12 <= hour < 17:
+        return 'afternoon'
+    elif 17 <= hour < 22:
+        return 'evening'
+    else:
+        return 'night'
+
+TIME_OF_DAY = ['morning', 'afternoon', 'evening', 'night']
+# Time-of-day code for each hour 0-23
+TIME_OF_DAY_CODES = np.array([TIME_OF_DAY.index(get_time_of_day(hour)) for hour in range(24)], dtype=np.int8)
+
+def _aggregate_sessions(activity_df: pd.DataFrame) -> pd.DataFrame:
+    """Session-level rows of sessionized activity, one per (user, session_id)."""
+    # Like the groupby below, skip events without a user
+    activity_df = activity_df[activity_df['user_pseudo_id'].notna()]
+    session_data = activity_df.groupby(['user_pseudo_id', 'session_id']).agg({
+        'event_timestamp': ['min', 'max', 'count'],
+        'hour': 'first',
+        'region': 'first',
+        'country': 'first',
+        'source': 'first',
+        'page_type': 'first',
+        'category': 'first'
+    }).reset_index()
+    
+    # Flatten column names
+    session_data.columns = ['_'.join(col).strip('_') for col in session_data.columns.values]
+    session_data = session_data.rename(columns={
+        'event_timestamp_min': 'session_start',
+        'event_timestamp_max': 'session_end',
+        'event_timestamp_count': 'events_count',
+        'hour_first': 'hour',
+        'region_first': 'region',
+        'country_first': 'country',
+        'source_first': 'source',
+        'page_type_first': 'page_type',
+        'category_first': 'category'
+    })
+    
+    # Calculate session duration in minutes
+    session_data['session_duration'] = (session_data['session_end'] - session_data['session_start']).dt.total_seconds() / 60
+    
+    # Session ids increase in (user, time) order, so sorted codes follow the groupby's session order
+    codes, _ = pd.factorize(activity_df['session_id'], sort=True)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.cumsum(np.bincount(codes)).tolist()
+    events = activity_df['event_name']
+    if not isinstance(events.dtype, pd.CategoricalDtype):
+        events = events.astype('category')
+    names = events.to_numpy(dtype=object)[order].tolist()
+    session_data.insert(5, 'events_sequence', [names[start:end] for start, end in zip([0] + bounds[:-1], bounds)])
+    
+    # Categorize sessions by matching each event name once, then counting codes per session
+    labels = events.cat.categories.astype(str).str.lower()
+    event_codes = events.cat.codes.to_numpy()
+
+    def seen(name):
+        # Code -1 (missing event name) indexes the trailing False
+        matches = np.append(labels.str.contains(name, regex=False), False)[event_codes]
+        return np.bincount(codes, weights=matches, minlength=len(session_data)) > 0
+
+    purchase, added, removed, viewed = (seen(name) for name in ('purchase', 'add_to_cart', 'remove_from_cart', 'view'))
+    session_data['session_type'] = np.select(
+        [purchase, added & removed, added, viewed],
+        ['purchase', 'cart_abandoned', 'cart_added', 'browsing'],
+        'other'
+    ).astype(object)
+    
+    return session_data
+
+
 class DataProcessor:
     """
     A class for processing e-commerce user activity and transaction data
     to create user segments and provide personalized recommendations.
     """
+    # Low-cardinality columns loaded as ``category`` over the shared vocabulary
+    ACTIVITY_CATEGORICAL_COLUMNS = (
+        'event_name', 'device_category', 'country', 'region', 'city',
+        'source', 'medium', 'campaign', 'item_category'
+    )
+    TRANSACTION_CATEGORICAL_COLUMNS = ('ItemCategory', 'Item_brand', 'Item_variant')
+    # Columns read from the CSVs; free-text columns the pipeline never uses are skipped
+    ACTIVITY_COLUMNS = ('user_pseudo_id', 'event_timestamp', 'page_type', 'category') + ACTIVITY_CATEGORICAL_COLUMNS
+    TRANSACTION_COLUMNS = (
+        'Transaction_ID', 'Transaction_date', 'ItemName', 'Item_revenue', 'Item_quantity', 'Item_purchase_quantity'
+    ) + TRANSACTION_CATEGORICAL_COLUMNS
     
-    def __init__(self, data_dir: Optional[Union[str, Path]] = None):
+    def __init__(self, data_dir: Optional[Union[str, Path]] = None,
+                 models_dir: Optional[Union[str, Path]] = None):
         """
         Initialize the DataProcessor.
         
         Args:
             data_dir: Directory containing input data files. If None, uses 'data' subdirectory.
+            models_dir: Directory for the vocabulary and cold start models. If None, uses 'models' subdirectory.
         """
         self.base_dir = Path(__file__).parent
         self.data_dir = Path(data_dir) if data_dir else self.base_dir / 'data'
+        self.models_dir = Path(models_dir) if models_dir else self.base_dir / 'models'
         
         # Ensure data directory exists
         self.data_dir.mkdir(parents=True, exist_ok=True)
         
+        # Category vocabulary shared across runs, so category codes stay stable
+        from services.vocabulary import Vocabulary
+        self.vocabulary_path = self.models_dir / 'vocabulary.json'
+        self.vocabulary = Vocabulary.load(self.vocabulary_path) if self.vocabulary_path.exists() else Vocabulary()
+        
         # Initialize data attributes
         self.user_sessions: Optional[pd.DataFrame] = None
         self.user_segments: Optional[pd.DataFrame] = None
         self.transaction_df: Optional[pd.DataFrame] = None
         self.knn_model: Optional[Any] = None
+        self.scaler: Optional[Any] = None
         self.cluster_stats: Optional[pd.DataFrame] = None
         
         logger.info(f"DataProcessor initialized with data directory: {self.data_dir}")
@@ -57,10 +153,21 @@ class DataProcessor:
         self.user_sessions = None
         self.user_segments = None
         
-    def load_data(self) -> 'DataProcessor':
+    def load_data(self, chunksize: int = 500_000) -> 'DataProcessor':
         """
         Load and preprocess the raw datasets.
         
+        Both files are streamed ``chunksize`` rows at a time, reading only the
+        columns the pipeline uses; each chunk is typed, dictionary-encoded
+        and given its time features before the next one is read. The
+        compact chunks are kept until the end and joined one column at a
+        time, so peak memory is about the compact result plus one chunk's
+        parse buffers and one column held twice (not the raw file, and not
+        two copies of the result).
+        
+        Args:
+            chunksize: Rows parsed per chunk
+        
         Returns:
             DataProcessor: The current instance for method chaining
             
@@ -79,27 +186,19 @@ class DataProcessor:
             raise FileNotFoundError(f"Activity data file not found: {activity_file}")
             
         logger.info(f"Loading activity data from {activity_file}")
-        self.activity_df = pd.read_csv(
+        self.activity_df = self._read_csv_chunked(
             activity_file,
-            low_memory=False,
+            columns=self.ACTIVITY_COLUMNS,
             dtype={
                 'user_pseudo_id': str,
-                'event_name': str,
-                'page_title': str,
-                'page_location': str,
-                'device_category': str,
-                'country': str,
-                'region': str,
-                'city': str,
-                'source': str,
-                'medium': str,
-                'campaign': str,
-                'item_id': str,
-                'item_name': str,
-                'item_category': str
+                'page_type': str,
+                'category': str,
+                **dict.fromkeys(self.ACTIVITY_CATEGORICAL_COLUMNS, 'category')
             },
-            parse_dates=['event_timestamp'],
-            infer_datetime_format=True
+            date_column='event_timestamp',
+            categorical_columns=self.ACTIVITY_CATEGORICAL_COLUMNS + ('time_of_day',),
+            chunksize=chunksize,
+            transform=self._add_time_features
         )
         
         if self.activity_df.empty:
@@ -110,21 +209,20 @@ class DataProcessor:
         # Load transaction data if available
         if transaction_file.exists():
             logger.info(f"Loading transaction data from {transaction_file}")
-            self.transaction_df = pd.read_csv(
+            self.transaction_df = self._read_csv_chunked(
                 transaction_file,
-                low_memory=False,
+                columns=self.TRANSACTION_COLUMNS,
                 dtype={
                     'Transaction_ID': str,
                     'ItemName': str,
-                    'ItemCategory': str,
-                    'Item_brand': str,
-                    'Item_variant': str,
                     'Item_revenue': float,
                     'Item_quantity': int,
-                    'Item_purchase_quantity': int
+                    'Item_purchase_quantity': int,
+                    **dict.fromkeys(self.TRANSACTION_CATEGORICAL_COLUMNS, 'category')
                 },
-                parse_dates=['Transaction_date'],
-                infer_datetime_format=True
+                date_column='Transaction_date',
+                categorical_columns=self.TRANSACTION_CATEGORICAL_COLUMNS,
+                chunksize=chunksize
             )
             
             if not self.transaction_df.empty:
@@ -133,87 +231,114 @@ class DataProcessor:
                 logger.warning("Transaction data file is empty")
         else:
             logger.warning(f"No transaction data found at {transaction_file}")
-            
-        # Extract date and time features
-        self.activity_df['date'] = self.activity_df['event_timestamp'].dt.date
-        self.activity_df['hour'] = self.activity_df['event_timestamp'].dt.hour
-        
-        # Categorize time of day
-        def get_time_of_day(hour):
-            if 5 <= hour < 12:
-                return 'morning'
-            elif 12 <= hour < 17:
-                return 'afternoon'
-            elif 17 <= hour < 22:
-                return 'evening'
-            else:
-                return 'night'
-                
-        self.activity_df['time_of_day'] = self.activity_df['hour'].apply(get_time_of_day)
+        
+        # Keep the vocabulary for the next run, so category codes stay stable
+        self.vocabulary.save(self.vocabulary_path)
         
         return self
     
-    def create_user_sessions(self, session_timeout=30):
-        """Create user sessions by grouping events"""
+    def _read_csv_chunked(self, path: Path, columns: Tuple[str, ...], dtype: Dict[str, Any], date_column: str,
+                          categorical_columns: Tuple[str, ...], chunksize: int, transform=None) -> pd.DataFrame:
+        """
+        Stream a CSV into one compact DataFrame, logging throughput per chunk.
+        
+        Only ``columns`` that exist in the file are parsed. Categorical
+        columns are encoded over the shared vocabulary chunk by chunk, and
+        ``transform`` derives extra columns in place. Chunks are held until
+        the file is read, then concatenated column by column, each column
+        dropped from the chunks as it is copied.
+        """
+        wanted = set(columns)
+        chunks = []
+        rows = 0
+        start = time.perf_counter()
+        reader = pd.read_csv(
+            path,
+            usecols=lambda column: column in wanted,
+            dtype=dtype,
+            parse_dates=[date_column],
+            chunksize=chunksize
+        )
+        for chunk in reader:
+            if transform is not None:
+                transform(chunk)
+            self.vocabulary.encode_frame(chunk, categorical_columns)
+            chunks.append(chunk)
+            rows += len(chunk)
+            elapsed = time.perf_counter() - start
+            logger.info(f"{path.name}: {rows:,} rows ({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+        if not chunks:
+            return pd.DataFrame()
+        
+        # Concatenate one column at a time, dropping it from the chunks as it is
+        # copied, so only one column is ever held twice
+        data = {}
+        for column in list(chunks[0].columns):
+            parts = [chunk.pop(column) for chunk in chunks]
+            if column in categorical_columns:
+                # Chunks encoded before the vocabulary last grew get the final categories (codes are unchanged)
+                data[column] = pd.Categorical.from_codes(
+                    np.concatenate([part.cat.codes.to_numpy() for part in parts]),
+                    dtype=self.vocabulary.dtype(column)
+                )
+            else:
+                data[column] = pd.concat(parts, ignore_index=True)
+            del parts
+        chunks.clear()
+        frame = pd.DataFrame(data, copy=False)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Read {rows:,} rows from {path.name} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+        return frame
+    
+    @staticmethod
+    def _add_time_features(chunk: pd.DataFrame):
+        """Extract date and time features"""
+        chunk['date'] = chunk['event_timestamp'].dt.date
+        chunk['hour'] = chunk['event_timestamp'].dt.hour
+        
+        # Categorize time of day by looking the hour up; a missing hour is hour 0
+        # ('night'), as get_time_of_day(nan) falls through to it
+        hours = np.nan_to_num(chunk['hour'].to_numpy(dtype=np.float64), nan=0).astype(np.int64)
+        chunk['time_of_day'] = pd.Categorical.from_codes(TIME_OF_DAY_CODES[hours], categories=TIME_OF_DAY)
+    
+    def create_user_sessions(self, session_timeout=30, n_jobs=1, n_partitions=None):
+        """Create user sessions by grouping events
+
+        With ``n_jobs`` > 1 the session-level aggregation runs in worker
+        processes over user-hash partitions of the events.
+        """
         print("\nCreating user sessions...")
         
-        # Sort by user and timestamp
-        self.activity_df = self.activity_df.sort_values(['user_pseudo_id', 'event_timestamp'])
+        # Sort by user and timestamp, splitting sessions in the same pass
+        from services.data_processor import sessionize
+        order, time_diff, new_session, session_ids = sessionize(
+            self.activity_df['user_pseudo_id'],
+            self.activity_df['event_timestamp'],
+            timedelta(minutes=session_timeout)
+        )
+        self.activity_df = self.activity_df.iloc[order]
         
-        # Calculate time difference between consecutive events
-        self.activity_df['time_diff'] = self.activity_df.groupby('user_pseudo_id')['event_timestamp'].diff().dt.total_seconds().fillna(0)
+        # Time difference between consecutive events of a user, in seconds
+        self.activity_df['time_diff'] = np.nan_to_num(time_diff / np.timedelta64(1, 's'))
         
-        # Identify new sessions (when time difference > session_timeout minutes)
-        self.activity_df['new_session'] = (self.activity_df['time_diff'] > session_timeout * 60).astype(int)
+        # New sessions start at a user's first event and after session_timeout minutes idle
+        self.activity_df['new_session'] = new_session.astype(int)
         
-        # Create session IDs
-        self.activity_df['session_id'] = self.activity_df.groupby('user_pseudo_id')['new_session'].cumsum()
+        # Session IDs are unique across users
+        self.activity_df['session_id'] = session_ids
         
         # Create session-level data
-        session_data = self.activity_df.groupby(['user_pseudo_id', 'session_id']).agg({
-            'event_timestamp': ['min', 'max', 'count'],
-            'event_name': lambda x: x.tolist(),
-            'hour': 'first',
-            'region': 'first',
-            'country': 'first',
-            'source': 'first',
-            'page_type': 'first',
-            'category': 'first'
-        }).reset_index()
-        
-        # Flatten column names
-        session_data.columns = ['_'.join(col).strip('_') for col in session_data.columns.values]
-        session_data = session_data.rename(columns={
-            'event_timestamp_min': 'session_start',
-            'event_timestamp_max': 'session_end',
-            'event_timestamp_count': 'events_count',
-            'event_name_<lambda>': 'events_sequence',
-            'hour_first': 'hour',
-            'region_first': 'region',
-            'country_first': 'country',
-            'source_first': 'source',
-            'page_type_first': 'page_type',
-            'category_first': 'category'
-        })
-        
-        # Calculate session duration in minutes
-        session_data['session_duration'] = (session_data['session_end'] - session_data['session_start']).dt.total_seconds() / 60
-        
-        # Categorize sessions based on available event names
-        def categorize_session(events):
-            events = [str(e).lower() for e in events if pd.notna(e)]
-            if any('purchase' in e for e in events):
-                return 'purchase'
-            elif any('add_to_cart' in e for e in events) and any('remove_from_cart' in e for e in events):
-                return 'cart_abandoned'
-            elif any('add_to_cart' in e for e in events):
-                return 'cart_added'
-            elif any('view' in e for e in events):
-                return 'browsing'
-            else:
-                return 'other'
-        
-        session_data['session_type'] = session_data['events_sequence'].apply(categorize_session)
+        if n_jobs > 1:
+            from services.parallel import map_partitions
+            partitions = map_partitions(
+                _aggregate_sessions, self.activity_df, 'user_pseudo_id', n_jobs, n_partitions,
+                columns=['user_pseudo_id', 'session_id', 'event_timestamp', 'event_name', 'hour',
+                         'region', 'country', 'source', 'page_type', 'category']
+            )
+            session_data = pd.concat(partitions, ignore_index=True).sort_values('session_id', kind='stable')
+            session_data = session_data.reset_index(drop=True)
+        else:
+            session_data = _aggregate_sessions(self.activity_df)
         
         self.user_sessions = session_data
         return self
@@ -396,14 +521,22 @@ class DataProcessor:
                                             metric='euclidean')
             self.knn_model.fit(features_scaled)
             
-            # Save the models and scaler
-            import joblib
-            models_dir = self.base_dir / 'models'
-            models_dir.mkdir(exist_ok=True)
+            self.scaler = scaler
             
-            joblib.dump(kmeans, models_dir / 'kmeans_model.pkl')
-            joblib.dump(scaler, models_dir / 'scaler.pkl')
-            joblib.dump(self.knn_model, models_dir / 'knn_model.pkl')
+            # Save the scaler and KNN points as a memory-mapped artifact
+            from services.model_artifacts import write_artifact
+            models_dir = self.models_dir
+            models_dir.mkdir(parents=True, exist_ok=True)
+            
+            write_artifact(models_dir / 'cold_start', {
+                'scaler/mean': scaler.mean_,
+                'scaler/var': scaler.var_,
+                'scaler/scale': scaler.scale_,
+                'knn/points': features_scaled
+            }, {
+                'n_samples_seen': int(np.max(scaler.n_samples_seen_)),
+                'n_neighbors': self.knn_model.n_neighbors
+            })
             
             # Calculate cluster statistics
             self.cluster_stats = self.user_segments.groupby('cluster').agg({
@@ -423,6 +556,47 @@ class DataProcessor:
         
         return self
     
+    def load_recommendation_model(self) -> bool:
+        """
+        Load the cold start models written by build_recommendation_model.
+        
+        Arrays are memory-mapped read-only, so processes loading the same
+        artifact share its pages instead of unpickling private copies.
+        Neighbour rows index the user segments, so these are read from
+        user_segments.csv (written by save_processed_data) when not
+        already in memory, and must match the artifact row for row.
+        
+        Returns:
+            bool: True if an artifact was found and loaded
+        """
+        from services.model_artifacts import read_artifact
+        artifact_dir = self.models_dir / 'cold_start'
+        if not (artifact_dir / 'manifest.json').exists():
+            return False
+            
+        arrays, metadata, _ = read_artifact(artifact_dir, mmap_mode='r')
+        segments_file = self.data_dir / 'user_segments.csv'
+        if self.user_segments is None and segments_file.exists():
+            self.user_segments = pd.read_csv(segments_file)
+        if self.user_segments is None or len(self.user_segments) != len(arrays['knn/points']):
+            logger.warning(f"User segments do not match the cold start model in {artifact_dir}")
+            return False
+        
+        scaler = StandardScaler()
+        scaler.mean_ = np.array(arrays['scaler/mean'])
+        scaler.var_ = np.array(arrays['scaler/var'])
+        scaler.scale_ = np.array(arrays['scaler/scale'])
+        scaler.n_features_in_ = len(scaler.mean_)
+        scaler.n_samples_seen_ = metadata['n_samples_seen']
+        self.scaler = scaler
+        self.knn_model = NearestNeighbors(n_neighbors=metadata['n_neighbors'], metric='euclidean')
+        self.knn_model.fit(arrays['knn/points'])
+        
+        stats_file = self.models_dir / 'cluster_stats.csv'
+        if stats_file.exists():
+            self.cluster_stats = pd.read_csv(stats_file)
+        return True
+    
     def get_cold_start_recommendations(self, user_features=None, user_context=None):
         """
         Get recommendations for cold start users
@@ -435,11 +609,6 @@ class DataProcessor:
             dict: Dictionary with recommendations and segment information
         """
         try:
-            import joblib
-            import os
-            
-            models_dir = self.base_dir / 'models'
-            
             # Default recommendations if no model is available
             default_recommendations = {
                 'top_categories': {'electronics': 1.0, 'clothing': 0.8, 'home': 0.6},
@@ -450,12 +619,15 @@ class DataProcessor:
                 'strategy': 'popularity_based'
             }
             
+            # Processes that did not build the model map the saved one
+            if user_features is not None and self.knn_model is None:
+                self.load_recommendation_model()
+            
             # If we have user features and a trained model
             if user_features is not None and hasattr(self, 'knn_model') and self.knn_model is not None:
                 try:
                     # Scale the features
-                    scaler = joblib.load(models_dir / 'scaler.pkl')
-                    user_features_scaled = scaler.transform([user_features])
+                    user_features_scaled = self.scaler.transform([user_features])
                     
                     # Find similar users
                     _, indices = self.knn_model.kneighbors(user_features_scaled)
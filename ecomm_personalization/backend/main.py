@@ -1,23 +1,33 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import uvicorn
 import logging
 from datetime import datetime
 from pathlib import Path
 
 # Import routers
-from app.api.personalize.route import router as personalize_router
+from app.api.personalize.route import router as personalize_router, get_model_holder, close_model_holder
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the recommendation models (and start shard workers) when serving starts, not at import
+    await run_in_threadpool(get_model_holder)
+    yield
+    close_model_holder()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="E-commerce Personalization API",
     description="API for personalized e-commerce recommendations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
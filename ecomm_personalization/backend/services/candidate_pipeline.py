@@ -0,0 +1,298 @@
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+
+
+def _category_names(top_categories) -> List[Any]:
+    """Names from a profile's ``top_categories``.
+
+    ``DataProcessor.create_user_profiles`` and ``ProfileStore`` emit
+    ``(category, count)`` pairs, best first, and NaN for users without
+    categories; plain name lists are accepted too.
+    """
+    if not isinstance(top_categories, (list, tuple, np.ndarray)):
+        return []
+    return [category[0] if isinstance(category, tuple) else category for category in top_categories]
+
+
+def _time_bucket(context: Dict[str, Any]) -> Optional[str]:
+    """Popularity column for the request time, split the same way as cold start."""
+    if 'time_of_day' not in context:
+        return None
+    return 'morning' if context['time_of_day'] in ['morning', 'afternoon'] else 'evening'
+
+
+def _empty() -> Tuple[np.ndarray, np.ndarray]:
+    return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+
+def _top(codes: np.ndarray, scores: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best ``limit`` (code, score) pairs, ties broken by code (popularity rank)."""
+    if len(codes) > limit:
+        keep = np.lexsort((codes, -scores))[:limit]
+        codes, scores = codes[keep], scores[keep]
+    return codes, scores
+
+
+class CatalogIndex:
+    """Per-catalog arrays shared by candidate generators and the re-ranker.
+
+    Products are coded by popularity rank, so code 0 is the most popular
+    product and the popularity generator is just a range. Context and
+    category orderings are precomputed here so generators only slice.
+    """
+
+    def __init__(self, sorted_products: List[Dict]):
+        self.products = sorted_products
+        self.code_by_id = {p['id']: code for code, p in enumerate(sorted_products)}
+        n = len(sorted_products)
+        self.popularity = np.array([p.get('popularity', 0) for p in sorted_products], dtype=np.float32)
+        self.time_popularity = {
+            bucket: np.array([p.get(f'popularity_{bucket}', 0) for p in sorted_products], dtype=np.float32)
+            for bucket in ('morning', 'evening')
+        }
+        mobile = np.array([p.get('is_mobile_friendly', True) for p in sorted_products], dtype=bool)
+        codes = np.arange(n, dtype=np.int32)
+        orderings = {None: codes}
+        for bucket, values in self.time_popularity.items():
+            orderings[bucket] = np.argsort(-values, kind='stable').astype(np.int32)
+        # Keyed by (mobile only, time bucket)
+        self.context_orderings = {}
+        for bucket, ordering in orderings.items():
+            self.context_orderings[(False, bucket)] = ordering
+            self.context_orderings[(True, bucket)] = ordering[mobile[ordering]]
+        by_category: Dict[Any, List[int]] = {}
+        for code, product in enumerate(sorted_products):
+            by_category.setdefault(product.get('category'), []).append(code)
+        self.by_category = {c: np.array(v, dtype=np.int32) for c, v in by_category.items()}
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def codes(self, product_ids) -> np.ndarray:
+        """Catalog codes for product ids; ids outside the catalog map to -1."""
+        return np.fromiter(
+            (self.code_by_id.get(pid, -1) for pid in product_ids),
+            dtype=np.int32,
+            count=len(product_ids)
+        )
+
+
+class CandidateGenerator:
+    """Cheap first stage: up to ``limit`` (catalog code, score) pairs per request.
+
+    Subclasses implement ``generate``; scores only need to be comparable
+    within one generator, the re-ranker rescales them.
+    """
+    name = 'base'
+
+    def __init__(self, limit: int = 200, weight: float = 1.0):
+        self.limit = limit
+        self.weight = weight
+
+    def generate(self, engine, user_id: Optional[str],
+                 context: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+
+class PopularityGenerator(CandidateGenerator):
+    """The most popular products (a prefix of the catalog codes)."""
+    name = 'popularity'
+
+    def generate(self, engine, user_id, context):
+        catalog = engine.catalog_index
+        codes = np.arange(min(self.limit, len(catalog)), dtype=np.int32)
+        return codes, catalog.popularity[codes]
+
+
+class ContextGenerator(CandidateGenerator):
+    """Top products for the request's device and time of day."""
+    name = 'context'
+
+    def generate(self, engine, user_id, context):
+        catalog = engine.catalog_index
+        bucket = _time_bucket(context)
+        codes = catalog.context_orderings[(context.get('device_type') == 'mobile', bucket)][:self.limit]
+        values = catalog.time_popularity[bucket] if bucket else catalog.popularity
+        return codes, values[codes]
+
+
+class CategoryGenerator(CandidateGenerator):
+    """Popular products in the user's top categories (or the requested category)."""
+    name = 'category'
+
+    def generate(self, engine, user_id, context):
+        profile = engine.user_profiles.get(user_id) or {}
+        categories = _category_names(profile.get('top_categories'))
+        if not categories and context.get('category'):
+            categories = [context['category']]
+        codes, scores = [], []
+        for position, category in enumerate(categories):
+            members = engine.catalog_index.by_category.get(category)
+            if members is not None:
+                codes.append(members[:self.limit])
+                # Earlier categories rank higher
+                scores.append(np.full(len(codes[-1]), 1.0 / (1 + position), dtype=np.float32))
+        if not codes:
+            return _empty()
+        codes, scores = np.concatenate(codes), np.concatenate(scores)
+        # A product listed under several categories keeps its best score
+        codes, first = np.unique(codes, return_index=True)
+        return _top(codes, scores[first], self.limit)
+
+
+class CoViewGenerator(CandidateGenerator):
+    """Products viewed by the user's nearest neighbours, weighted by similarity."""
+    name = 'co_view'
+
+    def __init__(self, limit: int = 200, weight: float = 1.0, n_similar: int = 10):
+        super().__init__(limit, weight)
+        self.n_similar = n_similar
+
+    def generate(self, engine, user_id, context):
+        if not user_id:
+            return _empty()
+        similar = engine._find_similar_users(user_id, n_similar=self.n_similar)
+        if not similar:
+            return _empty()
+        weights = np.array([s['similarity_score'] for s in similar], dtype=np.float32)
+        scored = sp.csr_matrix(weights[None, :]) @ engine.interactions.user_rows([s['user_id'] for s in similar])
+        item_ids = engine.interactions.item_ids
+        codes = engine.catalog_index.codes([item_ids[i] for i in scored.indices])
+        known = codes >= 0
+        return _top(codes[known], scored.data[known], self.limit)
+
+
+class ViewedTogetherGenerator(CandidateGenerator):
+    """Items co-occurring with the user's history in the item similarity matrix."""
+    name = 'viewed_together'
+
+    def generate(self, engine, user_id, context):
+        if not user_id:
+            return _empty()
+        items, scores = engine._score_similar_items(user_id)
+        item_ids = engine.interactions.item_ids
+        codes = engine.catalog_index.codes([item_ids[i] for i in items])
+        known = codes >= 0
+        return _top(codes[known], scores[known], self.limit)
+
+
+class MFCandidateGenerator(CandidateGenerator):
+    """MF candidates from the ANN index, or the user's materialized top-K row."""
+    name = 'mf'
+
+    def generate(self, engine, user_id, context):
+        mf = engine.mf_model
+        if not user_id or not mf.trained:
+            return _empty()
+        snapshot = mf.ann_index
+        if snapshot is not None:
+            item_ids, index = snapshot
+            items, scores = index.search(mf._user_query(user_id), self.limit)
+            codes = engine.catalog_index.codes(item_ids[items].tolist())
+            scores = scores.astype(np.float32)
+        else:
+            # No full-catalog scan here: without an index only table rows qualify
+            recommended = mf.recommend_precomputed(user_id, n=min(self.limit, self._table_width(mf)))
+            if not recommended:
+                return _empty()
+            codes = engine.catalog_index.codes(recommended)
+            scores = -np.arange(len(codes), dtype=np.float32)
+        known = codes >= 0
+        return codes[known], scores[known]
+
+    @staticmethod
+    def _table_width(mf) -> int:
+        snapshot = mf.top_n_table
+        return snapshot[2].shape[1] if snapshot is not None else 0
+
+
+def default_generators() -> List[CandidateGenerator]:
+    return [
+        PopularityGenerator(limit=100, weight=0.5),
+        ContextGenerator(limit=100, weight=0.5),
+        CategoryGenerator(limit=100, weight=1.0),
+        CoViewGenerator(limit=200, weight=2.0),
+        ViewedTogetherGenerator(limit=200, weight=2.0),
+        MFCandidateGenerator(limit=200, weight=2.0)
+    ]
+
+
+class TwoStagePipeline:
+    """Candidate generation followed by a vectorized re-rank of the union.
+
+    Each generator returns at most ``limit`` catalog codes, so the re-rank
+    touches a bounded number of items however large the catalog is. The
+    union is deduplicated on the integer codes, and every candidate gets a
+    feature row: each generator's rescaled score, item popularity, the
+    time-of-day popularity and (when trained) the exact MF score. The final
+    score is a weighted sum of those columns.
+    """
+
+    def __init__(self, generators: Optional[List[CandidateGenerator]] = None,
+                 item_weights: Optional[Dict[str, float]] = None):
+        self.generators = generators if generators is not None else default_generators()
+        self.item_weights = dict({'popularity': 0.5, 'time_popularity': 0.5, 'mf_score': 1.0},
+                                 **(item_weights or {}))
+
+    def candidates(self, engine, user_id: Optional[str],
+                   context: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """Deduplicated candidate codes and their (candidates x generators) score matrix."""
+        outputs = [generator.generate(engine, user_id, context) for generator in self.generators]
+        lengths = [len(codes) for codes, _ in outputs]
+        if not sum(lengths):
+            return np.empty(0, dtype=np.int32), np.empty((0, len(self.generators)), dtype=np.float32)
+        all_codes = np.concatenate([codes for codes, _ in outputs]).astype(np.int32, copy=False)
+        codes, inverse = np.unique(all_codes, return_inverse=True)
+        scores = np.zeros((len(codes), len(self.generators)), dtype=np.float32)
+        hit = np.zeros_like(scores, dtype=bool)
+        offset = 0
+        for column, (_, generator_scores) in enumerate(outputs):
+            rows = inverse[offset:offset + len(generator_scores)]
+            scores[rows, column] = generator_scores
+            hit[rows, column] = True
+            offset += len(generator_scores)
+        return codes, self._rescale(scores, hit)
+
+    @staticmethod
+    def _rescale(scores: np.ndarray, hit: np.ndarray) -> np.ndarray:
+        """Min-max each column over the items it produced to (0, 1]; misses stay 0."""
+        any_hit = hit.any(axis=0)
+        low = np.where(any_hit, np.where(hit, scores, np.inf).min(axis=0), 0.0)
+        high = np.where(any_hit, np.where(hit, scores, -np.inf).max(axis=0), 0.0)
+        span = np.where(high > low, high - low, 1.0)
+        scaled = np.where(high > low, 0.1 + 0.9 * (scores - low) / span, 1.0)
+        return np.where(hit, scaled, 0.0).astype(np.float32)
+
+    def rerank(self, engine, user_id: Optional[str], context: Dict[str, Any],
+               codes: np.ndarray, generator_scores: np.ndarray) -> np.ndarray:
+        """Final scores for the candidate codes."""
+        catalog = engine.catalog_index
+        weights = np.array([g.weight for g in self.generators], dtype=np.float32)
+        total = generator_scores @ weights
+        total += self.item_weights['popularity'] * catalog.popularity[codes]
+        bucket = _time_bucket(context)
+        if bucket:
+            total += self.item_weights['time_popularity'] * catalog.time_popularity[bucket][codes]
+        mf = engine.mf_model
+        if user_id and mf.trained and user_id in mf.user_map:
+            mf_scores = mf.score_items(user_id, [catalog.products[c]['id'] for c in codes])
+            low, high = mf_scores.min(), mf_scores.max()
+            if high > low:
+                total += self.item_weights['mf_score'] * (mf_scores - low) / (high - low)
+        return total
+
+    def recommend(self, engine, user_id: Optional[str], context: Optional[Dict[str, Any]],
+                  n: int = 10) -> List[Dict]:
+        """Top-n products for one request, excluding items the user already interacted with."""
+        context = context or {}
+        codes, generator_scores = self.candidates(engine, user_id, context)
+        if user_id and len(codes):
+            seen = engine.catalog_index.codes(engine.interactions.user_item_ids(user_id))
+            keep = ~np.isin(codes, seen)
+            codes, generator_scores = codes[keep], generator_scores[keep]
+        if not len(codes):
+            return []
+        scores = self.rerank(engine, user_id, context, codes, generator_scores)
+        best = np.lexsort((codes, -scores))[:n]
+        return [engine.catalog_index.products[c] for c in codes[best]]
@@ -1,11 +1,24 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import numpy as np
 import pandas as pd
+from services.vocabulary import Vocabulary
 
 class DataProcessor:
-    def __init__(self, db_connection=None):
+    # Counted action types and their session feature columns
+    SESSION_ACTIONS = {
+        'page_view': 'page_views',
+        'product_view': 'product_views',
+        'add_to_cart': 'add_to_cart',
+        'purchase': 'purchase'
+    }
+    # Low-cardinality activity columns kept as ``category`` over the shared vocabulary
+    CATEGORICAL_COLUMNS = ('action_type', 'device_type', 'category')
+
+    def __init__(self, db_connection=None, vocabulary: Optional[Vocabulary] = None):
         self.db = db_connection
         self.session_timeout = timedelta(minutes=30)
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
     
     def process_user_activity(self, user_activities: List[Dict]) -> pd.DataFrame:
         """Process raw user activities into structured sessions."""
@@ -14,110 +27,185 @@ class DataProcessor:
             
         df = pd.DataFrame(user_activities)
         
-        # Convert timestamp to datetime
+        # Convert timestamp to datetime and low-cardinality columns to categories
         df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values(['user_id', 'timestamp'])
-        
-        # Calculate time differences between consecutive actions
-        df['time_diff'] = df.groupby('user_id')['timestamp'].diff()
-        
-        # Identify new sessions (when time difference > session_timeout or new user)
-        df['new_session'] = (df['time_diff'].isna()) | (df['time_diff'] > self.session_timeout)
+        self.vocabulary.encode_frame(df, self.CATEGORICAL_COLUMNS)
+        order, time_diff, new_session, session_ids = sessionize(
+            df['user_id'], df['timestamp'], self.session_timeout, first_session_id=1
+        )
+        df = df.iloc[order]
         
-        # Create session IDs
-        df['session_id'] = df['new_session'].cumsum()
+        # Gap to the user's previous action, a new session after session_timeout or a new user
+        df['time_diff'] = time_diff
+        df['new_session'] = new_session
+        df['session_id'] = session_ids
         
         return df
     
     def extract_session_features(self, session_data: pd.DataFrame) -> List[Dict]:
-        """Extract meaningful features from user sessions."""
+        """Extract meaningful features from user sessions.
+
+        One grouped aggregation over integer session codes: action counts are
+        sums of indicator columns, and min/max/nunique are named aggregations.
+        Only the product and category lists are collected, with a single
+        stable sort and slicing.
+        """
         if session_data.empty:
             return []
-            
-        features = []
-        
-        for session_id, session in session_data.groupby('session_id'):
-            if session.empty:
-                continue
-                
-            session_features = {
-                'session_id': session_id,
-                'user_id': session['user_id'].iloc[0],
-                'start_time': session['timestamp'].min(),
-                'end_time': session['timestamp'].max(),
-                'duration_seconds': (session['timestamp'].max() - session['timestamp'].min()).total_seconds(),
-                'num_actions': len(session),
-                'page_views': (session['action_type'] == 'page_view').sum(),
-                'product_views': (session['action_type'] == 'product_view').sum(),
-                'add_to_cart': (session['action_type'] == 'add_to_cart').sum(),
-                'purchase': (session['action_type'] == 'purchase').sum(),
-                'devices_used': session['device_type'].nunique(),
-                'unique_products_viewed': session[session['product_id'].notna()]['product_id'].nunique(),
-                'categories_viewed': session[session['category'].notna()]['category'].nunique()
-            }
-            
-            # Add product and category interactions
-            if 'product_id' in session.columns:
-                session_features['products_viewed'] = session[session['product_id'].notna()]['product_id'].tolist()
-            if 'category' in session.columns:
-                session_features['categories'] = session[session['category'].notna()]['category'].tolist()
-                
-            features.append(session_features)
-            
-        return pd.DataFrame(features)
+
+        # groupby drops missing keys; sorted codes give groups in session_id order
+        session_data = session_data[session_data['session_id'].notna()]
+        codes, session_ids = pd.factorize(session_data['session_id'], sort=True)
+        actions = session_data['action_type']
+        columns = {
+            'user_id': session_data['user_id'],
+            'timestamp': session_data['timestamp'],
+            'device_type': session_data['device_type'],
+            'product_id': session_data['product_id'],
+            'category': session_data['category']
+        }
+        for action, column in self.SESSION_ACTIONS.items():
+            columns[column] = (actions == action).to_numpy()
+        grouped = pd.DataFrame(columns).groupby(codes, sort=True)
+        features = grouped.agg(
+            user_id=('user_id', 'first'),
+            start_time=('timestamp', 'min'),
+            end_time=('timestamp', 'max'),
+            num_actions=('timestamp', 'size'),
+            **{column: (column, 'sum') for column in self.SESSION_ACTIONS.values()},
+            devices_used=('device_type', 'nunique'),
+            unique_products_viewed=('product_id', 'nunique'),
+            categories_viewed=('category', 'nunique')
+        ).reset_index(drop=True)
+        features.insert(0, 'session_id', session_ids)
+        features.insert(
+            4, 'duration_seconds', (features['end_time'] - features['start_time']).dt.total_seconds()
+        )
+
+        # Add product and category interactions
+        features['products_viewed'] = self._collect_lists(codes, session_data['product_id'], len(session_ids))
+        features['categories'] = self._collect_lists(codes, session_data['category'], len(session_ids))
+        return features
+
+    @staticmethod
+    def _collect_lists(codes: np.ndarray, values: pd.Series, n_groups: int) -> List[List[Any]]:
+        """Non-null ``values`` of each group as a list, in original row order."""
+        present = values.notna().to_numpy()
+        codes = codes[present]
+        order = np.argsort(codes, kind='stable')
+        collected = values.to_numpy()[present][order].tolist()
+        ends = np.cumsum(np.bincount(codes, minlength=n_groups)).tolist()
+        return [collected[start:end] for start, end in zip([0] + ends[:-1], ends)]
     
     def create_user_profiles(self, sessions_df: pd.DataFrame) -> pd.DataFrame:
-        """Create user profiles from session data."""
+        """Create user profiles from session data.
+
+        Totals are one grouped aggregation. List columns are exploded once
+        and counted with groupby ``nunique``; ``top_categories`` keeps each
+        user's three most frequent categories (ties in first-seen order),
+        picked by one sort rather than a counter per user.
+        """
         if sessions_df.empty:
             return pd.DataFrame()
-            
-        user_profiles = []
-        
-        for user_id, user_sessions in sessions_df.groupby('user_id'):
-            profile = {
-                'user_id': user_id,
-                'first_seen': user_sessions['start_time'].min(),
-                'last_seen': user_sessions['end_time'].max(),
-                'total_sessions': len(user_sessions),
-                'total_duration_seconds': user_sessions['duration_seconds'].sum(),
-                'avg_session_duration': user_sessions['duration_seconds'].mean(),
-                'total_page_views': user_sessions['page_views'].sum(),
-                'total_product_views': user_sessions['product_views'].sum(),
-                'total_add_to_cart': user_sessions['add_to_cart'].sum(),
-                'total_purchases': user_sessions['purchase'].sum(),
-                'conversion_rate': user_sessions['purchase'].sum() / len(user_sessions) if len(user_sessions) > 0 else 0,
-                'unique_products_viewed': len(set([p for sublist in user_sessions['products_viewed'].dropna() for p in sublist])),
-                'unique_categories_viewed': len(set([c for sublist in user_sessions['categories'].dropna() for c in sublist]))
-            }
-            
-            # Add most active device
-            if 'device_type' in user_sessions.columns:
-                profile['primary_device'] = user_sessions['device_type'].mode()[0] if not user_sessions['device_type'].empty else None
-                
-            # Add favorite categories
-            if 'categories' in user_sessions.columns:
-                category_counts = {}
-                for categories in user_sessions['categories'].dropna():
-                    for cat in categories:
-                        category_counts[cat] = category_counts.get(cat, 0) + 1
-                if category_counts:
-                    profile['top_categories'] = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-                    
-            user_profiles.append(profile)
-            
-        return pd.DataFrame(user_profiles)
+
+        sessions_df = sessions_df[sessions_df['user_id'].notna()]
+        codes, user_ids = pd.factorize(sessions_df['user_id'], sort=True)
+        n_users = len(user_ids)
+        profiles = sessions_df.groupby(codes, sort=True).agg(
+            first_seen=('start_time', 'min'),
+            last_seen=('end_time', 'max'),
+            total_sessions=('start_time', 'size'),
+            total_duration_seconds=('duration_seconds', 'sum'),
+            avg_session_duration=('duration_seconds', 'mean'),
+            total_page_views=('page_views', 'sum'),
+            total_product_views=('product_views', 'sum'),
+            total_add_to_cart=('add_to_cart', 'sum'),
+            total_purchases=('purchase', 'sum')
+        ).reset_index(drop=True)
+        profiles.insert(0, 'user_id', user_ids)
+        profiles['conversion_rate'] = profiles['total_purchases'] / profiles['total_sessions']
+
+        categories = self._explode_by_user(codes, sessions_df['categories'])
+        for column, values in [('unique_products_viewed', self._explode_by_user(codes, sessions_df['products_viewed'])),
+                               ('unique_categories_viewed', categories)]:
+            profiles[column] = values.groupby(level=0).nunique().reindex(range(n_users), fill_value=0).to_numpy()
+
+        # Add most active device
+        if 'device_type' in sessions_df.columns:
+            devices = pd.Series(sessions_df['device_type'].to_numpy(), index=codes).dropna()
+            primary = [None] * n_users
+            if len(devices):
+                # Like Series.mode: highest count, ties to the smallest value
+                counts = devices.groupby([devices.index, devices.to_numpy()], sort=True).size()
+                users = counts.index.get_level_values(0).to_numpy()
+                best = np.lexsort((-counts.to_numpy(), users))
+                first = best[np.r_[True, users[best][1:] != users[best][:-1]]]
+                for user, device in zip(users[first].tolist(), counts.index.get_level_values(1)[first].tolist()):
+                    primary[user] = device
+            profiles['primary_device'] = primary
+
+        # Add favorite categories
+        if len(categories):
+            # sort=False keeps each user's categories in first-seen order
+            counts = categories.groupby([categories.index, categories.to_numpy()], sort=False).size()
+            users = counts.index.get_level_values(0).to_numpy()
+            names = counts.index.get_level_values(1)
+            values = counts.to_numpy()
+            ranked = np.lexsort((np.arange(len(values)), -values, users))
+            ordered = users[ranked]
+            # Rank within the user is the distance from the user's first row
+            ranked = ranked[np.arange(len(ranked)) - np.searchsorted(ordered, ordered) < 3]
+            top = list(zip(names[ranked].tolist(), values[ranked].tolist()))
+            ends = np.cumsum(np.bincount(users[ranked], minlength=n_users)).tolist()
+            profiles['top_categories'] = [
+                top[start:end] if end > start else np.nan for start, end in zip([0] + ends[:-1], ends)
+            ]
+
+        return profiles
+
+    @staticmethod
+    def _explode_by_user(codes: np.ndarray, lists: pd.Series) -> pd.Series:
+        """One row per list element, indexed by user code, in original order."""
+        exploded = pd.Series(lists.to_numpy(), index=codes).dropna().explode()
+        return exploded[exploded.notna()]
     
-    def process(self, user_activities: List[Dict]) -> Dict[str, pd.DataFrame]:
-        """Main processing pipeline."""
+    def process(self, user_activities: List[Dict], n_jobs: int = 1,
+                n_partitions: Optional[int] = None, profile_store=None,
+                sessionizer=None, flush: bool = False) -> Dict[str, pd.DataFrame]:
+        """Main processing pipeline.
+
+        With ``n_jobs`` > 1, session features and user profiles are built in
+        worker processes over ``n_partitions`` (default ``n_jobs``) user-hash
+        partitions of the sessions; sessions never span users, so the
+        concatenated results equal the single-process ones.
+
+        With a ``ProfileStore`` the batch is fed to ``sessionizer``, a
+        ``StreamingSessionizer`` the caller keeps across batches, and only
+        the sessions it closes are folded into the stored aggregates, so a
+        session spanning two batches is counted once. ``session_features``
+        holds those closed sessions and ``user_profiles`` the merged
+        profiles of their users. Sessions still open wait for a later batch;
+        pass ``flush`` with the last batch to fold them too. Batches must
+        arrive in time order, up to the sessionizer's ``allowed_lateness``.
+        A job that resumes in a new process saves the sessionizer with the
+        store (``save_profile_store(store, path, sessionizer)``) and loads
+        both back (``load_profile_store``, ``load_sessionizer``).
+        """
+        if profile_store is not None:
+            return self._fold_into_store(user_activities, profile_store, sessionizer, flush)
+
         # Process raw activities into sessions
         sessions = self.process_user_activity(user_activities)
         
         # Extract session features
         if not sessions.empty:
-            session_features = self.extract_session_features(sessions)
-            
-            # Create user profiles
-            user_profiles = self.create_user_profiles(session_features)
+            if n_jobs > 1:
+                session_features, user_profiles = self._process_partitions(sessions, n_jobs, n_partitions)
+            else:
+                session_features = self.extract_session_features(sessions)
+                
+                # Create user profiles
+                user_profiles = self.create_user_profiles(session_features)
             
             return {
                 'sessions': sessions,
@@ -126,3 +214,84 @@ class DataProcessor:
             }
         
         return {'sessions': pd.DataFrame(), 'session_features': pd.DataFrame(), 'user_profiles': pd.DataFrame()}
+
+    def _fold_into_store(self, user_activities: List[Dict], profile_store, sessionizer, flush: bool):
+        if sessionizer is None:
+            raise ValueError("folding into a ProfileStore needs a StreamingSessionizer kept across batches")
+        if pd.Timedelta(self.session_timeout).value != sessionizer.session_timeout:
+            raise ValueError("sessionizer session_timeout differs from the processor's")
+        sessions = self.process_user_activity(user_activities)
+        # The sessionizer takes events in arrival order; order the batch by time first
+        closed = sessionizer.process(sessions.sort_values('timestamp', kind='stable')) if not sessions.empty else []
+        if flush:
+            closed += sessionizer.flush()
+        session_features = pd.DataFrame(closed)
+        if not session_features.empty and not sessions.empty:
+            # Keep the batch path's timestamp resolution
+            for column in ('start_time', 'end_time'):
+                session_features[column] = session_features[column].astype(sessions['timestamp'].dtype)
+        return {
+            'sessions': sessions,
+            'session_features': session_features,
+            'user_profiles': profile_store.profiles(profile_store.update(session_features))
+        }
+
+    def _process_partitions(self, sessions: pd.DataFrame, n_jobs: int, n_partitions: Optional[int]):
+        from services.parallel import map_partitions
+        results = map_partitions(
+            _session_features_and_profiles, sessions, 'user_id', n_jobs, n_partitions,
+            columns=['session_id', 'user_id', 'timestamp', 'action_type', 'device_type', 'product_id', 'category'],
+            args=(type(self),)
+        )
+        features = pd.concat([features for features, _ in results], ignore_index=True)
+        features = features.iloc[np.argsort(features['session_id'].to_numpy(), kind='stable')]
+        profiles = pd.concat([profiles for _, profiles in results], ignore_index=True)
+        profiles = profiles.iloc[np.argsort(pd.factorize(profiles['user_id'], sort=True)[0], kind='stable')]
+        return features.reset_index(drop=True), profiles.reset_index(drop=True)
+
+
+def _session_features_and_profiles(sessions: pd.DataFrame, processor_class=DataProcessor):
+    """Worker side of ``DataProcessor.process`` for one partition."""
+    processor = processor_class()
+    features = processor.extract_session_features(sessions)
+    return features, processor.create_user_profiles(features)
+
+def sessionize(users, timestamps, session_timeout: timedelta, first_session_id: int = 0):
+    """Split events into sessions in one pass over integer arrays.
+
+    Events are sorted once by (user code, timestamp); a session starts at
+    each user's first event and wherever the gap to the user's previous event
+    exceeds ``session_timeout``. Returns the sort order, the gaps to each
+    user's previous event (NaT at a user's first event), the session-start
+    flags and globally unique session ids, counted up from
+    ``first_session_id`` in sorted order. Missing users or timestamps get
+    one session per event, as with a groupby ``diff``.
+    """
+    codes, _ = pd.factorize(pd.Series(users), sort=True, use_na_sentinel=False)
+    index = pd.DatetimeIndex(timestamps)
+    missing = np.asarray(index.isna())
+    users_missing = np.asarray(pd.isna(users))
+    timeout = pd.Timedelta(session_timeout).to_timedelta64().astype(f'm8[{index.unit}]').astype(np.int64)
+
+    # NaT sorts after a user's timestamps and missing users last, as with sort_values
+    values = index.asi8.copy()
+    low, high = (values[~missing].min(), values[~missing].max()) if not missing.all() else (0, 0)
+    values[missing] = high + 1
+    span = int(high) - int(low) + 2
+    if (int(codes.max(initial=0)) + 1) * span < 2 ** 63:
+        # One stable sort over a combined (user, time) key when it fits in int64
+        order = np.argsort(codes.astype(np.int64) * span + (values - low), kind='stable')
+    else:
+        order = np.lexsort((values, codes))
+    codes, values, missing = codes[order], values[order], missing[order]
+    gaps = np.diff(values, prepend=values[:1])
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    gap_missing = first | missing | users_missing[order]
+    gap_missing[1:] |= missing[:-1]
+    new_session = gap_missing | (gaps > timeout)
+    session_ids = np.cumsum(new_session) - 1 + first_session_id
+
+    time_diff = gaps.view(f'm8[{index.unit}]')
+    time_diff[gap_missing] = np.timedelta64('NaT')
+    return order, time_diff, new_session, session_ids
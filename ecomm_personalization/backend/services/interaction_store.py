@@ -0,0 +1,203 @@
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+
+# Interaction strength per tracked event type; unknown types count as a view
+DEFAULT_EVENT_WEIGHTS = {
+    'page_view': 0.5,
+    'view': 1.0,
+    'product_view': 1.0,
+    'product_click': 1.0,
+    'add_to_cart': 3.0,
+    'purchase': 5.0,
+    'conversion': 5.0
+}
+
+
+class InteractionStore:
+    """User x item interactions, dictionary-encoded and held in a CSR matrix.
+
+    User and item ids are mapped to dense integer codes in order of first
+    appearance. Interaction strengths (summed event weights) live in a
+    float32 CSR matrix, so each stored pair costs 8 bytes plus one row
+    pointer per user. Single appends go to a small per-user pending buffer
+    that is merged into the matrix once it grows past ``compact_threshold``
+    or when ``matrix`` is read.
+    """
+
+    def __init__(self, event_weights: Optional[Dict[str, float]] = None,
+                 compact_threshold: int = 100000):
+        self.event_weights = dict(DEFAULT_EVENT_WEIGHTS, **(event_weights or {}))
+        self.compact_threshold = compact_threshold
+        self.user_ids: List[Any] = []
+        self.user_index: Dict[Any, int] = {}
+        self.item_ids: List[Any] = []
+        self.item_index: Dict[Any, int] = {}
+        self._matrix = sp.csr_matrix((0, 0), dtype=np.float32)
+        self._pending: Dict[int, List[Tuple[int, float]]] = {}
+        self._pending_count = 0
+
+    @classmethod
+    def from_profiles(cls, user_profiles: List[Dict], field: str = 'products_viewed',
+                      event_type: str = 'product_view', **kwargs) -> 'InteractionStore':
+        """Build a store from profile dicts, registering every user in profile order."""
+        store = cls(**kwargs)
+        user_ids, item_ids = [], []
+        for profile in user_profiles:
+            store.add_user(profile['user_id'])
+            for item_id in profile.get(field) or []:
+                user_ids.append(profile['user_id'])
+                item_ids.append(item_id)
+        store.add_many(user_ids, item_ids, event_type=event_type)
+        return store
+
+    @property
+    def n_users(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def n_items(self) -> int:
+        return len(self.item_ids)
+
+    @property
+    def nnz(self) -> int:
+        return self.matrix.nnz
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the CSR arrays."""
+        matrix = self.matrix
+        return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+    @property
+    def matrix(self) -> sp.csr_matrix:
+        """The (n_users x n_items) CSR matrix including all appended events."""
+        if self._pending_count or self._matrix.shape != (self.n_users, self.n_items):
+            self._compact()
+        return self._matrix
+
+    def weight(self, event_type: Optional[str]) -> float:
+        return self.event_weights.get(event_type, 1.0)
+
+    def add_user(self, user_id) -> int:
+        return self._encode(self.user_index, self.user_ids, user_id)
+
+    def add_item(self, item_id) -> int:
+        return self._encode(self.item_index, self.item_ids, item_id)
+
+    @staticmethod
+    def _encode(index: Dict, ids: List, key) -> int:
+        code = index.get(key)
+        if code is None:
+            code = len(ids)
+            ids.append(key)
+            index[key] = code
+        return code
+
+    def add(self, user_id, item_id, event_type: Optional[str] = 'product_view',
+            weight: Optional[float] = None):
+        """Append a single interaction; cheap enough to call per tracked event."""
+        user = self.add_user(user_id)
+        item = self.add_item(item_id)
+        self._pending.setdefault(user, []).append((item, self.weight(event_type) if weight is None else weight))
+        self._pending_count += 1
+        if self._pending_count >= self.compact_threshold:
+            self._compact()
+
+    def add_many(self, user_ids, item_ids, event_type: Optional[str] = 'product_view',
+                 event_types=None, weights=None):
+        """Append a batch of interactions straight into the matrix."""
+        if not len(user_ids):
+            return
+        rows = np.fromiter((self.add_user(u) for u in user_ids), dtype=np.int32, count=len(user_ids))
+        cols = np.fromiter((self.add_item(i) for i in item_ids), dtype=np.int32, count=len(item_ids))
+        if weights is not None:
+            values = np.asarray(weights, dtype=np.float32)
+        elif event_types is not None:
+            values = np.fromiter((self.weight(e) for e in event_types), dtype=np.float32, count=len(event_types))
+        else:
+            values = np.full(len(rows), self.weight(event_type), dtype=np.float32)
+        self._merge(rows, cols, values)
+
+    def _compact(self):
+        """Merge pending appends (and any new users/items) into the CSR matrix."""
+        rows, cols, values = [], [], []
+        for user, events in self._pending.items():
+            for item, value in events:
+                rows.append(user)
+                cols.append(item)
+                values.append(value)
+        self._pending = {}
+        self._pending_count = 0
+        self._merge(
+            np.array(rows, dtype=np.int32),
+            np.array(cols, dtype=np.int32),
+            np.array(values, dtype=np.float32)
+        )
+
+    def _merge(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray):
+        shape = (self.n_users, self.n_items)
+        current = self._matrix
+        # Grow the existing matrix by padding indptr rather than copying entries
+        indptr = np.concatenate([
+            current.indptr,
+            np.full(shape[0] - current.shape[0], current.indptr[-1], dtype=current.indptr.dtype)
+        ])
+        grown = sp.csr_matrix((current.data, current.indices, indptr), shape=shape)
+        if len(rows):
+            grown = grown + sp.csr_matrix((values, (rows, cols)), shape=shape)
+        grown.sum_duplicates()
+        self._matrix = grown.astype(np.float32, copy=False)
+
+    def user_items(self, user_id) -> Tuple[np.ndarray, np.ndarray]:
+        """(item codes, weights) for one user, including pending appends."""
+        user = self.user_index.get(user_id)
+        if user is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        items, weights = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        if user < self._matrix.shape[0]:
+            lo, hi = self._matrix.indptr[user], self._matrix.indptr[user + 1]
+            items, weights = self._matrix.indices[lo:hi], self._matrix.data[lo:hi]
+        pending = self._pending.get(user)
+        if pending:
+            items = np.concatenate([items, np.array([i for i, _ in pending], dtype=np.int32)])
+            weights = np.concatenate([weights, np.array([w for _, w in pending], dtype=np.float32)])
+        return items, weights
+
+    def user_rows(self, user_ids) -> sp.csr_matrix:
+        """(len(user_ids) x n_items) CSR slice for the given users, pending appends included.
+
+        Unknown users get empty rows. Unlike ``matrix`` this never triggers a
+        compaction, so it is safe on the request path.
+        """
+        if not len(user_ids):
+            return sp.csr_matrix((0, self.n_items), dtype=np.float32)
+        codes = np.fromiter((self.user_index.get(u, -1) for u in user_ids), dtype=np.intp, count=len(user_ids))
+        # Gather compacted rows straight from the CSR arrays (users added since have none)
+        stored = (codes >= 0) & (codes < self._matrix.shape[0])
+        indptr = self._matrix.indptr
+        lo = np.where(stored, indptr[np.where(stored, codes, 0)], 0)
+        lengths = np.where(stored, indptr[np.where(stored, codes + 1, 0)] - lo, 0)
+        row_ptr = np.concatenate(([0], np.cumsum(lengths)))
+        positions = np.repeat(lo - row_ptr[:-1], lengths) + np.arange(row_ptr[-1])
+        shape = (len(user_ids), self.n_items)
+        gathered = sp.csr_matrix(
+            (self._matrix.data[positions], self._matrix.indices[positions], row_ptr), shape=shape
+        )
+        pending = [
+            (position, item, value)
+            for position, code in enumerate(codes.tolist()) if code in self._pending
+            for item, value in self._pending[code]
+        ]
+        if not pending:
+            return gathered
+        position, item, value = zip(*pending)
+        return gathered + sp.csr_matrix(
+            (np.array(value, dtype=np.float32), (np.array(position), np.array(item))),
+            shape=shape
+        )
+
+    def user_item_ids(self, user_id) -> List[Any]:
+        """Raw ids of the items a user interacted with (pending repeats included)."""
+        items, _ = self.user_items(user_id)
+        return [self.item_ids[i] for i in items]
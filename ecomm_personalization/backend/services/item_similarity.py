@@ -0,0 +1,73 @@
+from typing import Optional
+import numpy as np
+import scipy.sparse as sp
+
+
+class ItemCooccurrence:
+    """Item-item "viewed together" similarities, top-k per item, in CSR form.
+
+    Co-occurrence counts come from the binarized user x item matrix as
+    ``B.T @ B``, computed for ``block_size`` items at a time so only one
+    block of the (sparse) count matrix exists at once. Counts are
+    normalized by ``method``:
+
+    - ``'cosine'``: ``c_ij / sqrt(n_i * n_j)``
+    - ``'lift'``: ``c_ij * n_users / (n_i * n_j)``
+
+    where ``n_i`` is the number of users who interacted with item i. Pairs
+    seen together by fewer than ``min_count`` users are dropped, and each
+    row keeps its ``top_k`` best neighbours (the item itself excluded).
+    """
+
+    METHODS = ('cosine', 'lift')
+
+    def __init__(self, top_k: int = 50, method: str = 'cosine', min_count: int = 1,
+                 block_size: int = 2048):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown similarity method: {method}")
+        self.top_k = top_k
+        self.method = method
+        self.min_count = min_count
+        self.block_size = block_size
+        self.similarities: Optional[sp.csr_matrix] = None
+
+    def fit(self, user_items: sp.csr_matrix) -> 'ItemCooccurrence':
+        """Build the top-k similarity rows from a (users x items) interaction matrix."""
+        binary = user_items.tocsr(copy=True).astype(np.float32)
+        binary.data[:] = 1.0
+        binary.eliminate_zeros()
+        n_users, n_items = binary.shape
+        item_users = binary.T.tocsr()
+        counts = np.asarray(binary.sum(axis=0)).ravel()
+
+        blocks = []
+        for start in range(0, n_items, self.block_size):
+            stop = min(start + self.block_size, n_items)
+            cooccurrence = (item_users[start:stop] @ binary).tocoo()
+            rows, cols, together = cooccurrence.row, cooccurrence.col, cooccurrence.data
+            keep = (rows + start != cols) & (together >= self.min_count)
+            rows, cols, together = rows[keep], cols[keep], together[keep]
+            if self.method == 'cosine':
+                scores = together / np.sqrt(counts[rows + start] * counts[cols])
+            else:
+                scores = together * n_users / (counts[rows + start] * counts[cols])
+            blocks.append(self._top_k_rows(rows, cols, scores.astype(np.float32), stop - start, n_items))
+
+        self.similarities = sp.vstack(blocks, format='csr') if blocks else sp.csr_matrix((0, 0), dtype=np.float32)
+        return self
+
+    def _top_k_rows(self, rows: np.ndarray, cols: np.ndarray, scores: np.ndarray,
+                    n_rows: int, n_cols: int) -> sp.csr_matrix:
+        """CSR with the ``top_k`` highest scores of each row (ties by column)."""
+        order = np.lexsort((cols, -scores, rows))
+        rows = rows[order]
+        starts = np.searchsorted(rows, np.arange(n_rows))
+        keep = np.arange(len(rows)) - starts[rows] < self.top_k
+        order = order[keep]
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(rows[keep], minlength=n_rows))))
+        return sp.csr_matrix((scores[order], cols[order], indptr), shape=(n_rows, n_cols))
+
+    @property
+    def nbytes(self) -> int:
+        s = self.similarities
+        return 0 if s is None else s.data.nbytes + s.indices.nbytes + s.indptr.nbytes
@@ -0,0 +1,588 @@
+from typing import List, Dict, Any, Optional, Tuple, Union
+import os
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.preprocessing import StandardScaler
+from surprise import SVD
+from services.ann_index import InnerProductIndex
+from services.data_processor import DataProcessor
+from services.interaction_store import InteractionStore
+from services.profile_aggregates import SUMMED_COLUMNS, ProfileAggregate, ProfileStore
+from services.quantization import QuantizedRows
+from services.recommendation_engine import RecommendationEngine, ImplicitALSRecommender
+from services.sessionizer import StreamingSessionizer, _OpenSession
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+class IdIndex:
+    """Id -> code lookup over an id array without building a dict.
+
+    Lookups binary-search ``ids`` through a precomputed ``order`` (argsort),
+    so both arrays can stay memory-mapped. Ids added after loading (fold-in,
+    new interactions) go to a small in-memory overlay.
+    """
+
+    def __init__(self, ids: np.ndarray, order: Optional[np.ndarray] = None):
+        self.ids = ids
+        self.order = np.argsort(ids, kind='stable') if order is None else order
+        self.added: Dict[Any, int] = {}
+
+    def get(self, key, default=None):
+        code = self.added.get(key)
+        if code is not None:
+            return code
+        if not len(self.ids):
+            return default
+        try:
+            position = int(np.searchsorted(self.ids, key, sorter=self.order))
+        except (TypeError, ValueError):
+            # Key type does not compare with the stored ids
+            return default
+        if position < len(self.ids):
+            code = int(self.order[position])
+            if self.ids[code] == key:
+                return code
+        return default
+
+    def get_many(self, keys) -> np.ndarray:
+        """Codes of ``keys`` from one vectorized search; missing keys map to -1."""
+        keys = keys if isinstance(keys, (list, np.ndarray)) else list(keys)
+        codes = np.full(len(keys), -1, dtype=np.intp)
+        if not len(keys):
+            return codes
+        query = np.asarray(keys)
+        comparable = query.dtype.kind == self.ids.dtype.kind or (
+            query.dtype.kind in 'iu' and self.ids.dtype.kind in 'iu'
+        )
+        if not comparable:
+            # Mixed or foreign key types: fall back to one lookup per key
+            return np.fromiter((self.get(key, -1) for key in keys), dtype=np.intp, count=len(keys))
+        if len(self.ids):
+            positions = np.minimum(np.searchsorted(self.ids, query, sorter=self.order), len(self.ids) - 1)
+            candidates = self.order[positions]
+            found = self.ids[candidates] == query
+            codes[found] = candidates[found]
+        if self.added:
+            for position in np.flatnonzero(np.isin(query, list(self.added))):
+                codes[position] = self.added[keys[position]]
+        return codes
+
+    def __getitem__(self, key) -> int:
+        code = self.get(key)
+        if code is None:
+            raise KeyError(key)
+        return code
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key, code: int):
+        self.added[key] = code
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.added)
+
+    def __iter__(self):
+        yield from self.ids.tolist()
+        yield from self.added
+
+    def items(self):
+        yield from ((key, code) for code, key in enumerate(self.ids.tolist()))
+        yield from self.added.items()
+
+
+class IdList:
+    """List of ids by code over an id array; appended ids live in memory."""
+
+    def __init__(self, ids: np.ndarray):
+        self.ids = ids
+        self.tail: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.tail)
+
+    def __getitem__(self, code):
+        code = int(code)
+        if code < len(self.ids):
+            return self.ids[code].item()
+        return self.tail[code - len(self.ids)]
+
+    def __setitem__(self, code, key):
+        # Used as a reverse map: only appending (or rewriting the same id) is valid
+        code = int(code)
+        if code == len(self):
+            self.append(key)
+        elif code >= len(self.ids):
+            self.tail[code - len(self.ids)] = key
+        elif self[code] != key:
+            raise ValueError(f"Cannot reassign stored id at code {code}")
+
+    def __iter__(self):
+        yield from self.ids.tolist()
+        yield from self.tail
+
+    def append(self, key):
+        self.tail.append(key)
+
+    def get(self, code, default=None):
+        return self[code] if 0 <= int(code) < len(self) else default
+
+
+def _id_array(ids) -> np.ndarray:
+    """Ids as a fixed-width string or integer array (object arrays cannot be mapped)."""
+    array = np.asarray(list(ids))
+    if array.size == 0:
+        return np.empty(0, dtype='<U1')
+    if array.dtype.kind not in 'Uiu':
+        raise ValueError(f"Ids must be all strings or all integers, got dtype {array.dtype}")
+    return array
+
+
+def write_artifact(path: Union[str, Path], arrays: Dict[str, np.ndarray],
+                   metadata: Optional[Dict[str, Any]] = None,
+                   documents: Optional[Dict[str, Any]] = None) -> Path:
+    """Write arrays as ``.npy`` files plus a manifest into the directory ``path``.
+
+    The artifact is staged next to ``path`` and renamed into place, so
+    readers see either the previous artifact or the complete new one.
+    Workers that still map files of a replaced artifact keep valid pages.
+    ``documents`` are small JSON files (e.g. the product catalog).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f'.{path.name}.', dir=path.parent))
+    try:
+        entries = {}
+        for name, array in arrays.items():
+            if array is None:
+                continue
+            array = np.ascontiguousarray(array)
+            if array.dtype.hasobject:
+                raise ValueError(f"Array '{name}' has object dtype and cannot be memory-mapped")
+            filename = name.replace('/', '.') + '.npy'
+            np.save(staging / filename, array, allow_pickle=False)
+            entries[name] = {'file': filename, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        for filename, document in (documents or {}).items():
+            with open(staging / filename, 'w') as f:
+                json.dump(document, f)
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'created_at': datetime.now().isoformat(),
+            'arrays': entries,
+            'documents': sorted(documents or {}),
+            'metadata': metadata or {}
+        }
+        with open(staging / MANIFEST_NAME, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        retired = None
+        if path.exists():
+            retired = Path(tempfile.mkdtemp(prefix=f'.{path.name}.old.', dir=path.parent))
+            os.replace(path, retired / path.name)
+        os.replace(staging, path)
+        if retired is not None:
+            shutil.rmtree(retired, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return path
+
+
+def read_artifact(path: Union[str, Path], mmap_mode: Optional[str] = 'r'
+                  ) -> Tuple[Dict[str, np.ndarray], Dict[str, Any], Dict[str, Any]]:
+    """Open an artifact written by ``write_artifact``; returns (arrays, metadata, documents).
+
+    Arrays are memory-mapped with ``mmap_mode`` (``None`` reads them into
+    memory), so opening costs a few syscalls per array regardless of size.
+    """
+    path = Path(path)
+    with open(path / MANIFEST_NAME) as f:
+        manifest = json.load(f)
+    version = manifest.get('format_version')
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version {version} (expected {FORMAT_VERSION})")
+
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        array = np.load(path / entry['file'], mmap_mode=mmap_mode, allow_pickle=False)
+        if array.dtype.str != entry['dtype'] or list(array.shape) != entry['shape']:
+            raise ValueError(f"Array '{name}' does not match the manifest")
+        arrays[name] = array
+    documents = {}
+    for filename in manifest.get('documents', []):
+        with open(path / filename) as f:
+            documents[filename] = json.load(f)
+    return arrays, manifest['metadata'], documents
+
+
+def _id_arrays(prefix: str, ids) -> Dict[str, np.ndarray]:
+    array = _id_array(ids)
+    return {f'{prefix}/ids': array, f'{prefix}/order': np.argsort(array, kind='stable')}
+
+
+def _id_index(arrays: Dict[str, np.ndarray], prefix: str) -> IdIndex:
+    return IdIndex(arrays[f'{prefix}/ids'], arrays[f'{prefix}/order'])
+
+
+def _matrix_arrays(name: str, matrix, n_rows: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Arrays for a dense or row-quantized matrix (int8 codes plus ``/scales``)."""
+    if isinstance(matrix, QuantizedRows):
+        if n_rows is not None:
+            matrix = matrix.head(n_rows)
+        return {name: matrix.codes, f'{name}/scales': matrix.scales}
+    return {name: matrix if n_rows is None or matrix is None else matrix[:n_rows]}
+
+
+def _matrix(arrays: Dict[str, np.ndarray], name: str):
+    if f'{name}/scales' in arrays:
+        return QuantizedRows(arrays[name], arrays[f'{name}/scales'])
+    return arrays[name]
+
+
+def save_engine(engine: RecommendationEngine, path: Union[str, Path]) -> Path:
+    """Write a trained engine's serving state as a memory-mappable artifact.
+
+    Stores MF factors, biases and fold-in parameters, the top-N table, the
+    ANN index, the neighbour table, the item similarity matrix, the frozen
+    scaler, the interaction store and every id map. User profiles are not
+    stored; a loaded engine serves known users from the neighbour table.
+    """
+    mf = engine.mf_model
+    algorithm = 'als' if isinstance(mf, ImplicitALSRecommender) else 'svd'
+    arrays: Dict[str, np.ndarray] = {}
+    metadata: Dict[str, Any] = {
+        'engine': {
+            'mf_algorithm': algorithm,
+            'mf_top_k': engine.mf_top_k,
+            'ann_n_probe': engine.ann_n_probe,
+            'ann_min_items': engine.ann_min_items,
+            'n_neighbours': engine.n_neighbours,
+            'item_top_k': engine.item_top_k,
+            'item_similarity': engine.item_similarity,
+            'storage': engine.storage,
+            'is_trained': engine.is_trained
+        },
+        'mf': {'trained': mf.trained}
+    }
+
+    # Interaction store (pending appends are compacted by reading matrix)
+    store = engine.interactions
+    matrix = store.matrix
+    arrays.update(_id_arrays('store/users', store.user_ids))
+    arrays.update(_id_arrays('store/items', store.item_ids))
+    arrays.update({'store/data': matrix.data, 'store/indices': matrix.indices, 'store/indptr': matrix.indptr})
+    metadata['store'] = {'event_weights': store.event_weights, 'compact_threshold': store.compact_threshold}
+
+    if mf.trained:
+        n_users = len(mf.user_map)
+        user_ids = [mf.reverse_user_map[row] for row in range(n_users)]
+        item_ids = [mf.reverse_item_map[col] for col in range(len(mf.item_map))]
+        arrays.update(_id_arrays('mf/users', user_ids))
+        arrays.update(_id_arrays('mf/items', item_ids))
+        # Fold-in may have grown the factor arrays past the last user
+        arrays.update(_matrix_arrays('mf/user_factors', mf.user_factors, n_users))
+        arrays['mf/item_factors'] = mf.item_factors
+        if mf.user_bias is not None:
+            arrays['mf/user_bias'] = mf.user_bias[:n_users]
+            arrays['mf/item_bias'] = mf.item_bias
+        metadata['mf'].update({
+            'global_mean': float(mf.global_mean),
+            'rating_scale': [float(x) for x in mf.rating_scale]
+        })
+        if algorithm == 'als':
+            arrays['mf/item_gram'] = mf.item_gram
+            metadata['mf'].update({
+                'factors': mf.factors, 'regularization': mf.regularization, 'alpha': mf.alpha,
+                'iterations': mf.iterations, 'cg_steps': mf.cg_steps, 'random_state': mf.random_state
+            })
+        else:
+            metadata['mf'].update({'reg_pu': mf.model.reg_pu, 'reg_bu': mf.model.reg_bu})
+
+        snapshot = mf.top_n_table
+        if snapshot is not None:
+            _, table_items, table = snapshot
+            arrays['top_n/items'] = _id_array(table_items)
+            arrays['top_n/table'] = table
+        snapshot = mf.ann_index
+        if snapshot is not None:
+            index_items, index = snapshot
+            arrays['ann/items'] = _id_array(index_items)
+            for name in ('centroids', 'centroid_norms', 'list_offsets', 'list_items'):
+                arrays[f'ann/{name}'] = getattr(index, name)
+            arrays.update(_matrix_arrays('ann/list_vectors', index.list_vectors))
+            metadata['ann'] = {'n_lists': index.n_lists, 'n_probe': index.n_probe, 'storage': index.storage}
+
+    similarity = engine.item_similarity_model
+    if similarity is not None:
+        arrays.update({
+            'items/data': similarity.data,
+            'items/indices': similarity.indices,
+            'items/indptr': similarity.indptr
+        })
+
+    snapshot = engine.user_similarity_model
+    if snapshot is not None:
+        _, neighbour_users, indices, similarities = snapshot
+        arrays.update(_id_arrays('neighbours/users', neighbour_users))
+        arrays['neighbours/indices'] = indices
+        arrays['neighbours/similarities'] = similarities
+    metadata['features'] = {'columns': list(engine.user_feature_columns)}
+    if hasattr(engine.scaler, 'mean_'):
+        arrays['scaler/mean'] = engine.scaler.mean_
+        arrays['scaler/var'] = engine.scaler.var_
+        arrays['scaler/scale'] = engine.scaler.scale_
+        metadata['features']['n_samples_seen'] = int(np.max(engine.scaler.n_samples_seen_))
+
+    return write_artifact(path, arrays, metadata, {'catalog.json': list(engine.product_features.values())})
+
+
+def load_engine(path: Union[str, Path], mmap_mode: Optional[str] = 'r') -> RecommendationEngine:
+    """Rebuild a serving engine from ``save_engine`` output without training.
+
+    Large arrays stay memory-mapped (read-only with the default mode), so
+    workers share their pages; fold-in copies the arrays it writes to.
+    """
+    arrays, metadata, documents = read_artifact(path, mmap_mode=mmap_mode)
+    settings = metadata['engine']
+    engine = RecommendationEngine(
+        mf_top_k=settings['mf_top_k'],
+        ann_n_probe=settings['ann_n_probe'],
+        # Artifacts written before the threshold existed always built the index
+        ann_min_items=settings.get('ann_min_items', 0),
+        mf_algorithm=settings['mf_algorithm'],
+        n_neighbours=settings['n_neighbours'],
+        item_top_k=settings['item_top_k'],
+        item_similarity=settings['item_similarity'],
+        storage=settings['storage']
+    )
+    engine.update_catalog(documents['catalog.json'])
+
+    store = InteractionStore(**metadata['store'])
+    store.user_ids = IdList(arrays['store/users/ids'])
+    store.user_index = _id_index(arrays, 'store/users')
+    store.item_ids = IdList(arrays['store/items/ids'])
+    store.item_index = _id_index(arrays, 'store/items')
+    store._matrix = sp.csr_matrix(
+        (arrays['store/data'], arrays['store/indices'], arrays['store/indptr']),
+        shape=(len(store.user_ids), len(store.item_ids)),
+        copy=False
+    )
+    engine.interactions = store
+
+    mf = engine.mf_model
+    if metadata['mf']['trained']:
+        params = metadata['mf']
+        if settings['mf_algorithm'] == 'als':
+            for name in ('factors', 'regularization', 'alpha', 'iterations', 'cg_steps', 'random_state'):
+                setattr(mf, name, params[name])
+            mf.item_gram = arrays['mf/item_gram']
+        else:
+            mf.model = SVD(reg_pu=params['reg_pu'], reg_bu=params['reg_bu'])
+        mf.user_map = _id_index(arrays, 'mf/users')
+        mf.item_map = _id_index(arrays, 'mf/items')
+        mf.reverse_user_map = IdList(arrays['mf/users/ids'])
+        mf.reverse_item_map = IdList(arrays['mf/items/ids'])
+        mf.user_factors = _matrix(arrays, 'mf/user_factors')
+        mf.item_factors = arrays['mf/item_factors']
+        mf.user_bias = arrays.get('mf/user_bias')
+        mf.item_bias = arrays.get('mf/item_bias')
+        mf.global_mean = params['global_mean']
+        mf.rating_scale = tuple(params['rating_scale'])
+        if 'top_n/table' in arrays:
+            mf.top_n_table = (mf.user_map, arrays['top_n/items'], arrays['top_n/table'])
+        if 'ann/centroids' in arrays:
+            index = InnerProductIndex(**metadata['ann'])
+            for name in ('centroids', 'centroid_norms', 'list_offsets', 'list_items'):
+                setattr(index, name, arrays[f'ann/{name}'])
+            index.list_vectors = _matrix(arrays, 'ann/list_vectors')
+            mf.ann_index = (arrays['ann/items'], index)
+        mf.trained = True
+
+    if 'items/indptr' in arrays:
+        n_rows = len(arrays['items/indptr']) - 1
+        engine.item_similarity_model = sp.csr_matrix(
+            (arrays['items/data'], arrays['items/indices'], arrays['items/indptr']),
+            shape=(n_rows, n_rows),
+            copy=False
+        )
+
+    features = metadata['features']
+    engine.user_feature_columns = features['columns']
+    if 'neighbours/indices' in arrays:
+        engine.user_similarity_model = (
+            _id_index(arrays, 'neighbours/users'),
+            IdList(arrays['neighbours/users/ids']),
+            arrays['neighbours/indices'],
+            arrays['neighbours/similarities']
+        )
+    if 'scaler/mean' in arrays:
+        scaler = StandardScaler()
+        scaler.mean_ = np.array(arrays['scaler/mean'])
+        scaler.var_ = np.array(arrays['scaler/var'])
+        scaler.scale_ = np.array(arrays['scaler/scale'])
+        scaler.n_features_in_ = len(scaler.mean_)
+        scaler.n_samples_seen_ = features['n_samples_seen']
+        scaler.feature_names_in_ = np.array(features['columns'], dtype=object)
+        engine.scaler = scaler
+    engine.is_trained = settings['is_trained']
+    return engine
+
+
+def _counter_arrays(prefix: str, counters: List) -> Dict[str, np.ndarray]:
+    """CSR layout of per-user counters (``/counts``) or sets, keeping their order."""
+    counted = all(isinstance(counter, dict) for counter in counters)
+    return {
+        f'{prefix}/indptr': np.cumsum([0] + [len(counter) for counter in counters], dtype=np.int64),
+        f'{prefix}/values': _id_array(value for counter in counters for value in counter),
+        f'{prefix}/counts': np.fromiter(
+            (count for counter in counters for count in counter.values()), dtype=np.int64
+        ) if counted else None
+    }
+
+
+def _counters(arrays: Dict[str, np.ndarray], prefix: str) -> List[List[Tuple[Any, int]]]:
+    bounds = arrays[f'{prefix}/indptr'].tolist()
+    values = arrays[f'{prefix}/values'].tolist()
+    counts = arrays[f'{prefix}/counts'].tolist() if f'{prefix}/counts' in arrays else [1] * len(values)
+    pairs = list(zip(values, counts))
+    return [pairs[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _timed_value_arrays(prefix: str, lists: List[List[Tuple[int, int, Any]]]) -> Dict[str, np.ndarray]:
+    """CSR layout of per-session (event time, arrival, value) lists."""
+    entries = [entry for entries in lists for entry in entries]
+    return {
+        f'{prefix}/indptr': np.cumsum([0] + [len(entries) for entries in lists], dtype=np.int64),
+        f'{prefix}/times': np.array([entry[0] for entry in entries], dtype=np.int64),
+        f'{prefix}/arrivals': np.array([entry[1] for entry in entries], dtype=np.int64),
+        f'{prefix}/values': _id_array(entry[2] for entry in entries)
+    }
+
+
+def _timed_values(arrays: Dict[str, np.ndarray], prefix: str) -> List[List[Tuple[int, int, Any]]]:
+    bounds = arrays[f'{prefix}/indptr'].tolist()
+    entries = list(zip(
+        arrays[f'{prefix}/times'].tolist(), arrays[f'{prefix}/arrivals'].tolist(), arrays[f'{prefix}/values'].tolist()
+    ))
+    return [entries[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _sessionizer_arrays(sessionizer: StreamingSessionizer) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Open sessions and watermark of a ``StreamingSessionizer``."""
+    sessions = [session for user_sessions in sessionizer.open_sessions.values() for session in user_sessions]
+    arrays = {
+        'stream/users': _id_array(session.user_id for session in sessions),
+        'stream/bounds': np.array([[session.start, session.end, session.num_actions] for session in sessions],
+                                  dtype=np.int64).reshape(len(sessions), 3),
+        'stream/counts': np.array([list(session.counts.values()) for session in sessions],
+                                  dtype=np.int64).reshape(len(sessions), len(DataProcessor.SESSION_ACTIONS)),
+        **_counter_arrays('stream/devices', [session.devices for session in sessions]),
+        **_timed_value_arrays('stream/products', [session.products for session in sessions]),
+        **_timed_value_arrays('stream/categories', [session.categories for session in sessions])
+    }
+    metadata = {
+        'session_timeout': sessionizer.session_timeout,
+        'allowed_lateness': sessionizer.allowed_lateness,
+        'max_event_time': sessionizer.max_event_time,
+        'late_events': sessionizer.late_events,
+        'next_session_id': sessionizer.next_session_id,
+        'counts': list(DataProcessor.SESSION_ACTIONS.values())
+    }
+    return arrays, metadata
+
+
+def save_profile_store(store: ProfileStore, path: Union[str, Path],
+                       sessionizer: Optional[StreamingSessionizer] = None) -> Path:
+    """Write a ``ProfileStore``'s aggregates so later batches can be folded in after loading.
+
+    Pass the ``StreamingSessionizer`` that feeds the store to save its
+    open sessions too (``load_sessionizer``), so a session spanning the
+    save point is still folded once.
+    """
+    aggregates = list(store.aggregates.values())
+    first_seen = pd.DatetimeIndex([aggregate.first_seen for aggregate in aggregates])
+    last_seen = pd.DatetimeIndex([aggregate.last_seen for aggregate in aggregates]).as_unit(first_seen.unit)
+    arrays = {
+        'users': _id_array(aggregate.user_id for aggregate in aggregates),
+        'first_seen': first_seen.asi8,
+        'last_seen': last_seen.asi8,
+        'total_sessions': np.array([aggregate.total_sessions for aggregate in aggregates], dtype=np.int64),
+        'total_duration_seconds': np.array([aggregate.total_duration_seconds for aggregate in aggregates],
+                                           dtype=np.float64),
+        'totals': np.array([list(aggregate.totals.values()) for aggregate in aggregates],
+                           dtype=np.int64).reshape(len(aggregates), len(SUMMED_COLUMNS)),
+        **_counter_arrays('products', [aggregate.products for aggregate in aggregates]),
+        **_counter_arrays('categories', [aggregate.categories for aggregate in aggregates]),
+        **_counter_arrays('devices', [aggregate.devices for aggregate in aggregates])
+    }
+    metadata = {'profiles': {
+        'unit': first_seen.unit,
+        'has_devices': store.has_devices,
+        'totals': list(SUMMED_COLUMNS.values())
+    }}
+    if sessionizer is not None:
+        stream_arrays, metadata['stream'] = _sessionizer_arrays(sessionizer)
+        arrays.update(stream_arrays)
+    return write_artifact(path, arrays, metadata)
+
+
+def load_profile_store(path: Union[str, Path]) -> ProfileStore:
+    """Rebuild a ``ProfileStore`` from ``save_profile_store`` output."""
+    arrays, metadata, _ = read_artifact(path, mmap_mode=None)
+    settings = metadata['profiles']
+    store = ProfileStore()
+    store.has_devices = settings['has_devices']
+    unit = settings['unit']
+    first_seen = pd.to_datetime(arrays['first_seen'], unit=unit).as_unit(unit)
+    last_seen = pd.to_datetime(arrays['last_seen'], unit=unit).as_unit(unit)
+    rows = zip(
+        arrays['users'].tolist(), first_seen, last_seen, arrays['total_sessions'].tolist(),
+        arrays['total_duration_seconds'].tolist(), arrays['totals'].tolist(),
+        _counters(arrays, 'products'), _counters(arrays, 'categories'), _counters(arrays, 'devices')
+    )
+    for user_id, first, last, sessions, duration, totals, products, categories, devices in rows:
+        aggregate = ProfileAggregate(user_id, first, last, sessions, duration, dict(zip(settings['totals'], totals)))
+        aggregate.products = {product for product, _ in products}
+        aggregate.categories = dict(categories)
+        aggregate.devices = dict(devices)
+        store.aggregates[user_id] = aggregate
+    return store
+
+
+def load_sessionizer(path: Union[str, Path]) -> Optional[StreamingSessionizer]:
+    """Rebuild the ``StreamingSessionizer`` saved with a profile store, or None if none was saved."""
+    arrays, metadata, _ = read_artifact(path, mmap_mode=None)
+    settings = metadata.get('stream')
+    if settings is None:
+        return None
+    sessionizer = StreamingSessionizer(
+        pd.Timedelta(settings['session_timeout']), pd.Timedelta(settings['allowed_lateness']),
+        first_session_id=settings['next_session_id']
+    )
+    sessionizer.max_event_time = settings['max_event_time']
+    sessionizer.late_events = settings['late_events']
+    rows = zip(
+        arrays['stream/users'].tolist(), arrays['stream/bounds'].tolist(), arrays['stream/counts'].tolist(),
+        _counters(arrays, 'stream/devices'), _timed_values(arrays, 'stream/products'),
+        _timed_values(arrays, 'stream/categories')
+    )
+    sessions = []
+    for user_id, (start, end, num_actions), counts, devices, products, categories in rows:
+        session = _OpenSession(user_id, start)
+        session.end = end
+        session.num_actions = num_actions
+        session.counts = dict(zip(settings['counts'], counts))
+        session.devices = {device for device, _ in devices}
+        session.products = [tuple(entry) for entry in products]
+        session.categories = [tuple(entry) for entry in categories]
+        sessions.append(session)
+    sessionizer.restore(sessions)
+    return sessionizer
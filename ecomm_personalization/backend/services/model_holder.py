@@ -0,0 +1,118 @@
+from typing import List, Dict, Optional, Callable, Tuple
+import threading
+import weakref
+from services.model_artifacts import load_engine
+from services.recommendation_engine import RecommendationEngine
+
+
+class ModelHolder:
+    """Double-buffered holder that publishes complete engine snapshots.
+
+    Requests read ``current`` once and keep using that engine until they
+    finish; the read is a plain attribute load, so the hot path takes no
+    locks. Retraining builds a new engine off to the side and publishes it
+    with one reference assignment. The holder drops its reference to the
+    previous engine at that point, so it is freed (and ``on_retire`` is
+    called) only when the last request still holding it returns.
+
+    Interactions recorded while a retrain runs are logged and replayed
+    into the new engine. The log is drained and closed under the same lock
+    as the swap, and a recording that finds its engine retired by then is
+    applied again to the new one, so none is lost.
+    """
+
+    def __init__(self, engine: Optional[RecommendationEngine] = None,
+                 engine_factory: Callable[[], RecommendationEngine] = RecommendationEngine,
+                 on_retire: Optional[Callable[[int], None]] = None):
+        self.engine_factory = engine_factory
+        self.on_retire = on_retire
+        self.version = 0
+        self.current: RecommendationEngine = None
+        # Serializes writers (train/publish); readers never touch it
+        self._publish_lock = threading.Lock()
+        # Orders replay-log appends against the final drain and swap
+        self._replay_lock = threading.Lock()
+        # (user_id, product_id, event_type) recorded while a retrain runs
+        self._replay: Optional[List[Tuple[str, str, Optional[str]]]] = None
+        self.publish(engine if engine is not None else engine_factory())
+
+    def publish(self, engine: RecommendationEngine) -> int:
+        """Make ``engine`` the snapshot new requests see; returns its version."""
+        with self._publish_lock:
+            return self._swap(engine)
+
+    def _swap(self, engine: RecommendationEngine) -> int:
+        self.version += 1
+        if self.on_retire is not None:
+            weakref.finalize(engine, self.on_retire, self.version)
+        self.current = engine
+        return self.version
+
+    def record_interaction(self, user_id: str, product_id: str,
+                           event_type: Optional[str] = 'product_view') -> bool:
+        """Record an interaction on the live engine, keeping it for a retrain in flight."""
+        while True:
+            engine = self.current
+            recorded = engine.record_interaction(user_id, product_id, event_type)
+            with self._replay_lock:
+                if self.current is engine:
+                    if self._replay is not None:
+                        self._replay.append((user_id, product_id, event_type))
+                    return recorded
+            # Swapped out while recording, after the log was drained: record on the new engine too
+
+    def retrain(self, user_profiles: List[Dict], products: List[Dict],
+                background: bool = True) -> Optional[threading.Thread]:
+        """Train a fresh engine and publish it; the live engine keeps serving meanwhile."""
+        def build():
+            engine = self.engine_factory()
+            if engine.train(user_profiles, products):
+                return engine
+            return None
+        return self._run(build, background, 'model-retrain')
+
+    def reload(self, path: str, background: bool = True) -> Optional[threading.Thread]:
+        """Publish an engine loaded from a model artifact (e.g. written by another process)."""
+        def build():
+            return load_engine(path)
+        return self._run(build, background, 'model-reload')
+
+    def _run(self, build: Callable[[], Optional[RecommendationEngine]], background: bool,
+             name: str) -> Optional[threading.Thread]:
+        def run():
+            with self._publish_lock:
+                with self._replay_lock:
+                    self._replay = []
+                try:
+                    engine = build()
+                    if engine is not None:
+                        self._replay_into(engine)
+                finally:
+                    with self._replay_lock:
+                        self._replay = None
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def _replay_into(self, engine: RecommendationEngine):
+        """Apply interactions recorded during the build, then drain the rest and swap atomically."""
+        replay = self._replay
+        # Most of the log is applied without blocking recorders
+        applied = self._apply(engine, replay, 0)
+        with self._replay_lock:
+            self._apply(engine, replay, applied)
+            self._swap(engine)
+            self._replay = None
+
+    @staticmethod
+    def _apply(engine: RecommendationEngine, replay: List[Tuple[str, str, Optional[str]]], start: int) -> int:
+        """Record ``replay[start:]`` (including entries appended meanwhile); returns the new length."""
+        applied = start
+        while applied < len(replay):
+            engine.record_interaction(*replay[applied])
+            applied += 1
+        return applied
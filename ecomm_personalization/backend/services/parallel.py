@@ -0,0 +1,98 @@
+from typing import List, Dict, Any, Callable, Optional, Sequence
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+
+def partition_by_user(users: pd.Series, n_partitions: int) -> List[np.ndarray]:
+    """Row positions of each partition, hashing users like ``services.sharding``.
+
+    A user's rows all land in one partition (the same one as the user's
+    serving shard for ``n_partitions`` shards), in their original order.
+    Rows without a user go to partition 0.
+    """
+    from services.sharding import shard_for
+    codes, uniques = pd.factorize(users)
+    shards = np.fromiter((shard_for(user, n_partitions) for user in uniques), dtype=np.int64, count=len(uniques))
+    assignment = np.where(codes >= 0, shards[codes], 0) if len(uniques) else np.zeros(len(codes), dtype=np.int64)
+    order = np.argsort(assignment, kind='stable')
+    return np.split(order, np.cumsum(np.bincount(assignment, minlength=n_partitions))[:-1])
+
+
+class PackedFrame:
+    """Columns of some rows of a DataFrame as compact arrays for pickling.
+
+    Numeric, boolean and datetime columns are sliced NumPy arrays and
+    categoricals are their codes plus the (shared) dtype; other columns are
+    int32 codes into the values the rows actually use, so each distinct
+    string is pickled once per partition instead of once per row.
+    """
+
+    def __init__(self, columns: Dict[str, Any], length: int):
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def encoder(cls, frame: pd.DataFrame,
+                columns: Optional[Sequence[str]] = None) -> Callable[[np.ndarray], 'PackedFrame']:
+        """Factorize ``frame`` once; the returned function packs rows at given positions."""
+        encoded = {}
+        for name in (columns if columns is not None else frame.columns):
+            values = frame[name]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                encoded[name] = (values.cat.codes.to_numpy(), values.dtype)
+            elif values.dtype.kind in 'biufcmM':
+                encoded[name] = (values.to_numpy(), None)
+            else:
+                encoded[name] = pd.factorize(values)
+
+        def pack(positions: np.ndarray) -> 'PackedFrame':
+            packed = {}
+            for name, (values, uniques) in encoded.items():
+                if uniques is None or isinstance(uniques, pd.CategoricalDtype):
+                    packed[name] = (values[positions], uniques)
+                    continue
+                codes = values[positions]
+                present = codes >= 0
+                used = np.bincount(codes[present], minlength=len(uniques)) > 0
+                remap = (np.cumsum(used) - 1).astype(np.int32)
+                packed[name] = (np.where(present, remap[np.maximum(codes, 0)], -1).astype(np.int32), uniques[used])
+            return cls(packed, len(positions))
+
+        return pack
+
+    def to_frame(self) -> pd.DataFrame:
+        columns = {}
+        for name, (values, uniques) in self.columns.items():
+            if uniques is None:
+                columns[name] = values
+            elif isinstance(uniques, pd.CategoricalDtype):
+                columns[name] = pd.Categorical.from_codes(values, dtype=uniques)
+            else:
+                columns[name] = uniques.take(values, allow_fill=True, fill_value=np.nan)
+        return pd.DataFrame(columns, index=pd.RangeIndex(self.length))
+
+
+def _run_partition(function: Callable, packed: PackedFrame, args: tuple):
+    return function(packed.to_frame(), *args)
+
+
+def map_partitions(function: Callable, frame: pd.DataFrame, user_column: str, n_jobs: int,
+                   n_partitions: Optional[int] = None, columns: Optional[Sequence[str]] = None,
+                   args: tuple = (), start_method: str = 'spawn') -> List[Any]:
+    """Run ``function(partition_frame, *args)`` on user-hash partitions in worker processes.
+
+    ``function`` must be importable by the workers (module level). Only
+    ``columns`` are shipped, packed as ``PackedFrame``; partition frames
+    keep the original row order. Empty partitions are skipped and results
+    come back in partition order.
+    """
+    partitions = [
+        positions for positions in partition_by_user(frame[user_column], n_partitions or n_jobs) if len(positions)
+    ]
+    pack = PackedFrame.encoder(frame, columns)
+    context = multiprocessing.get_context(start_method)
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context) as executor:
+        futures = [executor.submit(_run_partition, function, pack(positions), args) for positions in partitions]
+        return [future.result() for future in futures]
@@ -0,0 +1,149 @@
+from typing import List, Dict, Any, Iterable, Optional
+import numpy as np
+import pandas as pd
+
+# Summed session columns and the profile columns they feed
+SUMMED_COLUMNS = {
+    'page_views': 'total_page_views',
+    'product_views': 'total_product_views',
+    'add_to_cart': 'total_add_to_cart',
+    'purchase': 'total_purchases'
+}
+
+
+class ProfileAggregate:
+    """Mergeable running totals behind one ``create_user_profiles`` row.
+
+    Counts, sums and first/last seen merge by addition and min/max; the
+    distinct products are kept as a set and categories and devices as
+    counters (categories in first-seen order, for the top-3 tie-break).
+    """
+    __slots__ = ('user_id', 'first_seen', 'last_seen', 'total_sessions', 'total_duration_seconds', 'totals',
+                 'products', 'categories', 'devices')
+
+    def __init__(self, user_id, first_seen, last_seen, total_sessions: int = 0,
+                 total_duration_seconds: float = 0.0, totals: Optional[Dict[str, int]] = None):
+        self.user_id = user_id
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.total_sessions = total_sessions
+        self.total_duration_seconds = total_duration_seconds
+        self.totals = totals if totals is not None else dict.fromkeys(SUMMED_COLUMNS.values(), 0)
+        self.products = set()
+        self.categories: Dict[Any, int] = {}
+        self.devices: Dict[Any, int] = {}
+
+    def merge(self, other: 'ProfileAggregate'):
+        """Fold in ``other``, which must cover later sessions of the same user."""
+        self.first_seen = min(self.first_seen, other.first_seen)
+        self.last_seen = max(self.last_seen, other.last_seen)
+        self.total_sessions += other.total_sessions
+        self.total_duration_seconds += other.total_duration_seconds
+        for column, value in other.totals.items():
+            self.totals[column] += value
+        self.products |= other.products
+        for counter, counts in ((self.categories, other.categories), (self.devices, other.devices)):
+            for value, count in counts.items():
+                counter[value] = counter.get(value, 0) + count
+
+    def profile(self, with_device: bool = False) -> Dict[str, Any]:
+        profile = {
+            'user_id': self.user_id,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'total_sessions': self.total_sessions,
+            'total_duration_seconds': self.total_duration_seconds,
+            'avg_session_duration': self.total_duration_seconds / self.total_sessions,
+            **self.totals,
+            'conversion_rate': self.totals['total_purchases'] / self.total_sessions,
+            'unique_products_viewed': len(self.products),
+            'unique_categories_viewed': len(self.categories)
+        }
+        if with_device:
+            # Like Series.mode: highest count, ties to the smallest value
+            profile['primary_device'] = min(
+                self.devices.items(), key=lambda item: (-item[1], item[0])
+            )[0] if self.devices else None
+        # sorted is stable, so equal counts keep first-seen order
+        top = sorted(self.categories.items(), key=lambda item: item[1], reverse=True)[:3]
+        profile['top_categories'] = top if top else np.nan
+        return profile
+
+
+class ProfileStore:
+    """User profiles stored as mergeable aggregates.
+
+    ``update`` folds a batch of new ``extract_session_features`` rows into
+    the stored aggregates in time proportional to the batch; ``profiles``
+    renders the same columns as ``DataProcessor.create_user_profiles`` over
+    all sessions folded so far. Each session must be folded once, so feed
+    closed sessions only (e.g. those emitted by ``StreamingSessionizer``).
+    """
+
+    def __init__(self):
+        self.aggregates: Dict[Any, ProfileAggregate] = {}
+        self.has_devices = False
+
+    def __len__(self) -> int:
+        return len(self.aggregates)
+
+    def update(self, session_features: pd.DataFrame) -> List[Any]:
+        """Fold a batch of sessions in; returns the ids of the users it touched."""
+        if isinstance(session_features, list) or session_features.empty:
+            return []
+        sessions = session_features[session_features['user_id'].notna()]
+        codes, user_ids = pd.factorize(sessions['user_id'])
+        totals = sessions.groupby(codes, sort=True).agg(
+            first_seen=('start_time', 'min'),
+            last_seen=('end_time', 'max'),
+            total_sessions=('start_time', 'size'),
+            total_duration_seconds=('duration_seconds', 'sum'),
+            **{profile_column: (column, 'sum') for column, profile_column in SUMMED_COLUMNS.items()}
+        )
+        batch = [
+            ProfileAggregate(user_id, first, last, n_sessions, duration, dict(zip(SUMMED_COLUMNS.values(), sums)))
+            for user_id, first, last, n_sessions, duration, *sums in zip(
+                user_ids.tolist(), *(totals[column].tolist() for column in totals.columns)
+            )
+        ]
+
+        for code, product in self._explode(codes, sessions['products_viewed']):
+            batch[code].products.add(product)
+        for code, category in self._explode(codes, sessions['categories']):
+            counter = batch[code].categories
+            counter[category] = counter.get(category, 0) + 1
+        if 'device_type' in sessions.columns:
+            self.has_devices = True
+            devices = pd.Series(sessions['device_type'].to_numpy(), index=codes).dropna()
+            for code, device in zip(devices.index.tolist(), devices.tolist()):
+                counter = batch[code].devices
+                counter[device] = counter.get(device, 0) + 1
+
+        for aggregate in batch:
+            stored = self.aggregates.get(aggregate.user_id)
+            if stored is None:
+                self.aggregates[aggregate.user_id] = aggregate
+            else:
+                stored.merge(aggregate)
+        return user_ids.tolist()
+
+    @staticmethod
+    def _explode(codes: np.ndarray, lists: pd.Series) -> Iterable:
+        """(user code, element) pairs of list columns, in row order."""
+        exploded = pd.Series(lists.to_numpy(), index=codes).dropna().explode()
+        exploded = exploded[exploded.notna()]
+        return zip(exploded.index.tolist(), exploded.tolist())
+
+    def profiles(self, user_ids: Optional[Iterable] = None) -> pd.DataFrame:
+        """Profiles of ``user_ids`` (default: every stored user), sorted by user id."""
+        if user_ids is None:
+            aggregates = list(self.aggregates.values())
+        else:
+            aggregates = [self.aggregates[user_id] for user_id in user_ids if user_id in self.aggregates]
+        if not aggregates:
+            return pd.DataFrame()
+        profiles = pd.DataFrame([aggregate.profile(self.has_devices) for aggregate in aggregates])
+        if profiles['top_categories'].isna().all():
+            profiles = profiles.drop(columns='top_categories')
+        order = np.argsort(pd.factorize(profiles['user_id'], sort=True)[0], kind='stable')
+        return profiles.iloc[order].reset_index(drop=True)
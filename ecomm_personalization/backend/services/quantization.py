@@ -0,0 +1,95 @@
+from typing import Union
+import numpy as np
+
+# Supported storage modes for dense model matrices, largest first
+STORAGE_MODES = ('float64', 'float32', 'int8')
+
+
+class QuantizedRows:
+    """Row-scaled int8 matrix: row i is stored as ``codes[i] * scales[i]``.
+
+    Each row gets its own float32 scale (``max |x| / 127``), so the error
+    of any entry is at most half a step of its row. Indexing returns the
+    selected rows dequantized to float32, which lets scoring code treat it
+    like a dense array and only ever expand the rows it touches.
+    """
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def quantize(cls, matrix: np.ndarray) -> 'QuantizedRows':
+        matrix = np.asarray(matrix, dtype=np.float64)
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        scales = np.empty(len(matrix), dtype=np.float32)
+        rows = cls(codes, scales)
+        rows[:] = matrix
+        return rows
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def flags(self):
+        return self.codes.flags
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index) -> np.ndarray:
+        scales = self.scales[index]
+        return self.codes[index].astype(np.float32) * (scales[..., None] if np.ndim(scales) else scales)
+
+    def __setitem__(self, index, values):
+        values = np.asarray(values, dtype=np.float64)
+        peak = np.abs(values).max(axis=-1, initial=0.0)
+        scales = np.where(peak > 0, peak / 127.0, 1.0)
+        self.codes[index] = np.rint(values / (scales[..., None] if np.ndim(scales) else scales))
+        self.scales[index] = scales
+
+    def copy(self) -> 'QuantizedRows':
+        return QuantizedRows(np.array(self.codes), np.array(self.scales))
+
+    def head(self, n: int) -> 'QuantizedRows':
+        """The first ``n`` rows, still quantized (views, no copy)."""
+        return QuantizedRows(self.codes[:n], self.scales[:n])
+
+
+Matrix = Union[np.ndarray, QuantizedRows]
+
+
+def compact(matrix: np.ndarray, storage: str) -> Matrix:
+    """Store ``matrix`` as float64, float32 or row-scaled int8."""
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode: {storage}")
+    if storage == 'int8':
+        return matrix if isinstance(matrix, QuantizedRows) else QuantizedRows.quantize(matrix)
+    if isinstance(matrix, QuantizedRows):
+        matrix = matrix[:]
+    return np.ascontiguousarray(matrix, dtype=storage)
+
+
+def writable(matrix: Matrix) -> Matrix:
+    """``matrix`` itself if it can be written to, otherwise an in-memory copy."""
+    if matrix.flags.writeable:
+        return matrix
+    return matrix.copy() if isinstance(matrix, QuantizedRows) else np.array(matrix)
+
+
+def grow_rows(matrix: Matrix, capacity: int) -> Matrix:
+    """A copy of ``matrix`` with room for ``capacity`` rows (new rows are zero)."""
+    if isinstance(matrix, QuantizedRows):
+        codes = np.zeros((capacity, matrix.shape[1]), dtype=np.int8)
+        scales = np.ones(capacity, dtype=np.float32)
+        codes[:len(matrix)] = matrix.codes
+        scales[:len(matrix)] = matrix.scales
+        return QuantizedRows(codes, scales)
+    grown = np.zeros((capacity, matrix.shape[1]), dtype=matrix.dtype)
+    grown[:len(matrix)] = matrix
+    return grown
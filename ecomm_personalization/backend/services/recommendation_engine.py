@@ -1,6 +1,10 @@
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Tuple, Union
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from sklearn.neighbors import NearestNeighbors
+import scipy.sparse as sp
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
@@ -9,9 +13,58 @@ from datetime import datetime
 import json
 from surprise import SVD, Dataset, Reader
 from surprise.model_selection import train_test_split
+from services.ann_index import InnerProductIndex
+from services.candidate_pipeline import CatalogIndex, TwoStagePipeline
+from services.interaction_store import InteractionStore
+from services.item_similarity import ItemCooccurrence
+from services.quantization import STORAGE_MODES, compact, grow_rows, writable
+
+def _top_n_indices(scores: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n highest scores, best first, ties broken by position.
+
+    Uses partial selection so only the winning slice is sorted; the tie-break
+    reproduces a stable descending sort over the full array.
+    """
+    if n <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.intp)
+    if n < scores.size:
+        kth = scores[np.argpartition(-scores, n - 1)[:n]].min()
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:n - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+def _top_n_rows(scores: np.ndarray, n: int) -> np.ndarray:
+    """Row-wise _top_n_indices for a 2-D block of scores.
+
+    Rows whose top-n set is unambiguous are resolved together with one
+    partition and one lexsort; rows with ties straddling the cut fall back
+    to _top_n_indices.
+    """
+    n_rows, n_cols = scores.shape
+    n = min(n, n_cols)
+    if n <= 0:
+        return np.empty((n_rows, 0), dtype=np.intp)
+    if n < n_cols:
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        kth = np.take_along_axis(scores, top, axis=1).min(axis=1)
+        ambiguous = np.flatnonzero((scores >= kth[:, None]).sum(axis=1) != n)
+    else:
+        top = np.broadcast_to(np.arange(n_cols), (n_rows, n_cols))
+        ambiguous = np.empty(0, dtype=np.intp)
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    result = np.take_along_axis(top, np.lexsort((top, -top_scores), axis=1), axis=1)
+    for row in ambiguous:
+        result[row] = _top_n_indices(scores[row], n)
+    return result
 
 class MatrixFactorizationRecommender:
     """Matrix Factorization using Surprise SVD."""
+    # Catalogs (engine catalog, top-N table items, ...) whose model rows are kept
+    ITEM_ROW_CACHE_SIZE = 4
+
     def __init__(self):
         self.model = SVD()
         self.trained = False
@@ -19,48 +72,575 @@ class MatrixFactorizationRecommender:
         self.item_map = {}
         self.reverse_user_map = {}
         self.reverse_item_map = {}
+        # Trained parameters pulled out of the SVD model for vectorized scoring
+        self.user_factors = None
+        self.item_factors = None
+        self.user_bias = None
+        self.item_bias = None
+        self.global_mean = 0.0
+        self.rating_scale = (0.0, 0.0)
+        # (user_map, item_ids, top-K indices) snapshot built by materialize_top_n
+        self.top_n_table = None
+        # id(item_ids) -> (item_ids, item_map, map size, model rows) for catalogs mapped with cache=True
+        self._item_rows = {}
+        # (item_ids, InnerProductIndex) snapshot built by build_ann_index
+        self.ann_index = None
 
-    def fit(self, interactions):
+    def fit(self, interactions, item_ids=None, top_k=None):
         """
         interactions: list of dicts with keys 'user_id', 'item_id', 'rating'
+        item_ids/top_k: optionally materialize a per-user top-K table over item_ids
         """
         if not interactions:
             return
+        # Drop any table built from the previous model before retraining
+        self.top_n_table = None
+        self.ann_index = None
         df = pd.DataFrame(interactions)
         reader = Reader(rating_scale=(df['rating'].min(), df['rating'].max()))
         data = Dataset.load_from_df(df[['user_id', 'item_id', 'rating']], reader)
         trainset = data.build_full_trainset()
         self.model.fit(trainset)
         self.trained = True
-        # Build user/item maps for fast lookup
+        # Build user/item maps for fast lookup. Surprise assigns inner ids in
+        # order of first appearance, so these indices line up with pu/qi rows.
         self.user_map = {uid: i for i, uid in enumerate(df['user_id'].unique())}
         self.item_map = {iid: i for i, iid in enumerate(df['item_id'].unique())}
         self.reverse_user_map = {i: uid for uid, i in self.user_map.items()}
         self.reverse_item_map = {i: iid for iid, i in self.item_map.items()}
+        self._extract_parameters(trainset)
+        if item_ids is not None and top_k:
+            self.materialize_top_n(item_ids, top_k=top_k)
 
-    def recommend(self, user_id, item_ids, n=10):
-        """Recommend top-N items for a user from a list of item_ids."""
-        if not self.trained:
+    def fit_matrix(self, user_items: sp.csr_matrix, row_ids, column_ids, item_ids=None, top_k=None):
+        """Fit from a sparse (users x items) matrix, using stored strengths as ratings."""
+        coo = user_items.tocoo()
+        self.fit(
+            [
+                {'user_id': row_ids[u], 'item_id': column_ids[i], 'rating': float(r)}
+                for u, i, r in zip(coo.row, coo.col, coo.data)
+            ],
+            item_ids=item_ids,
+            top_k=top_k
+        )
+
+    def _extract_parameters(self, trainset):
+        """Copy factors and biases out of the SVD model once per fit."""
+        self.user_factors = np.ascontiguousarray(self.model.pu)
+        self.item_factors = np.ascontiguousarray(self.model.qi)
+        if self.model.biased:
+            self.user_bias = np.asarray(self.model.bu)
+            self.item_bias = np.asarray(self.model.bi)
+        else:
+            self.user_bias = None
+            self.item_bias = None
+        self.global_mean = trainset.global_mean
+        self.rating_scale = trainset.rating_scale
+
+    def compact(self, storage: str = 'float32'):
+        """Shrink the trained parameters for serving.
+
+        User factors become float32 or row-scaled int8 (they grow with the
+        user base); item factors and biases become float32 for either mode,
+        since they are the exact side of ANN re-ranking and fold-in solves.
+        Scoring dequantizes only the user rows it reads.
+        """
+        if not self.trained or storage == 'float64':
+            return
+        self.user_factors = compact(self.user_factors, storage)
+        self.item_factors = compact(self.item_factors, 'float32')
+        if self.user_bias is not None:
+            self.user_bias = self.user_bias.astype(np.float32)
+            self.item_bias = self.item_bias.astype(np.float32)
+
+    def _item_indices(self, item_ids, cache: bool = False) -> np.ndarray:
+        """Map raw item ids to model rows; unknown items map to -1.
+
+        With ``cache`` the rows are kept for this ``item_ids`` object (a
+        catalog that is replaced rather than mutated) until the item map is
+        refitted or grows, so repeated catalog scans skip the per-id mapping.
+        """
+        if cache:
+            cached = self._item_rows.get(id(item_ids))
+            if (cached is not None and cached[0] is item_ids and cached[1] is self.item_map
+                    and cached[2] == len(self.item_map)):
+                return cached[3]
+            rows = self._item_indices(item_ids)
+            if len(self._item_rows) >= self.ITEM_ROW_CACHE_SIZE:
+                self._item_rows.pop(next(iter(self._item_rows)), None)
+            self._item_rows[id(item_ids)] = (item_ids, self.item_map, len(self.item_map), rows)
+            return rows
+        # Loaded engines map ids through an IdIndex, which searches all keys at once
+        get_many = getattr(self.item_map, 'get_many', None)
+        if get_many is not None:
+            return get_many(item_ids)
+        return np.fromiter(
+            (self.item_map.get(iid, -1) for iid in item_ids),
+            dtype=np.intp,
+            count=len(item_ids)
+        )
+
+    def _score_block(self, user_idx: np.ndarray, item_idx: np.ndarray) -> np.ndarray:
+        """Estimate a (users x items) block of ratings from model rows (-1 = unknown).
+
+        Mirrors ``SVD.predict`` (including unknown user/item handling and
+        clipping to the rating scale) without a Python call per pair.
+        """
+        known_users = user_idx >= 0
+        known_items = item_idx >= 0
+        interaction = (
+            self.user_factors[user_idx[known_users]] @ self.item_factors[item_idx[known_items]].T
+        )
+        lower_bound, higher_bound = self.rating_scale
+        if self.user_bias is None and known_users.all() and known_items.all():
+            # Unbiased model with every row known: the product is the whole block
+            return np.clip(interaction, lower_bound, higher_bound, out=interaction)
+
+        both = np.ix_(known_users, known_items)
+        scores = np.full((len(user_idx), len(item_idx)), self.global_mean, dtype=np.float64)
+        if self.user_bias is not None:
+            scores[known_users] += self.user_bias[user_idx[known_users]][:, None]
+            scores[:, known_items] += self.item_bias[item_idx[known_items]]
+            scores[both] += interaction
+        else:
+            scores[both] = interaction
+        return np.clip(scores, lower_bound, higher_bound, out=scores)
+
+    def score_items(self, user_id, item_ids, cache: bool = False) -> np.ndarray:
+        """Estimate ratings for one user against many items in a single pass."""
+        user_idx = np.array([self.user_map.get(user_id, -1)], dtype=np.intp)
+        return self._score_block(user_idx, self._item_indices(item_ids, cache=cache))[0]
+
+    def recommend(self, user_id, item_ids, n=10, cache=False):
+        """Recommend top-N items for a user from a list of item_ids (``cache``: see _item_indices)."""
+        if not self.trained or not item_ids:
             return []
-        predictions = []
-        for item_id in item_ids:
-            pred = self.model.predict(user_id, item_id)
-            predictions.append((item_id, pred.est))
-        predictions.sort(key=lambda x: x[1], reverse=True)
-        return [iid for iid, _ in predictions[:n]]
+        item_ids = item_ids if cache else list(item_ids)
+        scores = self.score_items(user_id, item_ids, cache=cache)
+        return [item_ids[i] for i in _top_n_indices(scores, n)]
+
+    def materialize_top_n(self, item_ids, top_k=50, batch_size=1024):
+        """Precompute the top-K items from ``item_ids`` for every known user.
+
+        The table is stored as the smallest unsigned integer array that can
+        index ``item_ids``, one row per user in ``user_map`` order. It is
+        published with a single attribute assignment so readers see either
+        the previous table or the complete new one.
+        """
+        if not self.trained or not item_ids:
+            return
+        item_ids = list(item_ids)
+        top_k = min(top_k, len(item_ids))
+        item_idx = self._item_indices(item_ids)
+        table = np.empty((len(self.user_map), top_k), dtype=np.min_scalar_type(len(item_ids) - 1))
+
+        for start in range(0, len(self.user_map), batch_size):
+            user_idx = np.arange(start, min(start + batch_size, len(self.user_map)), dtype=np.intp)
+            table[start:start + len(user_idx)] = _top_n_rows(self._score_block(user_idx, item_idx), top_k)
+
+        self.top_n_table = (self.user_map, np.array(item_ids, dtype=object), table)
+
+    def _item_vectors(self, item_idx: np.ndarray) -> np.ndarray:
+        """Item factors with the item bias appended; unknown items are zero rows."""
+        vectors = np.zeros((len(item_idx), self.item_factors.shape[1] + 1))
+        known = item_idx >= 0
+        vectors[known, :-1] = self.item_factors[item_idx[known]]
+        if self.item_bias is not None:
+            vectors[known, -1] = self.item_bias[item_idx[known]]
+        return vectors
+
+    def _user_query(self, user_id) -> np.ndarray:
+        """Query vector whose inner product with _item_vectors ranks like predict."""
+        query = np.zeros(self.user_factors.shape[1] + 1)
+        u = self.user_map.get(user_id)
+        if u is not None:
+            query[:-1] = self.user_factors[u]
+        if self.item_bias is not None:
+            query[-1] = 1.0
+        return query
+
+    def build_ann_index(self, item_ids, **index_params):
+        """Build an approximate inner-product index over ``item_ids``."""
+        if not self.trained or not item_ids:
+            return
+        item_ids = list(item_ids)
+        index = InnerProductIndex(**index_params).fit(self._item_vectors(self._item_indices(item_ids)))
+        self.ann_index = (np.array(item_ids, dtype=object), index)
+
+    def recommend_approximate(self, user_id, n=10, n_candidates=None, n_probe=None):
+        """Top-N via ANN candidate generation plus exact re-ranking, or None without an index."""
+        snapshot = self.ann_index
+        if snapshot is None:
+            return None
+        item_ids, index = snapshot
+        candidates, _ = index.search(self._user_query(user_id), n_candidates or 4 * n, n_probe=n_probe)
+        # Re-rank in catalog order so ties resolve the same way as exact scoring
+        return self.recommend(user_id, item_ids[np.sort(candidates)].tolist(), n=n)
+
+    def recommend_precomputed(self, user_id, n=10):
+        """Serve top-N from the materialized table, or None if it cannot answer."""
+        snapshot = self.top_n_table
+        if snapshot is None:
+            return None
+        user_map, item_ids, table = snapshot
+        row = user_map.get(user_id)
+        # Users folded in after materialization have no row yet
+        if row is None or row >= table.shape[0] or n > table.shape[1]:
+            return None
+        return item_ids[table[row, :n]].tolist()
+
+    def recommend_batch(self, user_ids, item_ids, n=10, batch_size=1024, cache=False):
+        """Top-N for many users, matching recommend_precomputed/approximate/recommend per user.
+
+        Users with a materialized row are served by one gather from the
+        table. The rest go through the ANN index when one is built, otherwise
+        they are scored together in blocks of ``batch_size`` users.
+        """
+        results = [None] * len(user_ids)
+        if not self.trained:
+            return [[] for _ in user_ids]
+        pending = np.arange(len(user_ids))
+        snapshot = self.top_n_table
+        if snapshot is not None and n <= snapshot[2].shape[1]:
+            user_map, table_items, table = snapshot
+            rows = np.fromiter((user_map.get(u, -1) for u in user_ids), dtype=np.intp, count=len(user_ids))
+            served = (rows >= 0) & (rows < table.shape[0])
+            for position, recommended in zip(np.flatnonzero(served), table_items[table[rows[served], :n]].tolist()):
+                results[position] = recommended
+            pending = np.flatnonzero(~served)
+
+        if self.ann_index is not None:
+            for position in pending:
+                results[position] = self.recommend_approximate(user_ids[position], n=n)
+            return results
+        item_ids = item_ids if cache else list(item_ids)
+        item_idx = self._item_indices(item_ids, cache=cache)
+        for start in range(0, len(pending), batch_size):
+            block = pending[start:start + batch_size]
+            user_idx = np.fromiter(
+                (self.user_map.get(user_ids[p], -1) for p in block), dtype=np.intp, count=len(block)
+            )
+            for position, top in zip(block, _top_n_rows(self._score_block(user_idx, item_idx), n)):
+                results[position] = [item_ids[i] for i in top]
+        return results
+
+    def fold_in(self, user_id, interactions):
+        """Fit one user's factors from their interactions with item factors held fixed.
+
+        interactions: list of dicts with key 'item_id' and optional 'rating'.
+        Items the model has never seen are ignored. Cost is proportional to
+        the user's history (plus one catalog pass to refresh their top-K row).
+        """
+        if not self.trained or not interactions:
+            return False
+        item_idx = self._item_indices([i['item_id'] for i in interactions])
+        ratings = np.array([i.get('rating', 1) for i in interactions], dtype=np.float64)
+        known = item_idx >= 0
+        if not known.any():
+            return False
+        bias, factors = self._solve_user(item_idx[known], ratings[known])
+        self._set_user(user_id, factors, bias)
+        self._refresh_top_n(user_id)
+        return True
+
+    def _solve_user(self, item_idx: np.ndarray, ratings: np.ndarray):
+        """Ridge regression of ratings on fixed item factors (and bias, if biased)."""
+        item_factors = self.item_factors[item_idx]
+        if self.item_bias is None:
+            gram = item_factors.T @ item_factors + len(item_idx) * self.model.reg_pu * np.eye(item_factors.shape[1])
+            return None, np.linalg.solve(gram, item_factors.T @ ratings)
+        # Jointly solve [b_u, p_u] against features [1, q_i]; penalties mirror SGD's per-rating reg
+        design = np.hstack([np.ones((len(item_idx), 1)), item_factors])
+        target = ratings - self.global_mean - self.item_bias[item_idx]
+        penalty = np.full(design.shape[1], self.model.reg_pu)
+        penalty[0] = self.model.reg_bu
+        solution = np.linalg.solve(
+            design.T @ design + len(item_idx) * np.diag(penalty),
+            design.T @ target
+        )
+        return solution[0], solution[1:]
+
+    def _set_user(self, user_id, factors: np.ndarray, bias=None):
+        """Write a user's parameters, appending a row (amortized O(1)) for new users."""
+        row = self.user_map.get(user_id)
+        # Arrays mapped read-only from an artifact are copied on the first write
+        if not self.user_factors.flags.writeable:
+            self.user_factors = writable(self.user_factors)
+            if self.user_bias is not None:
+                self.user_bias = np.array(self.user_bias)
+        if row is None:
+            row = len(self.user_map)
+            if row >= len(self.user_factors):
+                capacity = max(2 * len(self.user_factors), 1)
+                self.user_factors = grow_rows(self.user_factors, capacity)
+                if self.user_bias is not None:
+                    grown_bias = np.zeros(capacity, dtype=self.user_bias.dtype)
+                    grown_bias[:len(self.user_bias)] = self.user_bias
+                    self.user_bias = grown_bias
+        self.user_factors[row] = factors
+        if self.user_bias is not None:
+            self.user_bias[row] = bias
+        # Publish the mapping last so readers never see an unwritten row
+        if user_id not in self.user_map:
+            self.reverse_user_map[row] = user_id
+            self.user_map[user_id] = row
+
+    def _refresh_top_n(self, user_id):
+        """Recompute a folded-in user's row of the materialized table, if they have one."""
+        snapshot = self.top_n_table
+        if snapshot is None:
+            return
+        user_map, item_ids, table = snapshot
+        row = user_map.get(user_id)
+        if row is not None and row < table.shape[0]:
+            if not table.flags.writeable:
+                table = np.array(table)
+                self.top_n_table = (user_map, item_ids, table)
+            table[row] = _top_n_indices(self.score_items(user_id, item_ids, cache=True), table.shape[1])
+
+class ImplicitALSRecommender(MatrixFactorizationRecommender):
+    """Implicit-feedback ALS (Hu, Koren & Volinsky) on a sparse CSR user-item matrix.
+
+    Ratings are treated as interaction strengths: preference is 1 for every
+    observed pair and confidence is ``1 + alpha * rating``. Scoring, top-N
+    tables and the ANN index are inherited from the SVD recommender; ALS has
+    no biases and its scores are not clipped.
+    """
+    def __init__(self, factors: int = 32, regularization: float = 0.01, alpha: float = 40.0,
+                 iterations: int = 15, cg_steps: int = 3, n_jobs: Optional[int] = None,
+                 block_bytes: int = 64 * 1024 * 1024, random_state: int = 42):
+        super().__init__()
+        self.model = None
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        # Conjugate-gradient steps per update; 0 solves the normal equations exactly
+        self.cg_steps = cg_steps
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.block_bytes = block_bytes
+        self.random_state = random_state
+        self.rating_scale = (-np.inf, np.inf)
+        self.user_items = None
+        self.item_gram = None
+
+    def fit(self, interactions, item_ids=None, top_k=None):
+        """
+        interactions: list of dicts with keys 'user_id', 'item_id' and optional 'rating'
+        item_ids/top_k: optionally materialize a per-user top-K table over item_ids
+        """
+        if not interactions:
+            return
+        df = pd.DataFrame(interactions)
+        user_codes, user_ids = pd.factorize(df['user_id'])
+        item_codes, raw_item_ids = pd.factorize(df['item_id'])
+        weights = df['rating'].to_numpy(dtype=np.float64) if 'rating' in df.columns else np.ones(len(df))
+
+        # Repeated (user, item) pairs are summed into a single confidence entry
+        user_items = sp.csr_matrix(
+            (weights, (user_codes, item_codes)),
+            shape=(len(user_ids), len(raw_item_ids))
+        )
+        self.fit_matrix(user_items, user_ids, raw_item_ids, item_ids=item_ids, top_k=top_k)
+
+    def fit_matrix(self, user_items: sp.csr_matrix, row_ids, column_ids, item_ids=None, top_k=None):
+        """Fit directly from a CSR matrix of interaction strengths (no copy is kept)."""
+        if user_items.nnz == 0:
+            return
+        self.top_n_table = None
+        self.ann_index = None
+        item_users = user_items.T.tocsr()
+
+        rng = np.random.default_rng(self.random_state)
+        user_factors = rng.normal(scale=0.01, size=(user_items.shape[0], self.factors))
+        item_factors = rng.normal(scale=0.01, size=(user_items.shape[1], self.factors))
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+            for _ in range(self.iterations):
+                user_factors = self._least_squares(user_items, item_factors, user_factors, executor)
+                item_factors = self._least_squares(item_users, user_factors, item_factors, executor)
+
+        self.user_items = user_items
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        # YtY + lambda I is shared by every fold-in against these item factors
+        self.item_gram = item_factors.T @ item_factors + self.regularization * np.eye(self.factors)
+        self.user_map = {uid: i for i, uid in enumerate(row_ids)}
+        self.item_map = {iid: i for i, iid in enumerate(column_ids)}
+        self.reverse_user_map = {i: uid for uid, i in self.user_map.items()}
+        self.reverse_item_map = {i: iid for iid, i in self.item_map.items()}
+        self.trained = True
+        if item_ids is not None and top_k:
+            self.materialize_top_n(item_ids, top_k=top_k)
+
+    def fold_in(self, user_id, interactions):
+        """Fit one user's factors from their interactions with item factors held fixed."""
+        if not self.trained or not interactions:
+            return False
+        item_idx = self._item_indices([i['item_id'] for i in interactions])
+        ratings = np.array([i.get('rating', 1) for i in interactions], dtype=np.float64)
+        known = item_idx >= 0
+        if not known.any():
+            return False
+        # Repeated items sum into one confidence entry, as in fit
+        item_idx, inverse = np.unique(item_idx[known], return_inverse=True)
+        ratings = np.bincount(inverse, weights=ratings[known])
+        factors = self.item_factors[item_idx]
+        confidence = self.alpha * ratings
+        lhs = self.item_gram + (factors * confidence[:, None]).T @ factors
+        self._set_user(user_id, np.linalg.solve(lhs, factors.T @ (1.0 + confidence)))
+        self._refresh_top_n(user_id)
+        return True
+
+    def _least_squares(self, matrix: sp.csr_matrix, fixed: np.ndarray, current: np.ndarray,
+                       executor: ThreadPoolExecutor) -> np.ndarray:
+        """Solve every row's confidence-weighted ridge regression against ``fixed``.
+
+        Rows are split into blocks by interaction count and the blocks run on
+        a thread pool (NumPy and SciPy release the GIL). Each block either
+        runs ``cg_steps`` of conjugate gradient for all its rows at once,
+        warm-started from ``current``, or, with ``cg_steps=0``, builds the
+        normal equations exactly and solves them with a batched
+        ``np.linalg.solve``.
+        """
+        n_rows, k = matrix.shape[0], fixed.shape[1]
+        gram = fixed.T @ fixed + self.regularization * np.eye(k)
+        solved = np.zeros((n_rows, k))
+        indptr = matrix.indptr
+        # The exact solver materializes a k x k outer product per interaction
+        bytes_per_nnz = 8 * k * (k if not self.cg_steps else 1)
+        max_nnz = max(1, self.block_bytes // bytes_per_nnz)
+
+        def solve_block(start, stop):
+            lo, hi = indptr[start], indptr[stop]
+            block_indptr = indptr[start:stop + 1] - lo
+            columns = matrix.indices[lo:hi]
+            confidence = self.alpha * matrix.data[lo:hi]
+            shape = (stop - start, matrix.shape[1])
+            factors = fixed[columns]
+            rhs = sp.csr_matrix((1.0 + confidence, columns, block_indptr), shape=shape) @ fixed
+            if self.cg_steps:
+                solved[start:stop] = self._conjugate_gradient(
+                    current[start:stop], rhs, gram, factors, confidence, columns, block_indptr, fixed
+                )
+                return
+            rows = np.flatnonzero(np.diff(block_indptr))
+            if not rows.size:
+                return
+            # Segment-sum the weighted outer products with an indicator matrix product
+            owners = sp.csr_matrix(
+                (np.ones(hi - lo), np.arange(hi - lo), block_indptr), shape=(stop - start, hi - lo)
+            )[rows]
+            outer = np.einsum('ni,nj->nij', factors * confidence[:, None], factors).reshape(hi - lo, k * k)
+            lhs = (owners @ outer).reshape(len(rows), k, k) + gram
+            solved[start + rows] = np.linalg.solve(lhs, rhs[rows][..., None])[..., 0]
+
+        blocks = []
+        start = 0
+        while start < n_rows:
+            stop = int(np.searchsorted(indptr, indptr[start] + max_nnz, side='right')) - 1
+            stop = min(max(stop, start + 1), n_rows)
+            blocks.append((start, stop))
+            start = stop
+        list(executor.map(lambda block: solve_block(*block), blocks))
+        return solved
+
+    def _conjugate_gradient(self, x, rhs, gram, factors, confidence, columns, block_indptr, fixed):
+        """Run CG on every row of a block simultaneously (per-row step sizes)."""
+        shape = (len(x), fixed.shape[0])
+        owners = np.repeat(np.arange(len(x)), np.diff(block_indptr))
+
+        def apply(v):
+            # (YtY + lambda I) v_u + sum_i (c_ui - 1) (y_i . v_u) y_i
+            weights = confidence * np.einsum('nk,nk->n', factors, v[owners])
+            return v @ gram + sp.csr_matrix((weights, columns, block_indptr), shape=shape) @ fixed
+
+        x = x.copy()
+        residual = rhs - apply(x)
+        direction = residual.copy()
+        rs_old = np.einsum('ij,ij->i', residual, residual)
+        for _ in range(self.cg_steps):
+            active = rs_old > 1e-20
+            if not active.any():
+                break
+            projected = apply(direction)
+            denom = np.einsum('ij,ij->i', direction, projected)
+            step = np.divide(rs_old, denom, out=np.zeros_like(rs_old), where=active & (denom > 0))
+            x += step[:, None] * direction
+            residual -= step[:, None] * projected
+            rs_new = np.einsum('ij,ij->i', residual, residual)
+            beta = np.divide(rs_new, rs_old, out=np.zeros_like(rs_new), where=active)
+            direction = residual + beta[:, None] * direction
+            rs_old = rs_new
+        return x
+
+class LatencyBudget:
+    """Time left for one request; strategy stages check it before they start."""
+    def __init__(self, budget_ms: Optional[float] = None):
+        self.deadline = None if budget_ms is None else time.perf_counter() + budget_ms / 1000.0
+
+    def remaining_ms(self) -> float:
+        if self.deadline is None:
+            return float('inf')
+        return (self.deadline - time.perf_counter()) * 1000.0
+
+    def allows(self, estimate_ms: float) -> bool:
+        """Whether a stage expected to take ``estimate_ms`` fits in the remaining time."""
+        return estimate_ms <= self.remaining_ms()
 
 class RecommendationEngine:
-    def __init__(self):
+    # Smoothing for the per-stage latency estimates used by LatencyBudget checks
+    STAGE_LATENCY_ALPHA = 0.2
+
+    def __init__(self, mf_top_k: int = 50, ann_n_probe: Optional[int] = None,
+                 ann_min_items: int = 100000, mf_algorithm: str = 'als', n_neighbours: int = 5,
+                 item_top_k: int = 50, item_similarity: str = 'cosine',
+                 storage: str = 'float64'):
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode: {storage}")
         self.user_profiles = {}
         self.product_features = {}
+        self.catalog_ids = []
+        # (rank by product id, products in popularity order), rebuilt on catalog change
+        self.popularity_index = ({}, [])
+        # Catalog arrays coded by popularity rank, used by the two-stage pipeline
+        self.catalog_index = CatalogIndex([])
+        # (row by user id, user ids, neighbour rows, similarities) built at train time
         self.user_similarity_model = None
+        self.user_feature_columns = []
+        self.n_neighbours = n_neighbours
+        # (items x items) CSR of top-k "viewed together" scores over interaction item codes
+        self.item_similarity_model = None
+        self.item_top_k = item_top_k
+        self.item_similarity = item_similarity
+        # Serving precision of MF factors and ANN vectors
+        # ('float64', 'float32' or row-scaled 'int8'); models train in float64
+        self.storage = storage
         self.scaler = StandardScaler()
         self.is_trained = False
         # --- Enhancement: Bandit and Advanced Model Stubs ---
         self.bandit_strategy = None  # Placeholder for multi-armed bandit
         self.advanced_model = None   # Placeholder for advanced ML model (e.g., matrix factorization)
         # --- Matrix Factorization Model ---
-        self.mf_model = MatrixFactorizationRecommender()
+        # 'als' fits implicit feedback directly, 'svd' keeps the Surprise model
+        if mf_algorithm == 'als':
+            self.mf_model = ImplicitALSRecommender()
+        elif mf_algorithm == 'svd':
+            self.mf_model = MatrixFactorizationRecommender()
+        else:
+            raise ValueError(f"Unknown mf_algorithm: {mf_algorithm}")
+        # Per-user top-K table materialized after MF training (0 disables it)
+        self.mf_top_k = mf_top_k
+        # Probed IVF lists for ANN candidate generation (None uses exact scoring)
+        self.ann_n_probe = ann_n_probe
+        # Smaller catalogs keep exact scoring: at 20k items it takes under
+        # 1 ms, less than the IVF probes needed for usable recall
+        self.ann_min_items = ann_min_items
+        # Encoded user x product interactions shared by every strategy
+        self.interactions = InteractionStore()
+        # Moving average of live stage latencies (ms); the popular tier is precomputed
+        self.stage_latency_ms = {'matrix_factorization': 0.0, 'neighbours': 0.0, 'two_stage': 0.0}
+        # Candidate generators + re-ranker behind strategy="two_stage"
+        self.pipeline = TwoStagePipeline()
         # --- Feature Engineering Stub ---
         # Add more user/product/context features here as needed
         
@@ -69,11 +649,20 @@ class RecommendationEngine:
         if not user_profiles or not products:
             return False
             
-        # Process user profiles
-        self.user_profiles = {profile['user_id']: profile for profile in user_profiles}
+        # Interaction lists move into the sparse store; profiles keep scalar features
+        self.interactions = InteractionStore.from_profiles(user_profiles)
+        self.item_similarity_model = None
+        if self.item_top_k:
+            self.item_similarity_model = ItemCooccurrence(
+                top_k=self.item_top_k, method=self.item_similarity
+            ).fit(self.interactions.matrix).similarities
+        self.user_profiles = {
+            profile['user_id']: {k: v for k, v in profile.items() if k != 'products_viewed'}
+            for profile in user_profiles
+        }
         
         # Process product features
-        self.product_features = {product['id']: product for product in products}
+        self.update_catalog(products)
         
         # Prepare data for user similarity model
         df_users = self._prepare_user_features(user_profiles)
@@ -83,18 +672,58 @@ class RecommendationEngine:
             self._train_user_similarity(df_users)
             self.is_trained = True
             # --- Train Matrix Factorization Model ---
-            # For demo, use products_viewed as implicit feedback (rating=1)
-            interactions = []
-            for profile in user_profiles:
-                for pid in profile.get('products_viewed', []):
-                    interactions.append({'user_id': profile['user_id'], 'item_id': pid, 'rating': 1})
-            self.mf_model.fit(interactions)
+            # Weighted interactions from the store are the implicit feedback
+            self.mf_model.fit_matrix(
+                self.interactions.matrix,
+                self.interactions.user_ids,
+                self.interactions.item_ids,
+                item_ids=self.catalog_ids,
+                top_k=self.mf_top_k
+            )
+            if self.ann_n_probe and len(self.product_features) >= self.ann_min_items:
+                self.mf_model.build_ann_index(
+                    self.catalog_ids,
+                    n_probe=self.ann_n_probe,
+                    storage=self.storage
+                )
+            # The top-K table and ANN lists were built at full precision
+            self.mf_model.compact(self.storage)
             return True
             
         return False
     
-    def _prepare_user_features(self, user_profiles: List[Dict]) -> pd.DataFrame:
-        """Prepare user features for similarity modeling."""
+    def update_catalog(self, products: List[Dict]):
+        """Replace the product catalog and rebuild its popularity ordering."""
+        self.product_features = {product['id']: product for product in products}
+        # Replaced, never mutated, so MF can cache its model rows per catalog
+        self.catalog_ids = list(self.product_features)
+        catalog = list(self.product_features.values())
+        popularity = np.array([p.get('popularity', 0) for p in catalog], dtype=np.float64)
+        # Stable descending order keeps catalog order among equal popularity
+        order = np.argsort(-popularity, kind='stable')
+        sorted_products = [catalog[i] for i in order]
+        self.popularity_index = (
+            {p['id']: rank for rank, p in enumerate(sorted_products)},
+            sorted_products
+        )
+        self.catalog_index = CatalogIndex(sorted_products)
+
+    def record_interaction(self, user_id: str, product_id: str, event_type: Optional[str] = 'product_view') -> bool:
+        """Append a tracked interaction and fold the user's history into the MF model."""
+        if not user_id or not product_id:
+            return False
+        self.interactions.add(user_id, product_id, event_type)
+        if not self.mf_model.trained:
+            return False
+        items, weights = self.interactions.user_items(user_id)
+        item_ids = self.interactions.item_ids
+        return self.mf_model.fold_in(
+            user_id,
+            [{'item_id': item_ids[i], 'rating': float(w)} for i, w in zip(items, weights)]
+        )
+
+    def _prepare_user_features(self, user_profiles: List[Dict], fit: bool = True) -> pd.DataFrame:
+        """Prepare user features for similarity modeling (fit=False reuses the frozen scaler)."""
         if not user_profiles:
             return pd.DataFrame()
             
@@ -123,12 +752,15 @@ class RecommendationEngine:
         
         # Scale numeric features
         if not df.empty and existing_features:
-            df[existing_features] = self.scaler.fit_transform(df[existing_features])
+            if fit:
+                df[existing_features] = self.scaler.fit_transform(df[existing_features])
+            else:
+                df[existing_features] = self.scaler.transform(df[existing_features])
             
         return df[['user_id'] + existing_features] if 'user_id' in df.columns else pd.DataFrame()
     
     def _train_user_similarity(self, user_features: pd.DataFrame):
-        """Train KNN model for user similarity."""
+        """Freeze the scaled user feature matrix and precompute each user's neighbours."""
         if user_features.empty or len(user_features) < 2:
             return
             
@@ -138,44 +770,249 @@ class RecommendationEngine:
         if not feature_cols:
             return
             
-        # Train KNN model
-        self.user_similarity_model = NearestNeighbors(
-            n_neighbors=min(5, len(user_features)),
-            metric='cosine',
-            algorithm='auto'
-        )
-        
-        self.user_similarity_model.fit(user_features[feature_cols])
+        self.user_feature_columns = feature_cols
+        features = user_features[feature_cols].to_numpy(dtype=np.float64)
+        self.user_similarity_model = self._build_neighbour_table(user_features['user_id'].tolist(), features)
+
+    def _build_neighbour_table(self, user_ids: List[str], features: np.ndarray,
+                               block_bytes: int = 256 * 2**20):
+        """All-pairs top-k cosine neighbours, computed in blocks of users.
+
+        Each block is (rows x n_users) float64 similarities plus the int64
+        partition of it, so rows are sized to keep both within
+        ``block_bytes`` whatever the number of users.
+
+        Returns (row by user id, user ids, neighbour rows, similarities); the
+        neighbour arrays are (n_users x k), best first, excluding the user.
+        """
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        unit = np.divide(features, norms, out=np.zeros_like(features), where=norms > 0)
+        n_users = len(unit)
+        k = min(self.n_neighbours, n_users - 1)
+        indices = np.empty((n_users, k), dtype=np.int32)
+        similarities = np.empty((n_users, k), dtype=np.float32)
+        block_size = max(1, block_bytes // (16 * n_users))
+
+        for start in range(0, n_users, block_size):
+            # Negated in place so the partition does not need another copy
+            block = np.negative(unit[start:start + block_size] @ unit.T)
+            rows = np.arange(len(block))
+            block[rows, start + rows] = np.inf
+            top = np.argpartition(block, k - 1, axis=1)[:, :k]
+            top_similarities = -np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_similarities, axis=1, kind='stable')
+            indices[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+            similarities[start:start + len(block)] = np.take_along_axis(top_similarities, order, axis=1)
+
+        return ({uid: i for i, uid in enumerate(user_ids)}, user_ids, indices, similarities)
+
+    def refresh_neighbours(self, background: bool = True) -> Optional[threading.Thread]:
+        """Recompute the neighbour table from current profiles with the frozen scaler.
+
+        The new table replaces the old one with a single assignment, so
+        requests keep using the previous table until it is ready.
+        """
+        def rebuild():
+            user_features = self._prepare_user_features(list(self.user_profiles.values()), fit=False)
+            if len(user_features) < 2:
+                return
+            features = user_features[self.user_feature_columns].to_numpy(dtype=np.float64)
+            table = self._build_neighbour_table(user_features['user_id'].tolist(), features)
+            self.user_similarity_model = table
+
+        if not background:
+            rebuild()
+            return None
+        thread = threading.Thread(target=rebuild, name='neighbour-refresh', daemon=True)
+        thread.start()
+        return thread
     
     def get_recommendations(
         self,
         user_id: Optional[str] = None,
         context: Optional[Dict[str, Any]] = None,
         n_recommendations: int = 10,
-        strategy: Optional[str] = None  # Enhancement: allow explicit strategy
+        strategy: Optional[str] = None,  # Enhancement: allow explicit strategy
+        budget_ms: Optional[float] = None
     ) -> Dict[str, Any]:
-        """Get personalized recommendations for a user."""
+        """Get personalized recommendations for a user.
+
+        With ``budget_ms`` each live stage is skipped when its recent latency
+        no longer fits in the remaining time, degrading from matrix
+        factorization to neighbours to the precomputed popular ranking.
+        ``served_by`` in the result names the tier that answered.
+        """
         # --- Enhancement: Strategy selection logic ---
         if strategy == "bandit" and self.bandit_strategy:
             # Placeholder: call bandit strategy here
             return self.bandit_strategy(user_id, context, n_recommendations)
-        if strategy == "advanced" or strategy == "matrix_factorization":
-            # Use matrix factorization recommender
-            if user_id and self.mf_model.trained:
-                all_items = list(self.product_features.keys())
-                recommended_ids = self.mf_model.recommend(user_id, all_items, n=n_recommendations)
-                recommended_products = [self.product_features[iid] for iid in recommended_ids if iid in self.product_features]
+        budget = LatencyBudget(budget_ms)
+        if strategy == "two_stage" and self.product_features:
+            if self._stage_allows(budget, 'two_stage'):
+                start = time.perf_counter()
+                recommended_products = self.pipeline.recommend(self, user_id, context, n_recommendations)
+                self._observe_stage('two_stage', start)
                 return {
-                    'recommendation_type': 'matrix_factorization',
+                    'recommendation_type': 'two_stage',
                     'user_id': user_id,
                     'recommended_products': recommended_products,
-                    'explanation': 'Matrix factorization-based recommendations'
+                    'explanation': 'Candidates from several generators, re-ranked on the full feature set',
+                    'served_by': 'two_stage'
                 }
+            return self._get_cold_start_recommendations(context, n_recommendations)
+        if strategy == "similar_items" and user_id and self.is_trained:
+            recommended_products = self._get_similar_item_products(user_id, n_recommendations)
+            if recommended_products:
+                if len(recommended_products) < n_recommendations:
+                    recommended_products.extend(self._get_popular_products(
+                        n=n_recommendations - len(recommended_products),
+                        exclude_ids=[p['id'] for p in recommended_products]
+                    ))
+                return {
+                    'recommendation_type': 'similar_items',
+                    'user_id': user_id,
+                    'recommended_products': recommended_products,
+                    'explanation': 'Similar to what you viewed',
+                    'served_by': 'similar_items'
+                }
+        if strategy == "advanced" or strategy == "matrix_factorization":
+            # Use matrix factorization recommender
+            if user_id and self.mf_model.trained:
+                result = self._get_mf_recommendations(user_id, n_recommendations, budget)
+                if result is not None:
+                    return result
         # Default collaborative filtering
-        if user_id and user_id in self.user_profiles and self.is_trained:
-            return self._get_personalized_recommendations(user_id, n_recommendations)
+        if user_id and self._is_known_user(user_id) and self.is_trained:
+            if self._stage_allows(budget, 'neighbours'):
+                start = time.perf_counter()
+                result = self._get_personalized_recommendations(user_id, n_recommendations)
+                self._observe_stage('neighbours', start)
+                return result
         return self._get_cold_start_recommendations(context, n_recommendations)
-    
+
+    def _get_mf_recommendations(self, user_id: str, n_recommendations: int,
+                                budget: LatencyBudget) -> Optional[Dict[str, Any]]:
+        """MF tier: table rows are always served, live scoring only within budget."""
+        # Known users are served from the precomputed table
+        recommended_ids = self.mf_model.recommend_precomputed(user_id, n=n_recommendations)
+        if recommended_ids is None:
+            if not self._stage_allows(budget, 'matrix_factorization'):
+                return None
+            start = time.perf_counter()
+            recommended_ids = self.mf_model.recommend_approximate(user_id, n=n_recommendations)
+            if recommended_ids is None:
+                recommended_ids = self.mf_model.recommend(user_id, self.catalog_ids, n=n_recommendations, cache=True)
+            self._observe_stage('matrix_factorization', start)
+        recommended_products = [self.product_features[iid] for iid in recommended_ids if iid in self.product_features]
+        return {
+            'recommendation_type': 'matrix_factorization',
+            'user_id': user_id,
+            'recommended_products': recommended_products,
+            'explanation': 'Matrix factorization-based recommendations',
+            'served_by': 'matrix_factorization'
+        }
+
+    def _stage_allows(self, budget: LatencyBudget, stage: str) -> bool:
+        """Budget check for a live stage; each skip decays its estimate as if it ran in 0 ms.
+
+        Estimates only move when a stage runs, so without the decay one
+        slow call could keep a stage over budget, and skipped, for good.
+        """
+        estimate = self.stage_latency_ms[stage]
+        if budget.allows(estimate):
+            return True
+        self.stage_latency_ms[stage] = (1.0 - self.STAGE_LATENCY_ALPHA) * estimate
+        return False
+
+    def _observe_stage(self, stage: str, start: float):
+        """Fold one stage timing into its moving-average latency estimate."""
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        previous = self.stage_latency_ms[stage]
+        self.stage_latency_ms[stage] = previous + self.STAGE_LATENCY_ALPHA * (elapsed_ms - previous)
+
+    def get_recommendations_batch(
+        self,
+        user_ids: List[Optional[str]],
+        contexts: Optional[List[Optional[Dict[str, Any]]]] = None,
+        n: int = 10,
+        strategy: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get recommendations for many users at once, in input order.
+
+        Results match calling get_recommendations for each user. Users are
+        grouped by the strategy that serves them and each group is scored
+        together: MF users with one table gather (or block scoring), known
+        users with one sparse neighbour product, and cold start users share
+        one popularity ranking per distinct context.
+        """
+        contexts = list(contexts) if contexts is not None else [None] * len(user_ids)
+        if len(contexts) != len(user_ids):
+            raise ValueError("contexts must have one entry per user id")
+        if strategy == "bandit" and self.bandit_strategy:
+            return [self.bandit_strategy(u, c, n) for u, c in zip(user_ids, contexts)]
+        if strategy in ("two_stage", "similar_items"):
+            # Per-request work is already bounded (pipeline / one sparse row gather)
+            return [self.get_recommendations(u, c, n, strategy) for u, c in zip(user_ids, contexts)]
+
+        use_mf = strategy in ("advanced", "matrix_factorization") and self.mf_model.trained
+        mf_users, personalized, cold_start = [], [], []
+        for position, user_id in enumerate(user_ids):
+            if user_id and use_mf:
+                mf_users.append(position)
+            elif user_id and self._is_known_user(user_id) and self.is_trained:
+                personalized.append(position)
+            else:
+                cold_start.append(position)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(user_ids)
+        if mf_users:
+            recommended = self.mf_model.recommend_batch(
+                [user_ids[p] for p in mf_users], self.catalog_ids, n=n, cache=True
+            )
+            for position, recommended_ids in zip(mf_users, recommended):
+                results[position] = {
+                    'recommendation_type': 'matrix_factorization',
+                    'user_id': user_ids[position],
+                    'recommended_products': [self.product_features[iid] for iid in recommended_ids if iid in self.product_features],
+                    'explanation': 'Matrix factorization-based recommendations',
+                    'served_by': 'matrix_factorization'
+                }
+
+        if personalized:
+            # Only the first n neighbour products survive the final cut
+            batch = self._get_products_from_similar_users_batch(
+                [user_ids[p] for p in personalized], max_products=min(20, n)
+            )
+            for position, recommended_products in zip(personalized, batch):
+                if len(recommended_products) < n:
+                    recommended_products.extend(self._get_popular_products(
+                        n=n - len(recommended_products),
+                        exclude_ids=[p['id'] for p in recommended_products]
+                    ))
+                results[position] = {
+                    'recommendation_type': 'personalized',
+                    'user_id': user_ids[position],
+                    'recommended_products': recommended_products[:n],
+                    'explanation': 'Based on your activity and similar users',
+                    'served_by': 'neighbours'
+                }
+
+        # Cold start output depends only on a few context fields; rank once per distinct key
+        rankings = {}
+        for position in cold_start:
+            context = contexts[position]
+            key = self._cold_start_key(context)
+            if key not in rankings:
+                rankings[key] = self._get_cold_start_recommendations(context, n)['recommended_products']
+            results[position] = {
+                'recommendation_type': 'cold_start',
+                'context_used': context or {},
+                'recommended_products': list(rankings[key]),
+                'explanation': 'Popular items and trending products',
+                'served_by': 'popular'
+            }
+        return results
+
     def _get_personalized_recommendations(
         self,
         user_id: str,
@@ -200,9 +1037,21 @@ class RecommendationEngine:
             'recommendation_type': 'personalized',
             'user_id': user_id,
             'recommended_products': recommended_products[:n_recommendations],
-            'explanation': 'Based on your activity and similar users'
+            'explanation': 'Based on your activity and similar users',
+            'served_by': 'neighbours'
         }
     
+    @staticmethod
+    def _cold_start_key(context: Optional[Dict[str, Any]]) -> tuple:
+        """The context fields _get_cold_start_recommendations actually branches on."""
+        if not context:
+            return ()
+        return (
+            context.get('device_type') == 'mobile',
+            'time_of_day' in context,
+            context.get('time_of_day') in ['morning', 'afternoon']
+        )
+
     def _get_cold_start_recommendations(
         self,
         context: Optional[Dict[str, Any]],
@@ -238,40 +1087,29 @@ class RecommendationEngine:
             'recommendation_type': 'cold_start',
             'context_used': context or {},
             'recommended_products': recommended_products[:n_recommendations],
-            'explanation': 'Popular items and trending products'
+            'explanation': 'Popular items and trending products',
+            'served_by': 'popular'
         }
     
+    def _is_known_user(self, user_id: str) -> bool:
+        """Whether the user has a profile or a neighbour row (engines loaded from artifacts keep no profiles)."""
+        snapshot = self.user_similarity_model
+        return user_id in self.user_profiles or (snapshot is not None and user_id in snapshot[0])
+
     def _find_similar_users(self, user_id: str, n_similar: int = 5) -> List[Dict]:
-        """Find users similar to the given user."""
-        if not self.user_similarity_model or user_id not in self.user_profiles:
+        """Find users similar to the given user (lookup in the neighbour table)."""
+        if not self.user_similarity_model:
             return []
             
-        # Get user features
-        user_features = self._prepare_user_features([self.user_profiles[user_id]])
-        
-        if user_features.empty:
+        row_by_user, user_ids, indices, similarities = self.user_similarity_model
+        row = row_by_user.get(user_id)
+        if row is None:
             return []
             
-        # Get feature columns
-        feature_cols = [col for col in user_features.columns if col != 'user_id']
-        
-        # Find similar users
-        distances, indices = self.user_similarity_model.kneighbors(
-            user_features[feature_cols],
-            n_neighbors=min(n_similar + 1, len(self.user_profiles))
-        )
-        
-        # Get similar users (excluding the user themselves)
-        similar_users = []
-        for i in range(1, len(indices[0])):  # Skip the first one (the user themselves)
-            similar_user_id = user_features.iloc[indices[0][i]]['user_id']
-            similarity = 1 - distances[0][i]  # Convert distance to similarity
-            similar_users.append({
-                'user_id': similar_user_id,
-                'similarity_score': similarity
-            })
-            
-        return similar_users
+        return [
+            {'user_id': user_ids[neighbour], 'similarity_score': float(similarity)}
+            for neighbour, similarity in zip(indices[row, :n_similar], similarities[row, :n_similar])
+        ]
     
     def _get_products_from_similar_users(
         self,
@@ -279,43 +1117,137 @@ class RecommendationEngine:
         similar_users: List[Dict],
         max_products: int = 20
     ) -> List[Dict]:
-        """Get products viewed/purchased by similar users."""
-        if not similar_users or not self.user_profiles:
+        """Get products viewed/purchased by similar users.
+
+        Scores are the similarity-weighted sum of the neighbours' interaction
+        rows (one sparse vector-matrix product); items the user has already
+        seen or that are not in the catalog are masked out before top-k.
+        """
+        similar_users = [s for s in similar_users if self._is_known_user(s['user_id'])]
+        if not similar_users:
             return []
             
-        # Get products from similar users
-        recommended_products = {}
-        
-        for similar_user in similar_users:
-            similar_user_id = similar_user['user_id']
-            similarity_score = similar_user['similarity_score']
-            
-            if similar_user_id in self.user_profiles:
-                user_profile = self.user_profiles[similar_user_id]
-                
-                # Get products viewed by similar user (if available)
-                if 'products_viewed' in user_profile and user_profile['products_viewed']:
-                    for product_id in user_profile['products_viewed']:
-                        if product_id in self.product_features:
-                            if product_id not in recommended_products:
-                                recommended_products[product_id] = {
-                                    'product': self.product_features[product_id],
-                                    'score': similarity_score,
-                                    'recommendation_reason': f'Viewed by similar user (similarity: {similarity_score:.2f})'
-                                }
-                            else:
-                                # Increase score if product is recommended by multiple similar users
-                                recommended_products[product_id]['score'] += similarity_score
-        
-        # Sort by score and return top products
-        sorted_products = sorted(
-            recommended_products.values(),
-            key=lambda x: x['score'],
-            reverse=True
+        neighbours = [s['user_id'] for s in similar_users]
+        weights = np.array([s['similarity_score'] for s in similar_users], dtype=np.float32)
+        scored = sp.csr_matrix(weights[None, :]) @ self.interactions.user_rows(neighbours)
+        # Candidates in item order so ties resolve the same way as the batch path
+        scored.sort_indices()
+        candidates, scores = scored.indices, scored.data
+
+        # Mask seen and off-catalog items on the touched candidates only
+        seen, _ = self.interactions.user_items(user_id)
+        item_ids = self.interactions.item_ids
+        keep = ~np.isin(candidates, seen)
+        keep &= np.fromiter(
+            (item_ids[c] in self.product_features for c in candidates),
+            dtype=bool,
+            count=len(candidates)
         )
-        
-        return [p['product'] for p in sorted_products[:max_products]]
+        candidates, scores = candidates[keep], scores[keep]
+
+        # Reasons are only formatted for the products that are returned
+        return [
+            dict(
+                self.product_features[item_ids[candidates[i]]],
+                recommendation_reason=f'Viewed by similar users (score: {scores[i]:.2f})'
+            )
+            for i in _top_n_indices(scores, max_products)
+        ]
     
+    def _get_products_from_similar_users_batch(
+        self,
+        user_ids: List[str],
+        n_similar: int = 5,
+        max_products: int = 20
+    ) -> List[List[Dict]]:
+        """Neighbour-based products for many users with one sparse matrix product.
+
+        Each user's neighbour weights form one row of a (users x neighbours)
+        CSR matrix that multiplies the neighbours' interaction rows; seen and
+        off-catalog items are masked on the flat CSR arrays. Matches
+        _get_products_from_similar_users(user, _find_similar_users(user)).
+        """
+        results: List[List[Dict]] = [[] for _ in user_ids]
+        snapshot = self.user_similarity_model
+        if snapshot is None or not user_ids:
+            return results
+        row_by_user, table_users, indices, similarities = snapshot
+        rows = np.fromiter((row_by_user.get(u, -1) for u in user_ids), dtype=np.intp, count=len(user_ids))
+        positions = np.flatnonzero(rows >= 0)
+        k = min(n_similar, indices.shape[1])
+        if not positions.size or not k:
+            return results
+
+        neighbours, column = np.unique(indices[rows[positions], :k], return_inverse=True)
+        weights = sp.csr_matrix(
+            (similarities[rows[positions], :k].ravel(), column.ravel(), np.arange(0, len(positions) * k + 1, k)),
+            shape=(len(positions), len(neighbours))
+        )
+        scored = weights @ self.interactions.user_rows([table_users[r] for r in neighbours])
+        scored.sort_indices()
+
+        # Drop seen items by matching (row, item) keys, and items outside the catalog
+        n_items = scored.shape[1]
+        seen = self.interactions.user_rows([user_ids[p] for p in positions]).tocoo()
+        entry_rows = np.repeat(np.arange(scored.shape[0]), np.diff(scored.indptr))
+        keep = ~np.isin(entry_rows * n_items + scored.indices, seen.row.astype(np.int64) * n_items + seen.col)
+        item_ids = self.interactions.item_ids
+        in_catalog = np.fromiter((item_id in self.product_features for item_id in item_ids), dtype=bool, count=n_items)
+        keep &= in_catalog[scored.indices]
+        entry_rows, candidates, scores = entry_rows[keep], scored.indices[keep], scored.data[keep]
+
+        # One lexsort ranks every row (score desc, then item order, as in _top_n_indices)
+        order = np.lexsort((candidates, -scores, entry_rows))
+        starts = np.searchsorted(entry_rows[order], np.arange(scored.shape[0]))
+        rank = np.arange(len(order)) - starts[entry_rows[order]]
+        order = order[rank < max_products]
+        positions = positions.tolist()
+        for row, item, score in zip(entry_rows[order].tolist(), candidates[order].tolist(), scores[order].tolist()):
+            results[positions[row]].append(dict(
+                self.product_features[item_ids[item]],
+                recommendation_reason=f'Viewed by similar users (score: {score:.2f})'
+            ))
+        return results
+
+    def _score_similar_items(self, user_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(item codes, scores) "viewed together" with the user's history, seen items removed.
+
+        The user's weighted interaction row gathers and sums the matching
+        rows of the item similarity matrix in one sparse product.
+        """
+        similarity = self.item_similarity_model
+        items, weights = self.interactions.user_items(user_id)
+        if similarity is None or not len(items):
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        # Items added after the build have no similarity row yet
+        known = items < similarity.shape[0]
+        history = sp.csr_matrix(
+            (weights[known], items[known], [0, int(known.sum())]),
+            shape=(1, similarity.shape[0])
+        )
+        scored = history @ similarity
+        scored.sort_indices()
+        keep = ~np.isin(scored.indices, items)
+        return scored.indices[keep], scored.data[keep]
+
+    def _get_similar_item_products(self, user_id: str, n: int) -> List[Dict]:
+        """Catalog products most often viewed together with the user's history."""
+        candidates, scores = self._score_similar_items(user_id)
+        item_ids = self.interactions.item_ids
+        in_catalog = np.fromiter(
+            (item_ids[c] in self.product_features for c in candidates),
+            dtype=bool,
+            count=len(candidates)
+        )
+        candidates, scores = candidates[in_catalog], scores[in_catalog]
+        return [
+            dict(
+                self.product_features[item_ids[candidates[i]]],
+                recommendation_reason=f'Similar to what you viewed (score: {scores[i]:.2f})'
+            )
+            for i in _top_n_indices(scores, n)
+        ]
+
     def _get_popular_products(
         self,
         n: int = 10,
@@ -325,13 +1257,13 @@ class RecommendationEngine:
         if not self.product_features:
             return []
             
-        exclude_ids = exclude_ids or []
-        
-        # Sort products by popularity (or any other metric)
-        sorted_products = sorted(
-            [p for p in self.product_features.values() if p['id'] not in exclude_ids],
-            key=lambda x: x.get('popularity', 0),
-            reverse=True
-        )
-        
-        return sorted_products[:n]
+        rank_by_id, sorted_products = self.popularity_index
+        if not exclude_ids:
+            return sorted_products[:n]
+
+        # Only the first n + len(exclude_ids) ranks can contribute; mask the excluded ones
+        head = min(n + len(exclude_ids), len(sorted_products))
+        excluded = np.zeros(head, dtype=bool)
+        ranks = [rank_by_id.get(pid, head) for pid in exclude_ids]
+        excluded[[r for r in ranks if r < head]] = True
+        return [sorted_products[r] for r in np.flatnonzero(~excluded)[:n]]
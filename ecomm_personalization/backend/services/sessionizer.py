@@ -0,0 +1,209 @@
+from datetime import timedelta
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Union
+import heapq
+import itertools
+import numpy as np
+import pandas as pd
+from services.data_processor import DataProcessor
+
+
+class _OpenSession:
+    """Running aggregates of one session that can still receive events."""
+    __slots__ = ('user_id', 'start', 'end', 'num_actions', 'counts', 'devices', 'products', 'categories')
+
+    def __init__(self, user_id, timestamp: int):
+        self.user_id = user_id
+        self.start = timestamp
+        self.end = timestamp
+        self.num_actions = 0
+        self.counts = dict.fromkeys(DataProcessor.SESSION_ACTIONS.values(), 0)
+        self.devices = set()
+        # (timestamp, arrival, value) so lists come out in event-time order
+        self.products = []
+        self.categories = []
+
+    def add(self, timestamp: int, arrival: int, action, device, product, category):
+        self.start = min(self.start, timestamp)
+        self.end = max(self.end, timestamp)
+        self.num_actions += 1
+        column = DataProcessor.SESSION_ACTIONS.get(action)
+        if column is not None:
+            self.counts[column] += 1
+        if device is not None:
+            self.devices.add(device)
+        if product is not None:
+            self.products.append((timestamp, arrival, product))
+        if category is not None:
+            self.categories.append((timestamp, arrival, category))
+
+    def merge(self, other: '_OpenSession'):
+        self.start = min(self.start, other.start)
+        self.end = max(self.end, other.end)
+        self.num_actions += other.num_actions
+        for column, count in other.counts.items():
+            self.counts[column] += count
+        self.devices |= other.devices
+        self.products += other.products
+        self.categories += other.categories
+
+    def features(self, session_id: int) -> Dict[str, Any]:
+        """The session as an ``extract_session_features`` row."""
+        products = [value for _, _, value in sorted(self.products, key=lambda entry: entry[:2])]
+        categories = [value for _, _, value in sorted(self.categories, key=lambda entry: entry[:2])]
+        return {
+            'session_id': session_id,
+            'user_id': self.user_id,
+            'start_time': pd.Timestamp(self.start),
+            'end_time': pd.Timestamp(self.end),
+            'duration_seconds': (self.end - self.start) / 1e9,
+            'num_actions': self.num_actions,
+            **self.counts,
+            'devices_used': len(self.devices),
+            'unique_products_viewed': len(set(products)),
+            'categories_viewed': len(set(categories)),
+            'products_viewed': products,
+            'categories': categories
+        }
+
+
+class StreamingSessionizer:
+    """Sessionize an unbounded event stream incrementally.
+
+    Events may arrive in chunks (DataFrames or lists of activity dicts, as
+    for ``DataProcessor.process_user_activity``) or one at a time through
+    ``stream``. Only open sessions are kept: per user, the running
+    aggregates that ``extract_session_features`` would produce. A session
+    is emitted once the watermark (latest event time seen minus
+    ``allowed_lateness``) passes its last event by more than
+    ``session_timeout``, since no accepted event can extend it any more.
+
+    Events up to ``allowed_lateness`` out of order are placed by event
+    time (an event can extend or bridge open sessions). Events older than
+    the watermark are dropped and counted in ``late_events``. For the
+    accepted events the sessions match the batch sessionization. Session
+    ids are assigned in emission order.
+    """
+
+    def __init__(self, session_timeout: timedelta = timedelta(minutes=30),
+                 allowed_lateness: timedelta = timedelta(0), first_session_id: int = 0):
+        self.session_timeout = pd.Timedelta(session_timeout).value
+        self.allowed_lateness = pd.Timedelta(allowed_lateness).value
+        self.open_sessions: Dict[Any, List[_OpenSession]] = {}
+        # (close deadline, tiebreak, session) with lazy invalidation
+        self._deadlines = []
+        self._sequence = itertools.count()
+        self._next_session_id = first_session_id
+        self.max_event_time: Optional[int] = None
+        self.late_events = 0
+
+    @property
+    def watermark(self) -> Optional[pd.Timestamp]:
+        if self.max_event_time is None:
+            return None
+        return pd.Timestamp(self.max_event_time - self.allowed_lateness)
+
+    @property
+    def next_session_id(self) -> int:
+        return self._next_session_id
+
+    def restore(self, sessions: List[_OpenSession]):
+        """Reopen sessions saved from an earlier sessionizer (see ``model_artifacts.load_sessionizer``)."""
+        arrivals = [entry[1] for session in sessions for entry in session.products + session.categories]
+        # Later events must sort after the restored ones with the same event time
+        self._sequence = itertools.count(max(arrivals, default=-1) + 1)
+        for session in sessions:
+            self.open_sessions.setdefault(session.user_id, []).append(session)
+            heapq.heappush(self._deadlines, (session.end + self.session_timeout, next(self._sequence), session))
+
+    def process(self, events: Union[pd.DataFrame, List[Dict]]) -> List[Dict[str, Any]]:
+        """Consume a chunk of events in arrival order; returns the sessions it closed."""
+        frame = events if isinstance(events, pd.DataFrame) else pd.DataFrame(list(events))
+        if frame.empty:
+            return []
+        timestamps = pd.to_datetime(frame['timestamp']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        columns = [
+            frame[column].astype(object).where(frame[column].notna(), None).tolist()
+            if column in frame.columns else itertools.repeat(None)
+            for column in ('user_id', 'action_type', 'device_type', 'product_id', 'category')
+        ]
+        closed = []
+        for timestamp, user_id, action, device, product, category in zip(timestamps.tolist(), *columns):
+            self._add(timestamp, user_id, action, device, product, category)
+            closed.extend(self._close_expired())
+        return closed
+
+    def _add(self, timestamp: int, user_id, action, device, product, category):
+        if self.max_event_time is not None and timestamp < self.max_event_time - self.allowed_lateness:
+            self.late_events += 1
+            return
+        if self.max_event_time is None or timestamp > self.max_event_time:
+            self.max_event_time = timestamp
+        timeout = self.session_timeout
+        sessions = self.open_sessions.setdefault(user_id, [])
+        # Same rule as the batch gap split: gaps up to session_timeout stay in one session
+        touching = [s for s in sessions if s.start - timeout <= timestamp <= s.end + timeout]
+        if touching:
+            session = touching[0]
+            for other in touching[1:]:
+                session.merge(other)
+                sessions.remove(other)
+        else:
+            session = _OpenSession(user_id, timestamp)
+            sessions.append(session)
+        session.add(timestamp, next(self._sequence), action, device, product, category)
+        heapq.heappush(self._deadlines, (session.end + timeout, next(self._sequence), session))
+
+    def _close_expired(self) -> List[Dict[str, Any]]:
+        closed = []
+        limit = self.max_event_time - self.allowed_lateness
+        while self._deadlines and self._deadlines[0][0] < limit:
+            deadline, _, session = heapq.heappop(self._deadlines)
+            sessions = self.open_sessions.get(session.user_id)
+            # Stale entry: the session was merged away, extended, or already emitted
+            if sessions is None or session not in sessions or session.end + self.session_timeout != deadline:
+                continue
+            sessions.remove(session)
+            if not sessions:
+                del self.open_sessions[session.user_id]
+            closed.append(self._emit(session))
+        return closed
+
+    def _emit(self, session: _OpenSession) -> Dict[str, Any]:
+        session_id = self._next_session_id
+        self._next_session_id += 1
+        return session.features(session_id)
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Emit every open session (end of stream), oldest first."""
+        sessions = sorted(
+            (s for user_sessions in self.open_sessions.values() for s in user_sessions),
+            key=lambda s: s.start
+        )
+        self.open_sessions = {}
+        self._deadlines = []
+        return [self._emit(session) for session in sessions]
+
+    def stream(self, events: Iterable[Union[Dict, pd.DataFrame]], chunk_size: int = 10000,
+               flush: bool = True) -> Iterator[Dict[str, Any]]:
+        """Yield sessions as they close while consuming ``events``.
+
+        ``events`` may yield activity dicts (buffered ``chunk_size`` at a
+        time) or whole DataFrame chunks. With ``flush`` the sessions still
+        open at the end of the input are emitted too.
+        """
+        buffer = []
+        for item in events:
+            if isinstance(item, pd.DataFrame):
+                if buffer:
+                    yield from self.process(buffer)
+                    buffer = []
+                yield from self.process(item)
+                continue
+            buffer.append(item)
+            if len(buffer) >= chunk_size:
+                yield from self.process(buffer)
+                buffer = []
+        if buffer:
+            yield from self.process(buffer)
+        if flush:
+            yield from self.flush()
@@ -0,0 +1,255 @@
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+import itertools
+import multiprocessing
+import threading
+import zlib
+from services.model_artifacts import load_engine, save_engine
+from services.model_holder import ModelHolder
+from services.recommendation_engine import RecommendationEngine
+
+
+def shard_for(user_id: str, n_shards: int) -> int:
+    """Owning shard of ``user_id``; stable across processes and restarts (unlike ``hash``)."""
+    return zlib.crc32(str(user_id).encode('utf-8')) % n_shards
+
+
+def partition_profiles(user_profiles: List[Dict], n_shards: int) -> List[List[Dict]]:
+    """Split profiles into ``n_shards`` lists by owning shard."""
+    shards = [[] for _ in range(n_shards)]
+    for profile in user_profiles:
+        shards[shard_for(profile['user_id'], n_shards)].append(profile)
+    return shards
+
+
+def shard_artifact_path(directory, shard: int) -> Path:
+    return Path(directory) / f'shard-{shard}'
+
+
+def build_shard_artifacts(user_profiles: List[Dict], products: List[Dict], n_shards: int,
+                          directory, **engine_kwargs) -> List[Path]:
+    """Train one engine per shard and save each as ``<directory>/shard-<i>``."""
+    paths = []
+    for shard, profiles in enumerate(partition_profiles(user_profiles, n_shards)):
+        engine = _train_shard(RecommendationEngine(**engine_kwargs), profiles, products)
+        paths.append(save_engine(engine, shard_artifact_path(directory, shard)))
+    return paths
+
+
+def _train_shard(engine: RecommendationEngine, profiles: List[Dict], products: List[Dict]) -> RecommendationEngine:
+    """Train on the shard's profiles; a shard without users still serves cold start from the catalog."""
+    if not engine.train(profiles, products):
+        engine.update_catalog(products or [])
+    return engine
+
+
+def _build_engine(spec: Dict[str, Any]) -> RecommendationEngine:
+    if spec.get('artifact'):
+        return load_engine(spec['artifact'])
+    return _train_shard(RecommendationEngine(**spec.get('engine_kwargs', {})), spec['profiles'], spec['products'])
+
+
+def _serve_shard(conn, spec: Dict[str, Any]):
+    """Worker loop: own one shard's engine and answer (command, args, kwargs) messages."""
+    try:
+        holder = ModelHolder(_build_engine(spec), engine_factory=lambda: RecommendationEngine(
+            **spec.get('engine_kwargs', {})
+        ))
+    except Exception as e:
+        conn.send(('error', e))
+        return
+    conn.send(('ok', None))
+    # Profiles now live in the engine; drop the spec's copy
+    spec = {'engine_kwargs': spec.get('engine_kwargs', {})}
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        command, args, kwargs = message
+        try:
+            if command in ('get_recommendations', 'get_recommendations_batch'):
+                result = getattr(holder.current, command)(*args, **kwargs)
+            elif command in ('record_interaction', 'retrain', 'reload'):
+                result = getattr(holder, command)(*args, **kwargs)
+                # Threads do not pickle; callers only need to know it started
+                result = None if command != 'record_interaction' else result
+            elif command == 'describe':
+                engine = holder.current
+                result = {
+                    'version': holder.version,
+                    'users': len(engine.user_profiles),
+                    'interaction_users': len(engine.interactions.user_ids),
+                    'mf_users': len(engine.mf_model.user_map)
+                }
+            else:
+                raise ValueError(f"Unknown shard command: {command}")
+        except Exception as e:
+            conn.send(('error', e))
+        else:
+            conn.send(('ok', result))
+
+
+class ShardedModelHolder:
+    """Serve users from ``n_shards`` worker processes, each owning a slice of users.
+
+    Users are assigned by ``shard_for(user_id)``. Each worker holds only its
+    shard's profiles, interactions, neighbour table and MF user factors
+    (behind its own ``ModelHolder``), plus a copy of the catalog, so
+    per-process memory scales with 1/N. Neighbours and MF are fit within a
+    shard. Requests travel over a ``multiprocessing`` pipe per worker.
+
+    It exposes the ``ModelHolder`` interface the API uses. ``current`` is
+    the holder itself, because every call is routed rather than answered
+    from a local snapshot. Anonymous requests (cold start, same on every
+    shard) are spread round-robin.
+    """
+
+    def __init__(self, n_shards: int, user_profiles: Optional[List[Dict]] = None,
+                 products: Optional[List[Dict]] = None, artifact_dir=None,
+                 engine_kwargs: Optional[Dict[str, Any]] = None, start_method: str = 'spawn'):
+        if n_shards < 1:
+            raise ValueError("n_shards must be at least 1")
+        self.n_shards = n_shards
+        self.engine_kwargs = engine_kwargs or {}
+        if artifact_dir:
+            specs = [{'artifact': str(shard_artifact_path(artifact_dir, shard)), 'engine_kwargs': self.engine_kwargs}
+                     for shard in range(n_shards)]
+        else:
+            specs = [{'profiles': profiles, 'products': products, 'engine_kwargs': self.engine_kwargs}
+                     for profiles in partition_profiles(user_profiles or [], n_shards)]
+        context = multiprocessing.get_context(start_method)
+        self._connections = []
+        self._processes = []
+        # Pipes are not safe for concurrent use; one lock per worker
+        self._locks = [threading.Lock() for _ in range(n_shards)]
+        self._anonymous = itertools.count()
+        for shard, spec in enumerate(specs):
+            parent, child = context.Pipe()
+            process = context.Process(target=_serve_shard, args=(child, spec),
+                                      name=f'recommendation-shard-{shard}', daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+        # Shards build in parallel; wait for all of them
+        try:
+            for conn in self._connections:
+                self._receive(conn)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def current(self) -> 'ShardedModelHolder':
+        return self
+
+    @property
+    def version(self) -> int:
+        """Lowest engine version across shards (every shard has published at least this one)."""
+        return min(d['version'] for d in self._call_all('describe'))
+
+    def _shard(self, user_id: Optional[str]) -> int:
+        if not user_id:
+            return next(self._anonymous) % self.n_shards
+        return shard_for(user_id, self.n_shards)
+
+    @staticmethod
+    def _receive(conn):
+        try:
+            status, result = conn.recv()
+        except EOFError:
+            raise RuntimeError("Recommendation shard worker exited") from None
+        if status == 'error':
+            raise result
+        return result
+
+    def _call(self, shard: int, command: str, *args, **kwargs):
+        with self._locks[shard]:
+            self._connections[shard].send((command, args, kwargs))
+            return self._receive(self._connections[shard])
+
+    def _call_all(self, command: str, calls: Optional[Dict[int, Tuple[tuple, dict]]] = None) -> List[Any]:
+        """Send to several shards first, then collect, so workers run concurrently."""
+        calls = calls if calls is not None else {shard: ((), {}) for shard in range(self.n_shards)}
+        shards = sorted(calls)
+        for shard in shards:
+            self._locks[shard].acquire()
+        try:
+            for shard in shards:
+                args, kwargs = calls[shard]
+                self._connections[shard].send((command, args, kwargs))
+            return [self._receive(self._connections[shard]) for shard in shards]
+        finally:
+            for shard in shards:
+                self._locks[shard].release()
+
+    def get_recommendations(self, user_id: Optional[str] = None, context: Optional[Dict[str, Any]] = None,
+                            n_recommendations: int = 10, strategy: Optional[str] = None,
+                            budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        return self._call(
+            self._shard(user_id), 'get_recommendations', user_id, context,
+            n_recommendations=n_recommendations, strategy=strategy, budget_ms=budget_ms
+        )
+
+    def get_recommendations_batch(self, user_ids: List[Optional[str]],
+                                  contexts: Optional[List[Optional[Dict[str, Any]]]] = None,
+                                  n: int = 10, strategy: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Group users by shard, run one batch call per shard in parallel, restore order."""
+        if contexts is not None and len(contexts) != len(user_ids):
+            raise ValueError("contexts must have one entry per user id")
+        positions: Dict[int, List[int]] = {}
+        for position, user_id in enumerate(user_ids):
+            positions.setdefault(self._shard(user_id), []).append(position)
+        calls = {
+            shard: (([user_ids[p] for p in members],
+                     [contexts[p] for p in members] if contexts is not None else None),
+                    {'n': n, 'strategy': strategy})
+            for shard, members in positions.items()
+        }
+        results = [None] * len(user_ids)
+        for shard, shard_results in zip(sorted(calls), self._call_all('get_recommendations_batch', calls)):
+            for position, result in zip(positions[shard], shard_results):
+                results[position] = result
+        return results
+
+    def record_interaction(self, user_id: str, product_id: str,
+                           event_type: Optional[str] = 'product_view') -> bool:
+        if not user_id:
+            return False
+        return self._call(self._shard(user_id), 'record_interaction', user_id, product_id, event_type)
+
+    def retrain(self, user_profiles: List[Dict], products: List[Dict], background: bool = True):
+        """Retrain every shard on its slice of ``user_profiles``; each swaps in when ready."""
+        shards = partition_profiles(user_profiles, self.n_shards)
+        self._call_all('retrain', {
+            shard: ((shards[shard], products), {'background': background}) for shard in range(self.n_shards)
+        })
+
+    def reload(self, artifact_dir, background: bool = True):
+        """Reload every shard from ``<artifact_dir>/shard-<i>``."""
+        self._call_all('reload', {
+            shard: ((str(shard_artifact_path(artifact_dir, shard)),), {'background': background})
+            for shard in range(self.n_shards)
+        })
+
+    def describe(self) -> List[Dict[str, int]]:
+        """Per-shard engine version and user counts."""
+        return self._call_all('describe')
+
+    def close(self):
+        for conn in self._connections:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+        self._processes = []
@@ -0,0 +1,67 @@
+from typing import List, Dict, Any, Iterable, Optional, Union
+from pathlib import Path
+import json
+import numpy as np
+import pandas as pd
+
+
+class Vocabulary:
+    """Shared, append-only category lists for dictionary-encoded columns.
+
+    ``encode`` turns a column into a ``category`` dtype whose categories are
+    the column's vocabulary. Values not seen before are appended (sorted,
+    so the order does not depend on row order), never reordered, so a
+    value keeps its integer code across batches and, through ``save`` /
+    ``load``, across runs.
+    """
+
+    def __init__(self, columns: Optional[Dict[str, List[Any]]] = None):
+        self.columns: Dict[str, List[Any]] = {name: list(values) for name, values in (columns or {}).items()}
+        self._codes: Dict[str, Dict[Any, int]] = {
+            name: {value: code for code, value in enumerate(values)} for name, values in self.columns.items()
+        }
+        self._dtypes: Dict[str, pd.CategoricalDtype] = {}
+
+    def dtype(self, name: str) -> pd.CategoricalDtype:
+        dtype = self._dtypes.get(name)
+        if dtype is None or len(dtype.categories) != len(self.columns.get(name, ())):
+            dtype = self._dtypes[name] = pd.CategoricalDtype(self.columns.get(name, []))
+        return dtype
+
+    def encode(self, name: str, values: Union[pd.Series, Iterable]) -> pd.Series:
+        """``values`` as a categorical over the (possibly extended) vocabulary of ``name``."""
+        values = values if isinstance(values, pd.Series) else pd.Series(values)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values)
+        known = self.columns.setdefault(name, [])
+        lookup = self._codes.setdefault(name, {})
+        for value in sorted(set(uniques.tolist()) - lookup.keys(), key=str):
+            lookup[value] = len(known)
+            known.append(value)
+        # One code per distinct input value, plus -1 (missing) at the end for code -1
+        mapping = np.fromiter((lookup[value] for value in uniques.tolist()), dtype=np.int64, count=len(uniques))
+        mapping = np.append(mapping, -1)
+        return pd.Series(
+            pd.Categorical.from_codes(mapping[codes], dtype=self.dtype(name)), index=values.index, name=values.name
+        )
+
+    def encode_frame(self, frame: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+        """Encode the given ``columns`` of ``frame`` in place (missing ones are skipped)."""
+        for column in columns:
+            if column in frame.columns:
+                frame[column] = self.encode(column, frame[column])
+        return frame
+
+    def save(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.columns, f)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'Vocabulary':
+        with open(path) as f:
+            return cls(json.load(f))
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.ann_index import InnerProductIndex
+
+
+class TestInnerProductIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.items = rng.normal(size=(2000, 16))
+        self.queries = rng.normal(size=(20, 16))
+        self.index = InnerProductIndex(n_lists=32, n_probe=4).fit(self.items)
+
+    def test_lists_cover_every_item_once(self):
+        self.assertEqual(self.index.list_offsets[-1], len(self.items))
+        np.testing.assert_array_equal(np.sort(self.index.list_items), np.arange(len(self.items)))
+
+    def test_probing_all_lists_is_exact(self):
+        for query in self.queries:
+            indices, scores = self.index.search(query, 10, n_probe=32)
+            exact = np.argsort(-(self.items @ query), kind='stable')[:10]
+            np.testing.assert_array_equal(indices, exact)
+            np.testing.assert_allclose(scores, self.items[exact] @ query)
+
+    def test_recall_grows_with_probes(self):
+        def recall(n_probe):
+            hits = 0
+            for query in self.queries:
+                approx, _ = self.index.search(query, 10, n_probe=n_probe)
+                exact = np.argsort(-(self.items @ query))[:10]
+                hits += len(np.intersect1d(approx, exact))
+            return hits / (10 * len(self.queries))
+
+        self.assertLessEqual(recall(1), recall(8))
+        self.assertGreater(recall(8), 0.5)
+
+    def test_default_probes_a_quarter_of_the_lists(self):
+        index = InnerProductIndex(n_lists=32).fit(self.items)
+        for query in self.queries[:5]:
+            np.testing.assert_array_equal(index.search(query, 10)[0], index.search(query, 10, n_probe=8)[0])
+
+    def test_search_before_fit_raises(self):
+        with self.assertRaises(RuntimeError):
+            InnerProductIndex().search(self.queries[0], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import unittest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.candidate_pipeline import (
+    CandidateGenerator,
+    CatalogIndex,
+    CategoryGenerator,
+    ContextGenerator,
+    PopularityGenerator,
+    TwoStagePipeline
+)
+from services.data_processor import DataProcessor
+from services.recommendation_engine import RecommendationEngine
+from test_session_processing import make_activities
+
+
+class FixedGenerator(CandidateGenerator):
+    name = 'fixed'
+
+    def __init__(self, product_ids, **kwargs):
+        super().__init__(**kwargs)
+        self.product_ids = product_ids
+
+    def generate(self, engine, user_id, context):
+        codes = engine.catalog_index.codes(self.product_ids)
+        return codes, np.ones(len(codes), dtype=np.float32)
+
+
+class TestTwoStagePipeline(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(6)
+        categories = ['electronics', 'sports', 'home', 'beauty']
+        self.products = [
+            {
+                'id': f'p{i}',
+                'popularity': float(rng.random()),
+                'popularity_morning': float(rng.random()),
+                'popularity_evening': float(rng.random()),
+                'is_mobile_friendly': bool(i % 4),
+                'category': categories[i % 4]
+            }
+            for i in range(3000)
+        ]
+        self.profiles = [
+            {
+                'user_id': f'u{u}',
+                'total_sessions': int(rng.integers(1, 20)),
+                'total_page_views': int(rng.integers(0, 100)),
+                'top_categories': [categories[u % 4]],
+                'products_viewed': [f'p{i}' for i in rng.choice(300, 10, replace=False)]
+            }
+            for u in range(60)
+        ]
+        self.engine = RecommendationEngine(mf_top_k=20, ann_n_probe=4, ann_min_items=0)
+        self.engine.train(self.profiles, self.products)
+
+    def test_catalog_codes_follow_popularity(self):
+        catalog = self.engine.catalog_index
+        self.assertEqual(len(catalog), 3000)
+        self.assertTrue(np.all(np.diff(catalog.popularity) <= 0))
+        np.testing.assert_array_equal(catalog.codes([catalog.products[5]['id'], 'missing']), [5, -1])
+        mobile_evening = catalog.context_orderings[(True, 'evening')]
+        self.assertTrue(all(catalog.products[c]['is_mobile_friendly'] for c in mobile_evening))
+        self.assertTrue(np.all(np.diff(catalog.time_popularity['evening'][mobile_evening]) <= 0))
+
+    def test_candidates_are_bounded_and_unique(self):
+        pipeline = self.engine.pipeline
+        codes, scores = pipeline.candidates(self.engine, 'u3', {'time_of_day': 'evening', 'device_type': 'mobile'})
+        self.assertEqual(len(codes), len(np.unique(codes)))
+        self.assertLessEqual(len(codes), sum(g.limit for g in pipeline.generators))
+        self.assertEqual(scores.shape, (len(codes), len(pipeline.generators)))
+        # Every candidate came from at least one generator, scaled into (0, 1]
+        self.assertTrue(np.all(scores.max(axis=1) > 0))
+        self.assertLessEqual(scores.max(), 1.0)
+
+    def test_recommendations_exclude_seen_items(self):
+        products = self.engine.pipeline.recommend(self.engine, 'u3', {}, n=10)
+        self.assertEqual(len(products), 10)
+        seen = set(self.engine.interactions.user_item_ids('u3'))
+        self.assertFalse(seen & {p['id'] for p in products})
+        result = self.engine.get_recommendations('u3', n_recommendations=10, strategy='two_stage')
+        self.assertEqual(result['served_by'], 'two_stage')
+        self.assertEqual(result['recommended_products'], products)
+
+    def test_anonymous_requests_use_context(self):
+        context = {'device_type': 'mobile', 'time_of_day': 'morning'}
+        products = self.engine.pipeline.recommend(self.engine, None, context, n=5)
+        self.assertEqual(len(products), 5)
+        pipeline = TwoStagePipeline([ContextGenerator(limit=50)], item_weights={'popularity': 0, 'time_popularity': 0})
+        expected = self.engine.catalog_index.context_orderings[(True, 'morning')][:5]
+        self.assertEqual(
+            [p['id'] for p in pipeline.recommend(self.engine, None, context, n=5)],
+            [self.engine.catalog_index.products[c]['id'] for c in expected]
+        )
+
+    def test_new_generator_plugs_in(self):
+        pipeline = TwoStagePipeline([PopularityGenerator(limit=50), FixedGenerator(['p2999', 'p2998'], weight=10.0)])
+        top = [p['id'] for p in pipeline.recommend(self.engine, None, {}, n=3)]
+        self.assertEqual(sorted(top[:2]), ['p2998', 'p2999'])
+
+    def test_empty_catalog(self):
+        engine = RecommendationEngine()
+        self.assertEqual(len(CatalogIndex([])), 0)
+        self.assertEqual(engine.pipeline.recommend(engine, 'u1', {}, n=5), [])
+
+
+class TestProcessorProfiles(unittest.TestCase):
+    """Profiles as DataProcessor builds them: (category, count) pairs, NaN when none."""
+
+    def setUp(self):
+        processor = DataProcessor()
+        features = processor.extract_session_features(
+            processor.process_user_activity(make_activities(n_events=1500, n_users=40))
+        )
+        features.loc[features['user_id'].isin(['u1', 'u2']), 'categories'] = pd.Series(
+            [[] for _ in range(len(features))], index=features.index
+        )
+        self.profiles = {
+            profile['user_id']: profile for profile in processor.create_user_profiles(features).to_dict('records')
+        }
+        categories = ['electronics', 'home', 'sports', 'beauty']
+        products = [{'id': f'p{i}', 'popularity': i / 200, 'category': categories[i % 4]} for i in range(200)]
+        self.engine = RecommendationEngine(mf_top_k=0)
+        self.engine.train(list(self.profiles.values()), products)
+        self.categories = {p['id']: p['category'] for p in products}
+
+    def _categories(self, user_id, context):
+        codes, _ = CategoryGenerator(limit=30).generate(self.engine, user_id, context)
+        return {self.categories[self.engine.catalog_index.products[c]['id']] for c in codes}
+
+    def test_category_pairs_drive_the_generator(self):
+        top = self.profiles['u0']['top_categories']
+        self.assertIsInstance(top[0], tuple)
+        found = self._categories('u0', {})
+        self.assertTrue(found)
+        self.assertLessEqual(found, {name for name, _ in top})
+
+    def test_users_without_categories_fall_back_to_context(self):
+        self.assertTrue(pd.isna(self.profiles['u1']['top_categories']))
+        self.assertEqual(self._categories('u1', {}), set())
+        self.assertEqual(self._categories('u1', {'category': 'beauty'}), {'beauty'})
+        result = self.engine.get_recommendations('u1', n_recommendations=5, strategy='two_stage')
+        self.assertEqual(result['served_by'], 'two_stage')
+        self.assertEqual(len(result['recommended_products']), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
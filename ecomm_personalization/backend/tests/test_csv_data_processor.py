@@ -0,0 +1,130 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from data_processor import DataProcessor
+
+
+def make_segments(n_users=30, seed=4):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'user_pseudo_id': [f'u{u}' for u in range(n_users)],
+        'total_sessions': rng.integers(1, 20, n_users),
+        'avg_session_duration': rng.random(n_users) * 30,
+        'total_transactions': rng.integers(0, 5, n_users),
+        'avg_transaction_value': rng.random(n_users) * 100,
+        'primary_category': rng.choice(['electronics', 'home', 'sports'], n_users),
+        'rfm_segment': rng.choice(['Champions', 'Need Attention'], n_users)
+    })
+
+
+def write_activity_csv(path, n_rows=3000, n_users=40, seed=2):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2024-01-01T00:00:00')
+    pd.DataFrame({
+        'user_pseudo_id': np.char.add('u', rng.integers(0, n_users, n_rows).astype(str)),
+        'event_timestamp': start + rng.integers(0, 3 * 86400, n_rows).astype('timedelta64[s]'),
+        'event_name': rng.choice(['page_view', 'view_item', 'add_to_cart', 'purchase'], n_rows),
+        'page_title': np.char.add('Product page ', rng.integers(0, 500, n_rows).astype(str)),
+        'device_category': rng.choice(['mobile', 'desktop', 'tablet'], n_rows),
+        'country': rng.choice(['India', 'Germany'], n_rows),
+        'region': rng.choice(['Maharashtra', 'Bavaria'], n_rows),
+        'city': rng.choice(['Mumbai', 'Munich'], n_rows),
+        'source': rng.choice(['google', '(direct)'], n_rows),
+        'medium': rng.choice(['organic', '(none)'], n_rows),
+        'campaign': rng.choice(['(organic)', 'spring_sale'], n_rows),
+        'item_category': rng.choice(['Apparel', 'Home'], n_rows),
+        'page_type': rng.choice(['product', 'home', 'cart'], n_rows),
+        'category': rng.choice(['Apparel', 'Electronics', 'Home'], n_rows)
+    }).to_csv(path, index=False)
+
+
+class TestActivityPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp.name) / 'data'
+        self.data_dir.mkdir()
+        write_activity_csv(self.data_dir / 'dataset1_final.csv')
+
+    def processor(self, data_dir=None):
+        # Each load starts from an empty vocabulary in a private models dir
+        return DataProcessor(data_dir or self.data_dir, models_dir=tempfile.mkdtemp(dir=self.tmp.name))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_chunk_size_does_not_change_the_result(self):
+        whole = self.processor().load_data().activity_df
+        chunked = self.processor().load_data(chunksize=250).activity_df
+        pd.testing.assert_frame_equal(chunked, whole)
+        self.assertEqual(len(whole), 3000)
+        self.assertNotIn('page_title', whole.columns)
+        for column in DataProcessor.ACTIVITY_CATEGORICAL_COLUMNS + ('time_of_day',):
+            self.assertIsInstance(whole[column].dtype, pd.CategoricalDtype)
+
+    def test_missing_activity_file_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            self.processor(self.data_dir / 'missing').load_data()
+
+    def test_sessions_split_on_timeout_and_match_in_parallel(self):
+        serial = self.processor().load_data().create_user_sessions()
+        parallel = self.processor().load_data().create_user_sessions(n_jobs=2)
+        pd.testing.assert_frame_equal(parallel.user_sessions, serial.user_sessions)
+
+        events = serial.activity_df
+        gaps = events.groupby('session_id')['event_timestamp'].agg(lambda t: t.diff().max())
+        self.assertTrue((gaps.dropna() <= pd.Timedelta(minutes=30)).all())
+        # Each new session after a user's first follows a gap of more than 30 minutes
+        repeat = (events['new_session'] == 1) & events['user_pseudo_id'].duplicated()
+        self.assertTrue((events.loc[repeat, 'time_diff'] > 30 * 60).all())
+        self.assertEqual(len(serial.user_sessions), events['session_id'].nunique())
+
+
+class TestColdStartArtifact(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp.name) / 'data'
+        self.models_dir = Path(self.tmp.name) / 'models'
+        self.processor = DataProcessor(self.data_dir, models_dir=self.models_dir)
+        self.processor.user_segments = make_segments()
+        self.processor.build_recommendation_model()
+        self.processor.save_processed_data()
+        self.features = [4, 12.5, 1, 40.0]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fresh_processor_serves_from_saved_model(self):
+        self.assertFalse((self.models_dir / 'kmeans_model.pkl').exists())
+        expected = self.processor.get_cold_start_recommendations(self.features)
+        loaded = DataProcessor(self.data_dir, models_dir=self.models_dir)
+        actual = loaded.get_cold_start_recommendations(self.features)
+        self.assertEqual(actual['strategy'], 'collaborative_filtering')
+        self.assertIsInstance(loaded.knn_model._fit_X, np.ndarray)
+        for key in ['top_categories', 'segment', 'confidence', 'similar_users']:
+            self.assertEqual(actual[key], expected[key])
+        for key, value in expected['avg_metrics'].items():
+            self.assertAlmostEqual(actual['avg_metrics'][key], value)
+        np.testing.assert_allclose(loaded.scaler.transform([self.features]),
+                                   self.processor.scaler.transform([self.features]))
+
+    def test_missing_or_mismatched_model_falls_back(self):
+        empty = DataProcessor(self.data_dir, models_dir=Path(self.tmp.name) / 'empty')
+        self.assertFalse(empty.load_recommendation_model())
+        self.assertEqual(empty.get_cold_start_recommendations(self.features)['strategy'], 'popularity_based')
+
+        stale = DataProcessor(self.data_dir, models_dir=self.models_dir)
+        stale.user_segments = make_segments(n_users=10)
+        self.assertFalse(stale.load_recommendation_model())
+        self.assertIsNone(stale.knn_model)
+
+
+if __name__ == '__main__':
+    unittest.main()
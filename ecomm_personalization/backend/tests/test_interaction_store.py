@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.interaction_store import InteractionStore
+
+
+class TestInteractionStore(unittest.TestCase):
+    def setUp(self):
+        self.profiles = [
+            {'user_id': 'u1', 'products_viewed': ['p1', 'p2', 'p1']},
+            {'user_id': 'u2', 'products_viewed': []},
+            {'user_id': 'u3', 'products_viewed': ['p3']}
+        ]
+        self.store = InteractionStore.from_profiles(self.profiles, compact_threshold=3)
+
+    def test_encodes_ids_in_first_appearance_order(self):
+        self.assertEqual(self.store.user_ids, ['u1', 'u2', 'u3'])
+        self.assertEqual(self.store.item_ids, ['p1', 'p2', 'p3'])
+        matrix = self.store.matrix
+        self.assertEqual(matrix.shape, (3, 3))
+        self.assertEqual(matrix.dtype, np.float32)
+        np.testing.assert_array_equal(matrix.toarray(), [[2, 1, 0], [0, 0, 0], [0, 0, 1]])
+
+    def test_appends_are_visible_before_and_after_compaction(self):
+        self.store.add('u2', 'p4', 'purchase')
+        self.store.add('u4', 'p1', 'page_view')
+        self.assertEqual(self.store.user_item_ids('u2'), ['p4'])
+        self.assertEqual(self.store.user_item_ids('u4'), ['p1'])
+        self.store.add('u1', 'p2', 'add_to_cart')  # reaches the compaction threshold
+        self.assertEqual(self.store._pending_count, 0)
+        np.testing.assert_array_equal(
+            self.store.matrix.toarray(),
+            [[2, 4, 0, 0], [0, 0, 0, 5], [0, 0, 1, 0], [0.5, 0, 0, 0]]
+        )
+        items, weights = self.store.user_items('u1')
+        self.assertEqual([self.store.item_ids[i] for i in items], ['p1', 'p2'])
+        np.testing.assert_array_equal(weights, [2, 4])
+
+    def test_user_rows_include_pending_without_compacting(self):
+        self.store.add('u3', 'p1')
+        rows = self.store.user_rows(['u3', 'missing', 'u1'])
+        self.assertEqual(self.store._pending_count, 1)
+        np.testing.assert_array_equal(rows.toarray(), [[1, 0, 1], [0, 0, 0], [2, 1, 0]])
+
+    def test_add_many_with_event_types(self):
+        store = InteractionStore(event_weights={'wishlist': 2.0})
+        store.add_many(['a', 'b', 'a'], ['x', 'x', 'y'], event_types=['wishlist', 'unknown', 'purchase'])
+        np.testing.assert_array_equal(store.matrix.toarray(), [[2, 5], [1, 0]])
+        self.assertEqual(store.nnz, 3)
+        self.assertEqual(store.user_items('missing')[0].size, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import sys
+import os
+import numpy as np
+import scipy.sparse as sp
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.item_similarity import ItemCooccurrence
+from services.recommendation_engine import RecommendationEngine
+
+
+def dense_similarities(user_items, method):
+    binary = (user_items.toarray() > 0).astype(np.float64)
+    together = binary.T @ binary
+    counts = binary.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'cosine':
+            scores = together / np.sqrt(np.outer(counts, counts))
+        else:
+            scores = together * binary.shape[0] / np.outer(counts, counts)
+    scores[together == 0] = 0.0
+    np.fill_diagonal(scores, 0.0)
+    return scores, together
+
+
+class TestItemCooccurrence(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(15)
+        dense = (rng.random((80, 40)) < 0.15) * rng.integers(1, 4, (80, 40))
+        self.user_items = sp.csr_matrix(dense.astype(np.float32))
+
+    def test_matches_dense_reference(self):
+        for method in ItemCooccurrence.METHODS:
+            # Small blocks exercise the blocked product
+            model = ItemCooccurrence(top_k=40, method=method, block_size=7).fit(self.user_items)
+            expected, _ = dense_similarities(self.user_items, method)
+            np.testing.assert_allclose(model.similarities.toarray(), expected, rtol=1e-5)
+
+    def test_top_k_and_min_count(self):
+        model = ItemCooccurrence(top_k=5, min_count=2, block_size=16).fit(self.user_items)
+        expected, together = dense_similarities(self.user_items, 'cosine')
+        expected[together < 2] = 0.0
+        similarities = model.similarities
+        self.assertEqual(similarities.shape, (40, 40))
+        self.assertTrue((np.diff(similarities.indptr) <= 5).all())
+        self.assertEqual(similarities.diagonal().sum(), 0.0)
+        for item in range(40):
+            row = similarities.getrow(item)
+            if row.nnz:
+                # Every kept neighbour scores at least as high as every dropped one
+                dropped = np.delete(expected[item], row.indices)
+                self.assertGreaterEqual(row.data.min() + 1e-6, dropped.max())
+                np.testing.assert_allclose(row.data, expected[item, row.indices], rtol=1e-5)
+
+    def test_rejects_unknown_method(self):
+        with self.assertRaises(ValueError):
+            ItemCooccurrence(method='jaccard')
+
+
+class TestSimilarItemsStrategy(unittest.TestCase):
+    def setUp(self):
+        self.products = [{'id': f'p{i}', 'popularity': 1.0 / (i + 1)} for i in range(30)]
+        # Two groups of users with disjoint tastes
+        self.profiles = [
+            {
+                'user_id': f'u{u}',
+                'total_sessions': 3,
+                'products_viewed': [f'p{i}' for i in (range(0, 5) if u % 2 else range(10, 15))]
+            }
+            for u in range(20)
+        ]
+        self.profiles.append({'user_id': 'new', 'total_sessions': 1, 'products_viewed': ['p1', 'p2']})
+        self.engine = RecommendationEngine(item_top_k=10)
+        self.engine.train(self.profiles, self.products)
+
+    def test_recommends_items_viewed_together(self):
+        result = self.engine.get_recommendations('new', n_recommendations=3, strategy='similar_items')
+        self.assertEqual(result['served_by'], 'similar_items')
+        ids = [p['id'] for p in result['recommended_products']]
+        self.assertEqual(sorted(ids), ['p0', 'p3', 'p4'])
+        self.assertTrue(all('Similar to what you viewed' in p['recommendation_reason']
+                            for p in result['recommended_products']))
+
+    def test_fills_from_popular_without_seen_items(self):
+        result = self.engine.get_recommendations('new', n_recommendations=6, strategy='similar_items')
+        ids = [p['id'] for p in result['recommended_products']]
+        self.assertEqual(len(ids), 6)
+        self.assertEqual(len(set(ids)), 6)
+        self.assertNotIn('p1', ids[:3])
+        self.assertNotIn('p2', ids[:3])
+
+    def test_unknown_user_falls_back(self):
+        result = self.engine.get_recommendations('stranger', n_recommendations=3, strategy='similar_items')
+        self.assertNotEqual(result['served_by'], 'similar_items')
+
+    def test_batch_matches_single(self):
+        user_ids = ['new', 'u1', 'u2', 'stranger']
+        batch = self.engine.get_recommendations_batch(user_ids, n=4, strategy='similar_items')
+        self.assertEqual(batch, [
+            self.engine.get_recommendations(u, n_recommendations=4, strategy='similar_items')
+            for u in user_ids
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+import numpy as np
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.model_artifacts import (
+    IdIndex,
+    load_engine,
+    read_artifact,
+    save_engine,
+    write_artifact
+)
+from services.recommendation_engine import RecommendationEngine
+
+
+def make_engine(**kwargs):
+    rng = np.random.default_rng(3)
+    profiles = [
+        {
+            'user_id': f'u{u}',
+            'total_sessions': int(rng.integers(1, 20)),
+            'total_page_views': int(rng.integers(0, 100)),
+            'conversion_rate': float(rng.random()),
+            'products_viewed': [f'p{i}' for i in rng.choice(12, 4, replace=False)]
+        }
+        for u in range(30)
+    ]
+    products = [{'id': f'p{i}', 'popularity': i / 12} for i in range(12)]
+    engine = RecommendationEngine(mf_top_k=6, n_neighbours=4, **kwargs)
+    engine.train(profiles, products)
+    return engine
+
+
+class TestArtifactFormat(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'model')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_is_memory_mapped(self):
+        write_artifact(self.path, {'a/x': np.arange(6, dtype=np.int32).reshape(2, 3)}, {'k': 1})
+        arrays, metadata, _ = read_artifact(self.path)
+        self.assertIsInstance(arrays['a/x'], np.memmap)
+        self.assertFalse(arrays['a/x'].flags.writeable)
+        np.testing.assert_array_equal(arrays['a/x'], [[0, 1, 2], [3, 4, 5]])
+        self.assertEqual(metadata, {'k': 1})
+
+    def test_rewrite_replaces_previous_artifact(self):
+        write_artifact(self.path, {'x': np.zeros(3)})
+        write_artifact(self.path, {'y': np.ones(2)})
+        arrays, _, _ = read_artifact(self.path)
+        self.assertEqual(list(arrays), ['y'])
+        self.assertEqual(os.listdir(self.tmp.name), ['model'])
+
+    def test_rejects_object_arrays_and_unknown_versions(self):
+        with self.assertRaises(ValueError):
+            write_artifact(self.path, {'ids': np.array(['a', 1], dtype=object)})
+        self.assertFalse(os.path.exists(self.path))
+        write_artifact(self.path, {'x': np.zeros(1)})
+        manifest_path = os.path.join(self.path, 'manifest.json')
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest['format_version'] = 99
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+        with self.assertRaises(ValueError):
+            read_artifact(self.path)
+
+    def test_id_index_lookup_and_overlay(self):
+        index = IdIndex(np.array(['u3', 'u1', 'u2']))
+        self.assertEqual([index.get(k) for k in ['u1', 'u2', 'u3', 'u4']], [1, 2, 0, None])
+        self.assertIsNone(index.get(5))
+        index['u4'] = 3
+        self.assertEqual(index['u4'], 3)
+        self.assertEqual(len(index), 4)
+        self.assertEqual(list(index), ['u3', 'u1', 'u2', 'u4'])
+
+    def test_id_index_get_many_matches_get(self):
+        index = IdIndex(np.array(['u3', 'u1', 'u2']))
+        index['u4'] = 3
+        keys = ['u1', 'u4', 'missing', 'u3', 'u2', 'u1']
+        np.testing.assert_array_equal(index.get_many(keys), [index.get(k, -1) for k in keys])
+        np.testing.assert_array_equal(index.get_many(['u2', 5]), [2, -1])
+        np.testing.assert_array_equal(IdIndex(np.array([7, 3])).get_many([3, 4, 7]), [1, -1, 0])
+        self.assertEqual(len(IdIndex(np.empty(0, dtype='<U1')).get_many(['a'])), 1)
+
+
+class TestEngineArtifact(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'engine')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _assert_same_recommendations(self, engine, loaded, strategies=(None, 'matrix_factorization')):
+        for user_id in ['u0', 'u7', 'u29', 'stranger']:
+            for strategy in strategies:
+                expected = engine.get_recommendations(user_id, n_recommendations=5, strategy=strategy)
+                actual = loaded.get_recommendations(user_id, n_recommendations=5, strategy=strategy)
+                self.assertEqual(actual['recommendation_type'], expected['recommendation_type'])
+                self.assertEqual(actual['recommended_products'], expected['recommended_products'])
+
+    def test_als_engine_serves_identically(self):
+        engine = make_engine(ann_n_probe=2, ann_min_items=0)
+        save_engine(engine, self.path)
+        loaded = load_engine(self.path)
+        self._assert_same_recommendations(engine, loaded, strategies=(None, 'matrix_factorization', 'similar_items'))
+        self.assertIsInstance(loaded.mf_model.user_factors, np.memmap)
+        self.assertEqual(
+            loaded.mf_model.recommend_approximate('u3', n=4),
+            engine.mf_model.recommend_approximate('u3', n=4)
+        )
+
+    def test_svd_engine_serves_identically(self):
+        engine = make_engine(mf_algorithm='svd')
+        save_engine(engine, self.path)
+        self._assert_same_recommendations(engine, load_engine(self.path))
+
+    def test_loaded_engine_accepts_new_interactions(self):
+        engine = make_engine()
+        save_engine(engine, self.path)
+        loaded = load_engine(self.path)
+        for target in (engine, loaded):
+            self.assertTrue(target.record_interaction('u2', 'p11', 'purchase'))
+            self.assertTrue(target.record_interaction('newcomer', 'p5'))
+        self.assertEqual(loaded.interactions.user_item_ids('u2'), engine.interactions.user_item_ids('u2'))
+        for user_id in ['u2', 'newcomer']:
+            np.testing.assert_allclose(
+                loaded.mf_model.score_items(user_id, ['p1', 'p5', 'p11']),
+                engine.mf_model.score_items(user_id, ['p1', 'p5', 'p11'])
+            )
+        self.assertEqual(
+            loaded.mf_model.recommend_precomputed('u2', n=5),
+            engine.mf_model.recommend_precomputed('u2', n=5)
+        )
+        # The artifact on disk is untouched by the in-memory updates
+        reloaded = load_engine(self.path)
+        self.assertNotIn('newcomer', reloaded.mf_model.user_map)
+
+    def test_scaler_is_restored(self):
+        engine = make_engine()
+        save_engine(engine, self.path)
+        loaded = load_engine(self.path)
+        np.testing.assert_allclose(loaded.scaler.mean_, engine.scaler.mean_)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import sys
+import os
+import gc
+import tempfile
+import threading
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.model_artifacts import save_engine
+from services.model_holder import ModelHolder
+from services.recommendation_engine import RecommendationEngine
+
+
+PRODUCTS = [{'id': f'p{i}', 'popularity': i / 10} for i in range(10)]
+
+
+def make_profiles(offset=0):
+    return [
+        {
+            'user_id': f'u{u}',
+            'total_sessions': u + offset + 1,
+            'total_page_views': 3 * u + offset,
+            'products_viewed': [f'p{(u + offset + k) % 10}' for k in range(3)]
+        }
+        for u in range(8)
+    ]
+
+
+class GatedEngine(RecommendationEngine):
+    """Engine whose train() waits until the test opens the gate."""
+    started = None
+    gate = None
+
+    def train(self, user_profiles, products):
+        GatedEngine.started.set()
+        GatedEngine.gate.wait(5)
+        return super().train(user_profiles, products)
+
+
+class BlockingRecordEngine(RecommendationEngine):
+    """Engine whose record_interaction pauses after recording until released."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.recording = threading.Event()
+        self.release = threading.Event()
+
+    def record_interaction(self, user_id, product_id, event_type='product_view'):
+        recorded = super().record_interaction(user_id, product_id, event_type)
+        self.recording.set()
+        self.release.wait(5)
+        return recorded
+
+
+class TestModelHolder(unittest.TestCase):
+    def setUp(self):
+        engine = RecommendationEngine(mf_top_k=5)
+        engine.train(make_profiles(), PRODUCTS)
+        self.retired = []
+        self.holder = ModelHolder(engine, on_retire=self.retired.append)
+        GatedEngine.started = threading.Event()
+        GatedEngine.gate = threading.Event()
+
+    def test_in_flight_request_keeps_old_snapshot_until_done(self):
+        in_flight = self.holder.current
+        before = in_flight.get_recommendations('u1', n_recommendations=4)
+        self.holder.retrain(make_profiles(offset=3), PRODUCTS, background=False)
+        self.assertIsNot(self.holder.current, in_flight)
+        self.assertEqual(self.holder.version, 2)
+        # The retired engine is untouched and still answers the in-flight request
+        self.assertEqual(in_flight.get_recommendations('u1', n_recommendations=4), before)
+        gc.collect()
+        self.assertEqual(self.retired, [])
+        del in_flight
+        gc.collect()
+        self.assertEqual(self.retired, [1])
+
+    def test_readers_see_old_engine_during_background_retrain(self):
+        old = self.holder.current
+        self.holder.engine_factory = GatedEngine
+        thread = self.holder.retrain(make_profiles(offset=3), PRODUCTS)
+        self.assertTrue(GatedEngine.started.wait(5))
+        self.assertIs(self.holder.current, old)
+        self.assertEqual(len(old.get_recommendations('u2', n_recommendations=3)['recommended_products']), 3)
+        GatedEngine.gate.set()
+        thread.join(5)
+        self.assertIsInstance(self.holder.current, GatedEngine)
+        self.assertTrue(self.holder.current.is_trained)
+
+    def test_interactions_during_retrain_are_replayed(self):
+        self.holder.engine_factory = GatedEngine
+        thread = self.holder.retrain(make_profiles(), PRODUCTS)
+        self.assertTrue(GatedEngine.started.wait(5))
+        self.assertTrue(self.holder.record_interaction('u1', 'p9', 'purchase'))
+        GatedEngine.gate.set()
+        thread.join(5)
+        self.assertIn('p9', self.holder.current.interactions.user_item_ids('u1'))
+        # Recording after the swap goes straight to the new engine, once
+        self.holder.record_interaction('u1', 'p8')
+        self.assertEqual(self.holder.current.interactions.user_item_ids('u1').count('p8'), 1)
+
+    def test_interaction_recorded_across_the_swap_reaches_new_engine(self):
+        old = BlockingRecordEngine(mf_top_k=5)
+        old.train(make_profiles(), PRODUCTS)
+        holder = ModelHolder(old)
+        recorder = threading.Thread(target=holder.record_interaction, args=('u1', 'p9', 'purchase'))
+        recorder.start()
+        # The request has read the old engine and recorded on it; the retrain swaps meanwhile
+        self.assertTrue(old.recording.wait(5))
+        holder.retrain(make_profiles(), PRODUCTS, background=False)
+        self.assertIsNot(holder.current, old)
+        old.release.set()
+        recorder.join(5)
+        self.assertEqual(holder.current.interactions.user_item_ids('u1').count('p9'), 1)
+
+    def test_failed_training_keeps_current_engine(self):
+        current = self.holder.current
+        self.holder.retrain([], PRODUCTS, background=False)
+        self.assertIs(self.holder.current, current)
+        self.assertEqual(self.holder.version, 1)
+
+    def test_reload_publishes_artifact(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'engine')
+            save_engine(self.holder.current, path)
+            expected = self.holder.current.get_recommendations('u3', n_recommendations=4)
+            self.holder.reload(path, background=False)
+            self.assertEqual(self.holder.version, 2)
+            self.assertEqual(self.holder.current.get_recommendations('u3', n_recommendations=4), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.data_processor import DataProcessor
+from services.parallel import PackedFrame, partition_by_user
+from services.sharding import shard_for
+from test_session_processing import make_activities
+
+
+class TestPartitioning(unittest.TestCase):
+    def test_users_follow_their_serving_shard(self):
+        users = pd.Series(['u1', 'u2', None, 'u1', 'u7', 'u2'])
+        partitions = partition_by_user(users, 3)
+        self.assertEqual(sorted(np.concatenate(partitions).tolist()), list(range(len(users))))
+        for shard, positions in enumerate(partitions):
+            self.assertTrue(all(np.diff(positions) > 0))
+            for user in users.iloc[positions]:
+                self.assertEqual(shard, 0 if pd.isna(user) else shard_for(user, 3))
+
+    def test_packed_rows_round_trip(self):
+        frame = pd.DataFrame({
+            'user_id': ['a', 'b', None, 'c', 'a'],
+            'count': [1, 2, 3, 4, 5],
+            'timestamp': pd.to_datetime(['2024-01-01'] * 5),
+            'product_id': ['p1', None, 'p2', 'p3', 'p1']
+        })
+        positions = np.array([0, 2, 4])
+        packed = PackedFrame.encoder(frame)(positions)
+        # Only the values these rows use are shipped
+        self.assertEqual(list(packed.columns['user_id'][1]), ['a'])
+        pd.testing.assert_frame_equal(packed.to_frame(), frame.iloc[positions].reset_index(drop=True))
+
+
+class TestParallelProcess(unittest.TestCase):
+    def test_matches_single_process(self):
+        processor = DataProcessor()
+        activities = make_activities(n_events=1500, n_users=40)
+        expected = processor.process(activities)
+        actual = processor.process(activities, n_jobs=2, n_partitions=5)
+        for name in ['sessions', 'session_features', 'user_profiles']:
+            pd.testing.assert_frame_equal(actual[name], expected[name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+import asyncio
+import subprocess
+import threading
+from unittest import mock
+
+# Add the backend directory to the Python path
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND)
+
+from app.api.personalize import route
+
+
+class BarrierEngine:
+    """Answers only once ``parties`` requests are inside get_recommendations at the same time."""
+
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=5)
+
+    def get_recommendations(self, **kwargs):
+        self.barrier.wait()
+        return {
+            'recommendation_type': 'popular',
+            'explanation': 'Popular products',
+            'recommended_products': [],
+            'served_by': 'popular'
+        }
+
+
+class TestPersonalizeRoute(unittest.TestCase):
+    def test_import_does_not_start_models(self):
+        code = 'from app.api.personalize import route; assert route._model_holder is None'
+        subprocess.run([sys.executable, '-c', code], cwd=BACKEND, check=True, capture_output=True)
+
+    def test_holder_is_created_once(self):
+        created = []
+        with mock.patch.object(route, '_model_holder', None), \
+                mock.patch.object(route, '_create_model_holder', side_effect=lambda: created.append(object()) or created[-1]):
+            first = route.get_model_holder()
+            self.assertIs(route.get_model_holder(), first)
+            route.close_model_holder()
+            self.assertIsNot(route.get_model_holder(), first)
+        self.assertEqual(len(created), 2)
+
+    def test_concurrent_requests_are_served_in_parallel(self):
+        # Blocking scoring on the event loop would leave the second request
+        # unstarted and break the barrier
+        holder = mock.Mock(current=BarrierEngine(2))
+        request = route.PersonalizationRequest(contentType='homepage', context={}, userId='u1')
+
+        async def serve_two():
+            return await asyncio.gather(*(route.get_personalized_content(None, request) for _ in range(2)))
+
+        with mock.patch.object(route, '_model_holder', holder):
+            responses = asyncio.run(serve_two())
+        self.assertEqual([r['served_by'] for r in responses], ['popular', 'popular'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.data_processor import DataProcessor
+from services.model_artifacts import load_profile_store, load_sessionizer, save_profile_store
+from services.profile_aggregates import ProfileStore
+from services.sessionizer import StreamingSessionizer
+from test_session_processing import make_activities
+
+
+class TestProfileStore(unittest.TestCase):
+    def setUp(self):
+        self.processor = DataProcessor()
+        sessions = self.processor.process_user_activity(make_activities(n_events=2000, n_users=40))
+        self.features = self.processor.extract_session_features(sessions)
+        self.features['device_type'] = np.where(np.arange(len(self.features)) % 3, 'mobile', 'desktop')
+        self.batches = [self.features.iloc[chunk] for chunk in np.array_split(np.arange(len(self.features)), 6)]
+
+    def test_folded_batches_match_full_recompute(self):
+        store = ProfileStore()
+        for batch in self.batches:
+            store.update(batch)
+        pd.testing.assert_frame_equal(store.profiles(), self.processor.create_user_profiles(self.features))
+
+    def test_update_touches_only_batch_users(self):
+        store = ProfileStore()
+        store.update(self.batches[0])
+        others = {
+            user_id: aggregate.total_sessions for user_id, aggregate in store.aggregates.items() if user_id != 'u3'
+        }
+        touched = store.update(self.features[self.features['user_id'] == 'u3'])
+        self.assertEqual(touched, ['u3'])
+        self.assertEqual({user_id: store.aggregates[user_id].total_sessions for user_id in others}, others)
+        self.assertEqual(store.update([]), [])
+
+    def test_saved_store_keeps_folding(self):
+        store = ProfileStore()
+        for batch in self.batches[:3]:
+            store.update(batch)
+        with tempfile.TemporaryDirectory() as tmp:
+            save_profile_store(store, os.path.join(tmp, 'profiles'))
+            loaded = load_profile_store(os.path.join(tmp, 'profiles'))
+        pd.testing.assert_frame_equal(loaded.profiles(), store.profiles())
+        for batch in self.batches[3:]:
+            loaded.update(batch)
+        pd.testing.assert_frame_equal(loaded.profiles(), self.processor.create_user_profiles(self.features))
+
+    def test_process_merges_into_the_store(self):
+        earlier = make_activities(n_events=800, n_users=20)
+        # Two days later, so no session spans both batches
+        later = make_activities(n_events=800, n_users=25, seed=19)
+        for activity in later:
+            activity['timestamp'] = (pd.Timestamp(activity['timestamp']) + pd.Timedelta(days=2)).isoformat()
+
+        store = ProfileStore()
+        sessionizer = StreamingSessionizer()
+        self.processor.process(earlier, profile_store=store, sessionizer=sessionizer)
+        result = self.processor.process(later, profile_store=store, sessionizer=sessionizer, flush=True)
+        expected = self.processor.process(earlier + later)['user_profiles']
+        pd.testing.assert_frame_equal(store.profiles(), expected)
+        self.assertEqual(set(result['user_profiles']['user_id']), set(result['session_features']['user_id']))
+        self.assertEqual(len(store), len(expected))
+
+    def test_session_split_across_batches_is_counted_once(self):
+        activities = self._split_session_activities()
+        store = ProfileStore()
+        sessionizer = StreamingSessionizer()
+        first = self.processor.process(activities[:2], profile_store=store, sessionizer=sessionizer)
+        # The first session is still open after the first batch
+        self.assertTrue(first['session_features'].empty)
+        self.assertEqual(len(store), 0)
+        self.processor.process(activities[2:], profile_store=store, sessionizer=sessionizer, flush=True)
+
+        expected = self.processor.process(activities)['user_profiles']
+        pd.testing.assert_frame_equal(store.profiles(), expected)
+        profile = store.profiles().iloc[0]
+        self.assertEqual(profile['total_sessions'], 2)
+        self.assertEqual(profile['avg_session_duration'], 25 * 60 / 2)
+
+    def test_session_split_across_a_save_is_counted_once(self):
+        activities = self._split_session_activities()
+        store = ProfileStore()
+        sessionizer = StreamingSessionizer()
+        self.processor.process(activities[:2], profile_store=store, sessionizer=sessionizer)
+        with tempfile.TemporaryDirectory() as tmp:
+            save_profile_store(store, os.path.join(tmp, 'profiles'), sessionizer=sessionizer)
+            loaded = load_profile_store(os.path.join(tmp, 'profiles'))
+            loaded_sessionizer = load_sessionizer(os.path.join(tmp, 'profiles'))
+            save_profile_store(store, os.path.join(tmp, 'store-only'))
+            self.assertIsNone(load_sessionizer(os.path.join(tmp, 'store-only')))
+        self.assertEqual(len(loaded_sessionizer.open_sessions['u1']), 1)
+        self.assertEqual(loaded_sessionizer.watermark, sessionizer.watermark)
+
+        result = self.processor.process(activities[2:], profile_store=loaded, sessionizer=loaded_sessionizer,
+                                        flush=True)
+        pd.testing.assert_frame_equal(loaded.profiles(), self.processor.process(activities)['user_profiles'])
+        self.assertEqual(result['session_features']['session_id'].tolist(), [0, 1])
+        self.assertEqual(result['session_features']['products_viewed'][0], ['p0', 'p10', 'p20', 'p25'])
+
+    def _split_session_activities(self):
+        # One session from 10:00 to 10:25, then a second one at 11:30
+        start = pd.Timestamp('2024-01-01 10:00')
+        return [
+            {'user_id': 'u1', 'timestamp': (start + pd.Timedelta(minutes=minute)).isoformat(),
+             'action_type': action, 'device_type': 'mobile', 'product_id': f'p{minute}', 'category': 'home'}
+            for minute, action in [(0, 'page_view'), (10, 'product_view'), (20, 'add_to_cart'),
+                                   (25, 'purchase'), (90, 'page_view')]
+        ]
+
+    def test_process_into_store_needs_a_matching_sessionizer(self):
+        activities = make_activities(n_events=50, n_users=5)
+        with self.assertRaises(ValueError):
+            self.processor.process(activities, profile_store=ProfileStore())
+        with self.assertRaises(ValueError):
+            self.processor.process(activities, profile_store=ProfileStore(),
+                                   sessionizer=StreamingSessionizer(session_timeout=pd.Timedelta(minutes=5)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.ann_index import InnerProductIndex
+from services.model_artifacts import load_engine, save_engine
+from services.quantization import QuantizedRows, compact, grow_rows, writable
+from services.recommendation_engine import RecommendationEngine
+
+
+class TestQuantizedRows(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(16)
+        self.matrix = rng.normal(size=(50, 12)) * rng.uniform(0.01, 10, size=(50, 1))
+        self.matrix[3] = 0.0
+
+    def test_error_is_within_half_a_step_per_row(self):
+        rows = QuantizedRows.quantize(self.matrix)
+        self.assertEqual(rows.codes.dtype, np.int8)
+        self.assertEqual(rows.shape, self.matrix.shape)
+        step = np.abs(self.matrix).max(axis=1) / 127
+        error = np.abs(rows[:] - self.matrix).max(axis=1)
+        self.assertTrue((error <= step / 2 + 1e-6).all())
+        np.testing.assert_array_equal(rows[3], 0.0)
+        np.testing.assert_allclose(rows[7], rows[np.array([7])][0])
+
+    def test_set_and_grow_rows(self):
+        rows = QuantizedRows.quantize(self.matrix)
+        grown = grow_rows(rows, 80)
+        self.assertEqual(grown.shape, (80, 12))
+        np.testing.assert_array_equal(grown[:50], rows[:])
+        np.testing.assert_array_equal(grown[60], 0.0)
+        grown[60] = self.matrix[0] * 3
+        np.testing.assert_allclose(grown[60], self.matrix[0] * 3, atol=np.abs(self.matrix[0] * 3).max() / 254 + 1e-6)
+
+    def test_compact_modes(self):
+        self.assertEqual(compact(self.matrix, 'float32').dtype, np.float32)
+        self.assertIsInstance(compact(self.matrix, 'int8'), QuantizedRows)
+        self.assertEqual(compact(QuantizedRows.quantize(self.matrix), 'float64').dtype, np.float64)
+        with self.assertRaises(ValueError):
+            compact(self.matrix, 'float16')
+
+    def test_read_only_rows_are_copied(self):
+        rows = QuantizedRows.quantize(self.matrix)
+        rows.codes.flags.writeable = False
+        copy = writable(rows)
+        self.assertIsNot(copy, rows)
+        self.assertTrue(copy.flags.writeable)
+        np.testing.assert_array_equal(copy[:], rows[:])
+
+    def test_int8_index_with_exact_rerank(self):
+        rng = np.random.default_rng(0)
+        items = rng.normal(size=(2000, 16))
+        index = InnerProductIndex(n_lists=32, storage='int8').fit(items)
+        self.assertLess(index.nbytes, InnerProductIndex(n_lists=32).fit(items).nbytes / 4)
+        hits = 0
+        for query in rng.normal(size=(20, 16)):
+            candidates, _ = index.search(query, 40, n_probe=32)
+            # Exact re-rank of the quantized shortlist
+            reranked = candidates[np.argsort(-(items[candidates] @ query), kind='stable')[:10]]
+            exact = np.argsort(-(items @ query), kind='stable')[:10]
+            hits += len(np.intersect1d(reranked, exact))
+        self.assertGreaterEqual(hits / 200, 0.99)
+
+
+class TestEngineStorage(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.products = [{'id': f'p{i}', 'popularity': float(rng.random())} for i in range(400)]
+        weights = 1.0 / np.arange(1, 401)
+        self.profiles = [
+            {
+                'user_id': f'u{u}',
+                'total_sessions': int(rng.integers(1, 20)),
+                'total_page_views': int(rng.integers(0, 100)),
+                'conversion_rate': float(rng.random()),
+                'products_viewed': [f'p{i}' for i in rng.choice(400, 15, replace=False, p=weights / weights.sum())]
+            }
+            for u in range(300)
+        ]
+        self.reference = RecommendationEngine(mf_top_k=0, ann_n_probe=4, ann_min_items=0)
+        self.reference.train(self.profiles, self.products)
+
+    def _recall(self, engine, method):
+        user_ids = [f'u{u}' for u in range(0, 300, 3)]
+        hits = 0
+        for user_id in user_ids:
+            expected = getattr(self.reference.mf_model, method)(user_id, n=10)
+            hits += len(set(getattr(engine.mf_model, method)(user_id, n=10)) & set(expected))
+        return hits / (10 * len(user_ids))
+
+    def test_compact_storage_keeps_recall(self):
+        for storage, floor in [('float32', 1.0), ('int8', 0.95)]:
+            engine = RecommendationEngine(mf_top_k=0, ann_n_probe=4, ann_min_items=0, storage=storage)
+            engine.train(self.profiles, self.products)
+            mf = engine.mf_model
+            self.assertLessEqual(mf.user_factors.nbytes, self.reference.mf_model.user_factors.nbytes / 2)
+            self.assertEqual(mf.item_factors.dtype, np.float32)
+            self.assertGreaterEqual(self._recall(engine, 'recommend_approximate'), floor)
+            # Neighbours are built before compaction, so they match exactly
+            self.assertEqual(engine._find_similar_users('u5'), self.reference._find_similar_users('u5'))
+
+    def test_unknown_storage_is_rejected(self):
+        with self.assertRaises(ValueError):
+            RecommendationEngine(storage='bfloat16')
+
+    def test_int8_fold_in_and_artifact_round_trip(self):
+        engine = RecommendationEngine(mf_top_k=10, ann_n_probe=4, ann_min_items=0, storage='int8')
+        engine.train(self.profiles, self.products)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'engine')
+            save_engine(engine, path)
+            loaded = load_engine(path)
+            self.assertEqual(loaded.storage, 'int8')
+            self.assertIsInstance(loaded.mf_model.user_factors, QuantizedRows)
+            self.assertIsInstance(loaded.mf_model.ann_index[1].list_vectors, QuantizedRows)
+            for user_id in ['u1', 'u42']:
+                self.assertEqual(
+                    loaded.get_recommendations(user_id, strategy='matrix_factorization'),
+                    engine.get_recommendations(user_id, strategy='matrix_factorization')
+                )
+            # Fold-in copies the mapped codes and grows them for a new user
+            self.assertTrue(loaded.record_interaction('newcomer', 'p1'))
+            self.assertIsInstance(loaded.mf_model.user_factors, QuantizedRows)
+            self.assertEqual(
+                loaded.get_recommendations('newcomer', strategy='matrix_factorization')['served_by'],
+                'matrix_factorization'
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,484 @@
+import unittest
+import sys
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.recommendation_engine import (
+    ImplicitALSRecommender,
+    LatencyBudget,
+    MatrixFactorizationRecommender,
+    RecommendationEngine,
+    _top_n_indices,
+    _top_n_rows
+)
+
+
+def make_interactions(n_users=30, n_items=40, seed=7):
+    """Random explicit ratings so SVD produces distinct scores."""
+    rng = np.random.default_rng(seed)
+    interactions = []
+    for u in range(n_users):
+        for i in rng.choice(n_items, size=8, replace=False):
+            interactions.append({
+                'user_id': f'u{u}',
+                'item_id': f'p{i}',
+                'rating': int(rng.integers(1, 6))
+            })
+    return interactions
+
+
+class TestMatrixFactorizationRecommender(unittest.TestCase):
+    def setUp(self):
+        self.mf = MatrixFactorizationRecommender()
+        self.mf.model.random_state = 0
+        self.mf.fit(make_interactions())
+        # Include items the model has never seen
+        self.items = [f'p{i}' for i in range(45)]
+
+    def _predict_ranking(self, user_id, n):
+        predictions = [(iid, self.mf.model.predict(user_id, iid).est) for iid in self.items]
+        predictions.sort(key=lambda x: x[1], reverse=True)
+        return [iid for iid, _ in predictions[:n]]
+
+    def test_score_items_matches_predict(self):
+        for user_id in ['u0', 'u5', 'unknown_user']:
+            expected = [self.mf.model.predict(user_id, iid).est for iid in self.items]
+            np.testing.assert_allclose(self.mf.score_items(user_id, self.items), expected)
+
+    def test_recommend_matches_predict_ordering(self):
+        for user_id in ['u0', 'u3', 'u17', 'unknown_user']:
+            for n in [1, 5, 10, 50]:
+                self.assertEqual(
+                    self.mf.recommend(user_id, self.items, n=n),
+                    self._predict_ranking(user_id, n)
+                )
+
+    def test_recommend_untrained(self):
+        self.assertEqual(MatrixFactorizationRecommender().recommend('u0', self.items), [])
+
+    def test_materialized_table_matches_live_scoring(self):
+        self.mf.materialize_top_n(self.items, top_k=12)
+        user_map, _, table = self.mf.top_n_table
+        self.assertEqual(table.shape, (len(user_map), 12))
+        self.assertEqual(table.dtype, np.uint8)
+        for user_id in ['u0', 'u9', 'u29']:
+            self.assertEqual(
+                self.mf.recommend_precomputed(user_id, n=12),
+                self.mf.recommend(user_id, self.items, n=12)
+            )
+        # Unknown users and oversized requests fall back to live scoring
+        self.assertIsNone(self.mf.recommend_precomputed('unknown_user', n=5))
+        self.assertIsNone(self.mf.recommend_precomputed('u0', n=13))
+
+    def test_retrain_replaces_table(self):
+        self.mf.materialize_top_n(self.items, top_k=5)
+        self.mf.fit(make_interactions(n_users=10, seed=3))
+        self.assertIsNone(self.mf.top_n_table)
+        self.mf.fit(make_interactions(n_users=10, seed=3), item_ids=self.items, top_k=5)
+        self.assertEqual(self.mf.top_n_table[2].shape, (10, 5))
+        self.assertIsNone(self.mf.recommend_precomputed('u20', n=5))
+
+    def test_ann_index_with_all_lists_matches_exact(self):
+        self.mf.build_ann_index(self.items, n_lists=6)
+        for user_id in ['u0', 'u11', 'unknown_user']:
+            self.assertEqual(
+                self.mf.recommend_approximate(user_id, n=8, n_probe=6),
+                self.mf.recommend(user_id, self.items, n=8)
+            )
+
+    def test_fold_in_new_user(self):
+        history = [{'item_id': 'p1', 'rating': 5}, {'item_id': 'p2', 'rating': 1}, {'item_id': 'nope'}]
+        self.assertTrue(self.mf.fold_in('new_user', history))
+        self.assertIn('new_user', self.mf.user_map)
+        scores = self.mf.score_items('new_user', self.items)
+        self.assertFalse(np.allclose(scores, self.mf.score_items('unknown_user', self.items)))
+        self.assertFalse(self.mf.fold_in('other_user', [{'item_id': 'nope'}]))
+
+    def test_top_n_indices_breaks_ties_by_position(self):
+        scores = np.array([1.0, 3.0, 2.0, 3.0, 2.0, 2.0])
+        np.testing.assert_array_equal(_top_n_indices(scores, 3), [1, 3, 2])
+        np.testing.assert_array_equal(_top_n_indices(scores, 4), [1, 3, 2, 4])
+        np.testing.assert_array_equal(_top_n_indices(scores, 10), [1, 3, 2, 4, 5, 0])
+        self.assertEqual(len(_top_n_indices(scores, 0)), 0)
+
+    def test_top_n_rows_matches_per_row_selection(self):
+        # Coarse values so ties straddle the cut in many rows
+        scores = np.random.default_rng(5).integers(0, 4, size=(50, 12)).astype(np.float64)
+        for n in [1, 3, 7, 12, 20]:
+            expected = [_top_n_indices(row, n) for row in scores]
+            np.testing.assert_array_equal(_top_n_rows(scores, n), expected)
+
+
+class TestImplicitALSRecommender(unittest.TestCase):
+    def setUp(self):
+        # Two communities of users who only view items from their own half
+        self.interactions = [
+            {'user_id': f'u{u}', 'item_id': f'p{(u % 2) * 10 + k}', 'rating': 1}
+            for u in range(20)
+            for k in range(10)
+            if (u + k) % 3
+        ]
+        self.items = [f'p{i}' for i in range(20)]
+        self.als = ImplicitALSRecommender(factors=4, iterations=10, n_jobs=2)
+        self.als.fit(self.interactions)
+
+    def test_recommends_from_own_community(self):
+        for user_id, community in [('u0', range(0, 10)), ('u1', range(10, 20))]:
+            recommended = self.als.recommend(user_id, self.items, n=5)
+            self.assertTrue(all(int(iid[1:]) in community for iid in recommended))
+
+    def _per_row_solution(self, matrix, fixed):
+        gram = fixed.T @ fixed + self.als.regularization * np.eye(fixed.shape[1])
+        expected = np.zeros((matrix.shape[0], fixed.shape[1]))
+        for row in range(matrix.shape[0]):
+            cols = matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]
+            conf = self.als.alpha * matrix.data[matrix.indptr[row]:matrix.indptr[row + 1]]
+            lhs = gram + (fixed[cols] * conf[:, None]).T @ fixed[cols]
+            expected[row] = np.linalg.solve(lhs, fixed[cols].T @ (1.0 + conf))
+        return expected
+
+    def test_blocked_exact_solve_matches_per_row_solve(self):
+        matrix, fixed = self.als.user_items, self.als.item_factors
+        self.als.cg_steps = 0
+        self.als.block_bytes = 8 * 4 * 4 * 7  # force blocks of ~7 interactions
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            solved = self.als._least_squares(matrix, fixed, None, executor)
+        np.testing.assert_allclose(solved, self._per_row_solution(matrix, fixed), rtol=1e-6, atol=1e-10)
+
+    def test_conjugate_gradient_converges_to_exact_solve(self):
+        matrix, fixed = self.als.user_items, self.als.item_factors
+        self.als.cg_steps = 4  # CG is exact after k steps
+        self.als.block_bytes = 8 * 4 * 7
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            solved = self.als._least_squares(matrix, fixed, np.zeros_like(self.als.user_factors), executor)
+        np.testing.assert_allclose(solved, self._per_row_solution(matrix, fixed), rtol=1e-4, atol=1e-8)
+
+    def test_fold_in_matches_user_half_step(self):
+        # Folding in a trained user's own history is the next ALS user update
+        history = [{'item_id': self.als.reverse_item_map[i]} for i in self.als.user_items[3].indices]
+        expected = self._per_row_solution(self.als.user_items, self.als.item_factors)[3]
+        self.als.fold_in('u3', history)
+        np.testing.assert_allclose(self.als.user_factors[3], expected, rtol=1e-6, atol=1e-10)
+
+    def test_fold_in_new_users_refreshes_recommendations(self):
+        self.als.materialize_top_n(self.items, top_k=5)
+        for k in range(40):
+            self.als.fold_in(f'new{k}', [{'item_id': 'p12'}, {'item_id': 'p15'}])
+        self.assertEqual(len(self.als.user_map), 60)
+        self.assertGreaterEqual(len(self.als.user_factors), 60)
+        self.assertTrue({'p12', 'p15'} <= set(self.als.recommend('new39', self.items, n=3)))
+        self.assertIsNone(self.als.recommend_precomputed('new39', n=5))
+
+        # Existing users get their materialized row recomputed in place
+        self.als.fold_in('u0', [{'item_id': 'p11'}, {'item_id': 'p13'}, {'item_id': 'p17'}])
+        self.assertEqual(
+            self.als.recommend_precomputed('u0', n=5),
+            self.als.recommend('u0', self.items, n=5)
+        )
+
+    def test_repeated_views_accumulate_confidence(self):
+        als = ImplicitALSRecommender(factors=2, iterations=1)
+        als.fit([{'user_id': 'a', 'item_id': 'x'}] * 3 + [{'user_id': 'a', 'item_id': 'y'}])
+        self.assertEqual(als.user_items[0, als.item_map['x']], 3)
+
+
+class TestRecommendationEngineMatrixFactorization(unittest.TestCase):
+    def setUp(self):
+        self.products = [{'id': f'p{i}', 'popularity': i / 10} for i in range(10)]
+        self.profiles = [
+            {
+                'user_id': f'u{u}',
+                'total_sessions': u + 1,
+                'total_page_views': 3 * u,
+                'products_viewed': [f'p{(u + k) % 10}' for k in range(3)]
+            }
+            for u in range(6)
+        ]
+        self.engine = RecommendationEngine(mf_top_k=5)
+        self.engine.train(self.profiles, self.products)
+
+    def test_known_user_served_from_table(self):
+        result = self.engine.get_recommendations('u1', n_recommendations=4, strategy='matrix_factorization')
+        expected = self.engine.mf_model.recommend('u1', list(self.engine.product_features), n=4)
+        self.assertEqual(result['recommendation_type'], 'matrix_factorization')
+        self.assertEqual([p['id'] for p in result['recommended_products']], expected)
+
+    def test_record_interaction_folds_in_history(self):
+        self.assertTrue(self.engine.record_interaction('u1', 'p9', 'add_to_cart'))
+        self.assertEqual(self.engine.interactions.user_item_ids('u1'), ['p1', 'p2', 'p3', 'p9'])
+        self.assertTrue(self.engine.record_interaction('visitor', 'p4'))
+        self.assertIn('visitor', self.engine.mf_model.user_map)
+        self.assertFalse(self.engine.record_interaction('visitor', None))
+
+    def test_unseen_user_uses_live_scoring(self):
+        result = self.engine.get_recommendations('u99', n_recommendations=4, strategy='matrix_factorization')
+        self.assertEqual(len(result['recommended_products']), 4)
+
+    def test_catalog_rows_are_cached_until_the_catalog_or_model_changes(self):
+        mf = self.engine.mf_model
+        catalog = self.engine.catalog_ids
+        rows = mf._item_indices(catalog, cache=True)
+        self.assertIs(mf._item_indices(catalog, cache=True), rows)
+        np.testing.assert_array_equal(rows, mf._item_indices(catalog))
+
+        self.engine.update_catalog(self.products + [{'id': 'p10', 'popularity': 0}])
+        self.assertIsNot(self.engine.catalog_ids, catalog)
+        result = self.engine.get_recommendations('u99', n_recommendations=11, strategy='matrix_factorization')
+        self.assertEqual(len(result['recommended_products']), 11)
+        rows = mf._item_indices(self.engine.catalog_ids, cache=True)
+        self.assertEqual(rows[-1], -1)
+
+        # A refit builds a new item map, so the cached rows are recomputed
+        self.engine.train(self.profiles, self.products)
+        self.assertIsNot(mf._item_indices(self.engine.catalog_ids, cache=True), rows)
+
+    def test_small_catalog_keeps_exact_scoring(self):
+        engine = RecommendationEngine(mf_top_k=0, ann_n_probe=2)
+        engine.train(self.profiles, self.products)
+        self.assertIsNone(engine.mf_model.ann_index)
+        engine = RecommendationEngine(mf_top_k=0, ann_n_probe=2, ann_min_items=len(self.products))
+        engine.train(self.profiles, self.products)
+        self.assertIsNotNone(engine.mf_model.ann_index)
+
+
+class TestPopularityIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        # Coarse popularity values so ties are common
+        self.products = [{'id': f'p{i}', 'popularity': float(rng.integers(0, 5))} for i in range(50)]
+        self.engine = RecommendationEngine()
+        self.engine.update_catalog(self.products)
+
+    def _reference(self, n, exclude_ids):
+        return sorted(
+            [p for p in self.products if p['id'] not in exclude_ids],
+            key=lambda x: x.get('popularity', 0),
+            reverse=True
+        )[:n]
+
+    def test_matches_full_sort(self):
+        for n, exclude_ids in [(10, []), (5, ['p3', 'p7']), (20, [f'p{i}' for i in range(0, 50, 3)]),
+                               (60, ['p1', 'missing']), (0, ['p2'])]:
+            self.assertEqual(self.engine._get_popular_products(n, exclude_ids), self._reference(n, exclude_ids))
+
+    def test_catalog_change_rebuilds_ordering(self):
+        self.engine.update_catalog([{'id': 'a', 'popularity': 0.1}, {'id': 'b', 'popularity': 0.9}, {'id': 'c'}])
+        self.assertEqual([p['id'] for p in self.engine._get_popular_products(3)], ['b', 'a', 'c'])
+        self.assertEqual([p['id'] for p in self.engine._get_popular_products(3, ['b'])], ['a', 'c'])
+
+
+class TestNeighbourTable(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.profiles = [
+            {
+                'user_id': f'u{u}',
+                'total_sessions': int(rng.integers(1, 20)),
+                'total_page_views': int(rng.integers(0, 100)),
+                'total_purchases': int(rng.integers(0, 5)),
+                'conversion_rate': float(rng.random()),
+                'products_viewed': [f'p{i}' for i in rng.choice(10, 3, replace=False)]
+            }
+            for u in range(40)
+        ]
+        self.products = [{'id': f'p{i}', 'popularity': i / 10} for i in range(10)]
+        self.engine = RecommendationEngine(n_neighbours=4)
+        self.engine.train(self.profiles, self.products)
+
+    def _features(self):
+        features = self.engine._prepare_user_features(self.profiles, fit=False)
+        return features[self.engine.user_feature_columns].to_numpy(dtype=np.float64)
+
+    def _brute_force(self, row):
+        features = self._features()
+        unit = features / np.linalg.norm(features, axis=1, keepdims=True)
+        sims = unit @ unit[row]
+        sims[row] = -np.inf
+        return np.sort(sims)[::-1][:4]
+
+    def test_table_matches_brute_force_cosine(self):
+        _, user_ids, indices, similarities = self.engine.user_similarity_model
+        # 7-row blocks, and a budget below one row (which still takes one row at a time)
+        for block_bytes in [7 * 16 * len(user_ids), 1]:
+            _, _, block_indices, _ = self.engine._build_neighbour_table(
+                user_ids, self._features(), block_bytes=block_bytes
+            )
+            np.testing.assert_array_equal(indices, block_indices)
+        for row in range(len(user_ids)):
+            self.assertNotIn(row, indices[row])
+            np.testing.assert_allclose(similarities[row], self._brute_force(row), rtol=1e-5)
+
+    def test_find_similar_users_is_a_lookup(self):
+        similar = self.engine._find_similar_users('u3', n_similar=3)
+        self.assertEqual(len(similar), 3)
+        self.assertNotIn('u3', [s['user_id'] for s in similar])
+        scores = [s['similarity_score'] for s in similar]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(self.engine._find_similar_users('nobody'), [])
+
+    def test_personalized_recommendations(self):
+        result = self.engine.get_recommendations('u5', n_recommendations=5)
+        self.assertEqual(result['recommendation_type'], 'personalized')
+        self.assertEqual(len(result['recommended_products']), 5)
+
+    def test_neighbour_scoring_matches_reference(self):
+        self.engine.record_interaction('u7', 'p9', 'purchase')
+        similar = self.engine._find_similar_users('u3', n_similar=4)
+        seen = set(self.engine.interactions.user_item_ids('u3'))
+        expected = {}
+        for neighbour in similar:
+            items, weights = self.engine.interactions.user_items(neighbour['user_id'])
+            for item, weight in zip(items, weights):
+                product_id = self.engine.interactions.item_ids[item]
+                if product_id not in seen:
+                    expected[product_id] = expected.get(product_id, 0) + neighbour['similarity_score'] * weight
+
+        products = self.engine._get_products_from_similar_users('u3', similar, max_products=3)
+        np.testing.assert_allclose(
+            [expected[p['id']] for p in products],
+            sorted(expected.values(), reverse=True)[:3],
+            rtol=1e-6
+        )
+        for product in products:
+            self.assertNotIn(product['id'], seen)
+            self.assertIn(f"{expected[product['id']]:.2f}", product['recommendation_reason'])
+            self.assertNotIn('recommendation_reason', self.engine.product_features[product['id']])
+
+    def test_background_refresh_uses_frozen_scaler(self):
+        mean_before = self.engine.scaler.mean_.copy()
+        previous = self.engine.user_similarity_model
+        self.engine.user_profiles['u0']['total_sessions'] = 500
+        self.engine.refresh_neighbours().join()
+        np.testing.assert_array_equal(self.engine.scaler.mean_, mean_before)
+        self.assertIsNot(self.engine.user_similarity_model, previous)
+
+
+class TestRecommendationsBatch(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.profiles = [
+            {
+                'user_id': f'u{u}',
+                'total_sessions': int(rng.integers(1, 20)),
+                'total_page_views': int(rng.integers(0, 100)),
+                'conversion_rate': float(rng.random()),
+                'products_viewed': [f'p{i}' for i in rng.choice(30, 5, replace=False)]
+            }
+            for u in range(50)
+        ]
+        self.products = [{'id': f'p{i}', 'popularity': float(rng.integers(0, 4)),
+                          'is_mobile_friendly': bool(i % 3), 'popularity_morning': float(rng.random()),
+                          'popularity_evening': float(rng.random())} for i in range(25)]
+        self.user_ids = ['u0', 'u13', None, 'stranger', 'u49', 'u13', 'u7']
+        self.contexts = [
+            None,
+            {'device_type': 'mobile'},
+            {'device_type': 'mobile', 'time_of_day': 'morning'},
+            {'time_of_day': 'evening'},
+            {},
+            None,
+            {'device_type': 'desktop', 'time_of_day': 'afternoon'}
+        ]
+
+    def _assert_matches_loop(self, engine, n, strategy=None):
+        batch = engine.get_recommendations_batch(self.user_ids, self.contexts, n=n, strategy=strategy)
+        loop = [
+            engine.get_recommendations(u, c, n_recommendations=n, strategy=strategy)
+            for u, c in zip(self.user_ids, self.contexts)
+        ]
+        self.assertEqual(batch, loop)
+
+    def test_matches_single_user_calls(self):
+        engine = RecommendationEngine(mf_top_k=8, n_neighbours=6)
+        engine.train(self.profiles, self.products)
+        engine.record_interaction('u13', 'p27', 'purchase')
+        engine.record_interaction('newcomer', 'p3')
+        self.user_ids.append('newcomer')
+        self.contexts.append(None)
+        for n in [3, 8, 12]:
+            for strategy in [None, 'matrix_factorization']:
+                self._assert_matches_loop(engine, n, strategy)
+
+    def test_matches_without_table_and_with_ann(self):
+        for kwargs in [{'mf_top_k': 0}, {'mf_top_k': 0, 'ann_n_probe': 2, 'ann_min_items': 0}]:
+            engine = RecommendationEngine(mf_algorithm='svd', **kwargs)
+            engine.mf_model.model.random_state = 0
+            engine.train(self.profiles, self.products)
+            self._assert_matches_loop(engine, 6, 'matrix_factorization')
+
+    def test_contexts_must_align(self):
+        engine = RecommendationEngine()
+        with self.assertRaises(ValueError):
+            engine.get_recommendations_batch(['u1', 'u2'], [None])
+        self.assertEqual(engine.get_recommendations_batch([]), [])
+
+
+class TestLatencyBudget(unittest.TestCase):
+    def setUp(self):
+        self.products = [{'id': f'p{i}', 'popularity': i / 10} for i in range(10)]
+        self.profiles = [
+            {
+                'user_id': f'u{u}',
+                'total_sessions': u + 1,
+                'total_page_views': 3 * u,
+                'products_viewed': [f'p{(u + k) % 10}' for k in range(3)]
+            }
+            for u in range(6)
+        ]
+
+    def _engine(self, **kwargs):
+        engine = RecommendationEngine(**kwargs)
+        engine.train(self.profiles, self.products)
+        return engine
+
+    def test_budget_tracks_remaining_time(self):
+        self.assertEqual(LatencyBudget().remaining_ms(), float('inf'))
+        budget = LatencyBudget(1000)
+        self.assertTrue(budget.allows(10))
+        self.assertFalse(budget.allows(2000))
+        self.assertFalse(LatencyBudget(0).allows(1))
+
+    def test_precomputed_tiers_serve_without_budget_left(self):
+        engine = self._engine(mf_top_k=5)
+        result = engine.get_recommendations('u1', n_recommendations=4, strategy='matrix_factorization', budget_ms=0)
+        self.assertEqual(result['served_by'], 'matrix_factorization')
+        result = engine.get_recommendations('u1', n_recommendations=4, budget_ms=0)
+        self.assertEqual(result['served_by'], 'popular')
+        self.assertEqual(len(result['recommended_products']), 4)
+
+    def test_degrades_tier_by_tier(self):
+        engine = self._engine(mf_top_k=0)
+        engine.stage_latency_ms['matrix_factorization'] = 500.0
+        result = engine.get_recommendations('u1', n_recommendations=4, strategy='matrix_factorization', budget_ms=100)
+        self.assertEqual(result['served_by'], 'neighbours')
+        self.assertEqual(result['recommendation_type'], 'personalized')
+        engine.stage_latency_ms['neighbours'] = 500.0
+        result = engine.get_recommendations('u1', n_recommendations=4, strategy='matrix_factorization', budget_ms=100)
+        self.assertEqual(result['served_by'], 'popular')
+        # Without a budget every stage runs regardless of its estimate
+        result = engine.get_recommendations('u1', n_recommendations=4, strategy='matrix_factorization')
+        self.assertEqual(result['served_by'], 'matrix_factorization')
+
+    def test_skipped_stage_recovers_after_latency_spike(self):
+        engine = self._engine(mf_top_k=0)
+        # One 300 ms call at alpha 0.2
+        engine.stage_latency_ms['neighbours'] = 60.0
+        served = [engine.get_recommendations('u1', n_recommendations=4, budget_ms=50)['served_by'] for _ in range(3)]
+        self.assertEqual(served[0], 'popular')
+        self.assertEqual(served[-1], 'neighbours')
+        self.assertLess(engine.stage_latency_ms['neighbours'], 50.0)
+
+    def test_live_stages_update_estimates(self):
+        engine = self._engine(mf_top_k=0)
+        engine.get_recommendations('u2', n_recommendations=3, strategy='matrix_factorization')
+        engine.get_recommendations('u2', n_recommendations=3)
+        self.assertGreater(engine.stage_latency_ms['matrix_factorization'], 0)
+        self.assertGreater(engine.stage_latency_ms['neighbours'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,274 @@
+import unittest
+import sys
+import os
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.data_processor import DataProcessor, sessionize
+from services.sessionizer import StreamingSessionizer
+
+
+def make_activities(n_events=600, n_users=15, seed=18):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01')
+    return [
+        {
+            'user_id': f'u{u}',
+            'timestamp': (start + pd.Timedelta(seconds=int(t))).isoformat(),
+            'action_type': action,
+            'device_type': device,
+            'product_id': f'p{p}' if p >= 0 else None,
+            'category': category if p % 2 == 0 else None
+        }
+        for u, t, action, device, p, category in zip(
+            rng.integers(0, n_users, n_events),
+            rng.integers(0, 86400, n_events),
+            rng.choice(['page_view', 'product_view', 'add_to_cart', 'purchase', 'search'], n_events),
+            rng.choice(['mobile', 'desktop', None], n_events),
+            rng.integers(-3, 40, n_events),
+            rng.choice(['electronics', 'home', 'sports'], n_events)
+        )
+    ]
+
+
+def reference_sessions(user_activities, session_timeout):
+    """The groupby sessionization the kernel replaces."""
+    df = pd.DataFrame(user_activities)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df.sort_values(['user_id', 'timestamp'])
+    df['time_diff'] = df.groupby('user_id')['timestamp'].diff()
+    df['new_session'] = (df['time_diff'].isna()) | (df['time_diff'] > session_timeout)
+    df['session_id'] = df['new_session'].cumsum()
+    return df
+
+
+def reference_session_features(session_data):
+    """Per-session loop the vectorized implementation replaces."""
+    features = []
+    for session_id, session in session_data.groupby('session_id'):
+        products = session[session['product_id'].notna()]['product_id']
+        categories = session[session['category'].notna()]['category']
+        features.append({
+            'session_id': session_id,
+            'user_id': session['user_id'].iloc[0],
+            'start_time': session['timestamp'].min(),
+            'end_time': session['timestamp'].max(),
+            'duration_seconds': (session['timestamp'].max() - session['timestamp'].min()).total_seconds(),
+            'num_actions': len(session),
+            'page_views': (session['action_type'] == 'page_view').sum(),
+            'product_views': (session['action_type'] == 'product_view').sum(),
+            'add_to_cart': (session['action_type'] == 'add_to_cart').sum(),
+            'purchase': (session['action_type'] == 'purchase').sum(),
+            'devices_used': session['device_type'].nunique(),
+            'unique_products_viewed': products.nunique(),
+            'categories_viewed': categories.nunique(),
+            'products_viewed': products.tolist(),
+            'categories': categories.tolist()
+        })
+    return pd.DataFrame(features)
+
+
+def reference_user_profiles(sessions_df):
+    """Per-user loop the vectorized implementation replaces."""
+    user_profiles = []
+    for user_id, user_sessions in sessions_df.groupby('user_id'):
+        profile = {
+            'user_id': user_id,
+            'first_seen': user_sessions['start_time'].min(),
+            'last_seen': user_sessions['end_time'].max(),
+            'total_sessions': len(user_sessions),
+            'total_duration_seconds': user_sessions['duration_seconds'].sum(),
+            'avg_session_duration': user_sessions['duration_seconds'].mean(),
+            'total_page_views': user_sessions['page_views'].sum(),
+            'total_product_views': user_sessions['product_views'].sum(),
+            'total_add_to_cart': user_sessions['add_to_cart'].sum(),
+            'total_purchases': user_sessions['purchase'].sum(),
+            'conversion_rate': user_sessions['purchase'].sum() / len(user_sessions),
+            'unique_products_viewed': len(set(p for sublist in user_sessions['products_viewed'].dropna() for p in sublist)),
+            'unique_categories_viewed': len(set(c for sublist in user_sessions['categories'].dropna() for c in sublist))
+        }
+        if 'device_type' in user_sessions.columns:
+            profile['primary_device'] = user_sessions['device_type'].mode()[0]
+        category_counts = {}
+        for categories in user_sessions['categories'].dropna():
+            for category in categories:
+                category_counts[category] = category_counts.get(category, 0) + 1
+        if category_counts:
+            profile['top_categories'] = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:3]
+        user_profiles.append(profile)
+    return pd.DataFrame(user_profiles)
+
+
+class TestSessionFeatures(unittest.TestCase):
+    def setUp(self):
+        self.processor = DataProcessor()
+        self.sessions = self.processor.process_user_activity(make_activities())
+
+    def test_matches_per_session_loop(self):
+        features = self.processor.extract_session_features(self.sessions)
+        pd.testing.assert_frame_equal(features, reference_session_features(self.sessions))
+
+    def test_unsorted_input_and_missing_session_ids(self):
+        shuffled = self.sessions.sample(frac=1.0, random_state=0)
+        shuffled.loc[shuffled.index[:5], 'session_id'] = np.nan
+        pd.testing.assert_frame_equal(
+            self.processor.extract_session_features(shuffled),
+            reference_session_features(shuffled)
+        )
+
+    def test_empty_input(self):
+        self.assertEqual(self.processor.extract_session_features(pd.DataFrame()), [])
+
+
+class TestUserProfiles(unittest.TestCase):
+    def setUp(self):
+        self.processor = DataProcessor()
+        sessions = self.processor.process_user_activity(make_activities(n_events=1500, n_users=40))
+        self.features = self.processor.extract_session_features(sessions)
+
+    def test_matches_per_user_loop(self):
+        pd.testing.assert_frame_equal(
+            self.processor.create_user_profiles(self.features),
+            reference_user_profiles(self.features)
+        )
+
+    def test_device_mode_and_category_ties(self):
+        features = self.features.copy()
+        features['device_type'] = np.where(np.arange(len(features)) % 3, 'mobile', 'desktop')
+        # Sessions without any categories leave some users with no top_categories
+        features.loc[features['user_id'].isin(['u1', 'u2']), 'categories'] = pd.Series(
+            [[] for _ in range(len(features))], index=features.index
+        )
+        profiles = self.processor.create_user_profiles(features)
+        pd.testing.assert_frame_equal(profiles, reference_user_profiles(features))
+        self.assertTrue(profiles.loc[profiles['user_id'] == 'u1', 'top_categories'].isna().all())
+
+    def test_ties_keep_first_seen_order(self):
+        features = self.features.iloc[:2].copy()
+        features['user_id'] = 'u0'
+        features['categories'] = [['sports', 'home', 'beauty'], ['fashion', 'home', 'toys', 'beauty']]
+        profiles = self.processor.create_user_profiles(features)
+        self.assertEqual(profiles['top_categories'][0], [('home', 2), ('beauty', 2), ('sports', 1)])
+
+
+class TestSessionize(unittest.TestCase):
+    def setUp(self):
+        self.processor = DataProcessor()
+        self.activities = make_activities(n_events=2000, n_users=30)
+
+    def expected_sessions(self):
+        # Low-cardinality columns come back dictionary-encoded
+        return self.processor.vocabulary.encode_frame(
+            reference_sessions(self.activities, self.processor.session_timeout), DataProcessor.CATEGORICAL_COLUMNS
+        )
+
+    def test_matches_groupby_sessionization(self):
+        pd.testing.assert_frame_equal(self.processor.process_user_activity(self.activities), self.expected_sessions())
+
+    def test_missing_users_and_timestamps(self):
+        for activity in self.activities[:10]:
+            activity['user_id'] = None
+        for activity in self.activities[10:20]:
+            activity['timestamp'] = None
+        pd.testing.assert_frame_equal(self.processor.process_user_activity(self.activities), self.expected_sessions())
+
+    def test_session_ids_are_unique_across_users(self):
+        start = pd.Timestamp('2024-01-01')
+        users = pd.Series(['b', 'a', 'b', 'a', 'a'])
+        timestamps = pd.Series([start, start, start + pd.Timedelta(hours=2), start + pd.Timedelta(minutes=30),
+                                start + pd.Timedelta(minutes=61)]).astype('datetime64[s]')
+        order, time_diff, new_session, session_ids = sessionize(users, timestamps, timedelta(minutes=30),
+                                                                first_session_id=5)
+        self.assertEqual(order.tolist(), [1, 3, 4, 0, 2])
+        self.assertEqual(session_ids.tolist(), [5, 5, 6, 7, 8])
+        self.assertEqual(new_session.tolist(), [True, False, True, True, True])
+        self.assertEqual(pd.Series(time_diff).dt.total_seconds().fillna(-1).tolist(), [-1, 1800, 1860, -1, 7200])
+
+
+def session_keys(features):
+    """Sessions as comparable tuples, ignoring session ids."""
+    frame = pd.DataFrame(features).drop(columns='session_id')
+    frame['start_time'] = pd.to_datetime(frame['start_time']).astype('datetime64[ns]')
+    frame['end_time'] = pd.to_datetime(frame['end_time']).astype('datetime64[ns]')
+    frame['products_viewed'] = frame['products_viewed'].map(tuple)
+    frame['categories'] = frame['categories'].map(tuple)
+    return sorted(map(tuple, frame.astype(object).itertuples(index=False)), key=repr)
+
+
+class TestStreamingSessionizer(unittest.TestCase):
+    def setUp(self):
+        self.processor = DataProcessor()
+        activities = make_activities(n_events=800, n_users=12)
+        # Distinct timestamps so the batch order within a user is unambiguous
+        offsets = np.random.default_rng(20).permutation(2 * 86400)[:len(activities)]
+        for activity, offset in zip(activities, offsets):
+            activity['timestamp'] = (pd.Timestamp('2024-01-01') + pd.Timedelta(seconds=int(offset))).isoformat()
+        self.activities = sorted(activities, key=lambda a: a['timestamp'])
+        self.expected = session_keys(
+            self.processor.extract_session_features(self.processor.process_user_activity(self.activities))
+        )
+
+    def test_in_order_stream_matches_batch(self):
+        sessionizer = StreamingSessionizer(self.processor.session_timeout)
+        sessions = list(sessionizer.stream(iter(self.activities), chunk_size=64))
+        self.assertEqual(session_keys(sessions), self.expected)
+        self.assertEqual(sessionizer.late_events, 0)
+        self.assertEqual([s['session_id'] for s in sessions], list(range(len(sessions))))
+
+    def test_sessions_close_once_the_timeout_passes(self):
+        sessionizer = StreamingSessionizer(timedelta(minutes=30))
+        start = pd.Timestamp('2024-01-01')
+        self.assertEqual(sessionizer.process([
+            {'user_id': 'u1', 'timestamp': start, 'action_type': 'page_view'},
+            {'user_id': 'u1', 'timestamp': start + pd.Timedelta(minutes=20), 'action_type': 'purchase'}
+        ]), [])
+        self.assertEqual(len(sessionizer.open_sessions), 1)
+        closed = sessionizer.process([
+            {'user_id': 'u2', 'timestamp': start + pd.Timedelta(minutes=51), 'action_type': 'page_view'}
+        ])
+        self.assertEqual(len(closed), 1)
+        self.assertEqual((closed[0]['user_id'], closed[0]['num_actions'], closed[0]['purchase']), ('u1', 2, 1))
+        self.assertEqual(list(sessionizer.open_sessions), ['u2'])
+
+    def test_out_of_order_events_within_lateness(self):
+        rng = np.random.default_rng(5)
+        # Displace every event by up to 10 minutes of arrival delay
+        delays = rng.integers(0, 600, len(self.activities))
+        arrival = np.argsort(
+            pd.to_datetime([a['timestamp'] for a in self.activities]).as_unit('s').asi8 + delays, kind='stable'
+        )
+        shuffled = [self.activities[i] for i in arrival]
+        sessionizer = StreamingSessionizer(self.processor.session_timeout, allowed_lateness=timedelta(minutes=10))
+        sessions = list(sessionizer.stream(shuffled, chunk_size=50))
+        self.assertEqual(sessionizer.late_events, 0)
+        self.assertEqual(session_keys(sessions), self.expected)
+
+    def test_events_behind_the_watermark_are_dropped(self):
+        sessionizer = StreamingSessionizer(timedelta(minutes=30), allowed_lateness=timedelta(minutes=5))
+        start = pd.Timestamp('2024-01-01')
+        sessionizer.process([
+            {'user_id': 'u1', 'timestamp': start + pd.Timedelta(hours=1), 'action_type': 'page_view'},
+            {'user_id': 'u1', 'timestamp': start + pd.Timedelta(minutes=57), 'action_type': 'page_view'},
+            {'user_id': 'u1', 'timestamp': start, 'action_type': 'page_view'}
+        ])
+        self.assertEqual(sessionizer.late_events, 1)
+        self.assertEqual(sessionizer.watermark, start + pd.Timedelta(minutes=55))
+        (session,) = sessionizer.flush()
+        self.assertEqual((session['num_actions'], session['start_time']), (2, start + pd.Timedelta(minutes=57)))
+
+    def test_open_state_stays_bounded(self):
+        sessionizer = StreamingSessionizer(timedelta(minutes=30))
+        start = pd.Timestamp('2024-01-01')
+        largest = 0
+        for minute in range(0, 20000, 7):
+            sessionizer.process([{'user_id': f'u{minute % 50}', 'timestamp': start + pd.Timedelta(minutes=minute)}])
+            largest = max(largest, len(sessionizer._deadlines), len(sessionizer.open_sessions))
+        self.assertLessEqual(largest, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
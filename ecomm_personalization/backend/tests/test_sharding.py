@@ -0,0 +1,133 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.recommendation_engine import RecommendationEngine
+from services.sharding import (
+    ShardedModelHolder,
+    build_shard_artifacts,
+    partition_profiles,
+    shard_for
+)
+
+
+PRODUCTS = [{'id': f'p{i}', 'popularity': i / 20} for i in range(20)]
+PROFILES = [
+    {
+        'user_id': f'u{u}',
+        'total_sessions': u % 7 + 1,
+        'total_page_views': 3 * u,
+        'products_viewed': [f'p{(u + k) % 20}' for k in range(4)]
+    }
+    for u in range(40)
+]
+ENGINE_KWARGS = {'mf_top_k': 5}
+
+
+class TestPartitioning(unittest.TestCase):
+    def test_assignment_is_stable_and_covers_every_user(self):
+        self.assertEqual(shard_for('u1', 4), shard_for('u1', 4))
+        # crc32, not the per-process randomized hash()
+        self.assertEqual(shard_for('u1', 1000), 1112514422 % 1000)
+        shards = partition_profiles(PROFILES, 3)
+        self.assertEqual(sorted(p['user_id'] for s in shards for p in s), sorted(p['user_id'] for p in PROFILES))
+        for shard, profiles in enumerate(shards):
+            self.assertTrue(all(shard_for(p['user_id'], 3) == shard for p in profiles))
+
+
+class TestShardedModelHolder(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.holder = ShardedModelHolder(2, PROFILES, PRODUCTS, engine_kwargs=ENGINE_KWARGS)
+        cls.local = []
+        for profiles in partition_profiles(PROFILES, 2):
+            engine = RecommendationEngine(**ENGINE_KWARGS)
+            engine.train(profiles, PRODUCTS)
+            cls.local.append(engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.holder.close()
+
+    def test_each_worker_holds_only_its_users(self):
+        described = self.holder.describe()
+        for shard, stats in enumerate(described):
+            self.assertEqual(stats['users'], len(partition_profiles(PROFILES, 2)[shard]))
+        self.assertEqual(sum(stats['users'] for stats in described), len(PROFILES))
+
+    def test_requests_are_answered_by_the_owning_shard(self):
+        for user_id in ['u0', 'u5', 'u17', 'u33']:
+            engine = self.local[shard_for(user_id, 2)]
+            for strategy in [None, 'matrix_factorization']:
+                self.assertEqual(
+                    self.holder.current.get_recommendations(user_id, n_recommendations=4, strategy=strategy),
+                    engine.get_recommendations(user_id, n_recommendations=4, strategy=strategy)
+                )
+
+    def test_batch_matches_single_requests(self):
+        user_ids = ['u3', 'u8', None, 'u21', 'stranger', 'u3']
+        batch = self.holder.get_recommendations_batch(user_ids, n=3)
+        self.assertEqual(batch, [self.holder.get_recommendations(u, n_recommendations=3) for u in user_ids])
+
+    def test_interactions_reach_the_owning_shard(self):
+        shard = shard_for('newcomer', 2)
+        before = self.holder.describe()[shard]['mf_users']
+        self.assertTrue(self.holder.record_interaction('newcomer', 'p2'))
+        self.assertEqual(self.holder.describe()[shard]['mf_users'], before + 1)
+        result = self.holder.get_recommendations('newcomer', strategy='matrix_factorization')
+        self.assertEqual(result['served_by'], 'matrix_factorization')
+
+    def test_worker_errors_are_raised_in_the_caller(self):
+        with self.assertRaises(ValueError):
+            self.holder._call(0, 'no_such_command')
+
+
+class TestEmptyShards(unittest.TestCase):
+    def test_shards_without_users_serve_the_catalog(self):
+        # u0 and u2 land on shard 0, u1 and u3 on shard 2; shards 1 and 3 get no users
+        profiles = [p for p in PROFILES if p['user_id'] in ('u0', 'u1', 'u2', 'u3')]
+        self.assertEqual([len(s) for s in partition_profiles(profiles, 4)], [2, 0, 2, 0])
+        holder = ShardedModelHolder(4, profiles, PRODUCTS, engine_kwargs=ENGINE_KWARGS)
+        try:
+            anonymous = [holder.get_recommendations(n_recommendations=3) for _ in range(4)]
+        finally:
+            holder.close()
+        self.assertEqual([len(r['recommended_products']) for r in anonymous], [3, 3, 3, 3])
+        self.assertTrue(all(r == anonymous[0] for r in anonymous))
+
+    def test_artifacts_of_empty_shards_keep_the_catalog(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            build_shard_artifacts(PROFILES[:4], PRODUCTS, 4, tmp, **ENGINE_KWARGS)
+            holder = ShardedModelHolder(4, artifact_dir=tmp)
+            try:
+                counts = [len(holder.get_recommendations(n_recommendations=3)['recommended_products'])
+                          for _ in range(4)]
+            finally:
+                holder.close()
+        self.assertEqual(counts, [3, 3, 3, 3])
+
+
+class TestShardArtifacts(unittest.TestCase):
+    def test_workers_load_their_shard_artifact(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            build_shard_artifacts(PROFILES, PRODUCTS, 2, tmp, **ENGINE_KWARGS)
+            holder = ShardedModelHolder(2, artifact_dir=tmp)
+            try:
+                expected = RecommendationEngine(**ENGINE_KWARGS)
+                expected.train(partition_profiles(PROFILES, 2)[shard_for('u9', 2)], PRODUCTS)
+                self.assertEqual(
+                    holder.get_recommendations('u9', n_recommendations=4, strategy='matrix_factorization'),
+                    expected.get_recommendations('u9', n_recommendations=4, strategy='matrix_factorization')
+                )
+                holder.reload(tmp, background=False)
+                self.assertEqual(holder.version, 2)
+            finally:
+                holder.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.data_processor import DataProcessor
+from services.vocabulary import Vocabulary
+from test_session_processing import make_activities
+
+
+class TestVocabulary(unittest.TestCase):
+    def test_codes_stay_stable_as_values_are_added(self):
+        vocabulary = Vocabulary()
+        first = vocabulary.encode('device_type', pd.Series(['mobile', 'desktop', None, 'mobile']))
+        self.assertEqual(first.cat.codes.tolist(), [1, 0, -1, 1])
+        second = vocabulary.encode('device_type', pd.Series(['tablet', 'mobile', 'app']))
+        self.assertEqual(list(second.cat.categories), ['desktop', 'mobile', 'app', 'tablet'])
+        self.assertEqual(second.cat.codes.tolist(), [3, 1, 2])
+        # Already categorical input is recoded onto the shared vocabulary
+        third = vocabulary.encode('device_type', pd.Series(['app', 'desktop'], dtype='category'))
+        self.assertEqual(third.cat.codes.tolist(), [2, 0])
+
+    def test_save_and_load_keep_codes(self):
+        vocabulary = Vocabulary()
+        vocabulary.encode('action_type', ['search', 'purchase'])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = vocabulary.save(os.path.join(tmp, 'vocabulary.json'))
+            loaded = Vocabulary.load(path)
+        encoded = loaded.encode('action_type', ['purchase', 'page_view', 'search'])
+        self.assertEqual(encoded.cat.codes.tolist(), [0, 2, 1])
+
+    def test_processor_encodes_activity_columns(self):
+        processor = DataProcessor()
+        sessions = processor.process_user_activity(make_activities())
+        for column in DataProcessor.CATEGORICAL_COLUMNS:
+            self.assertIsInstance(sessions[column].dtype, pd.CategoricalDtype)
+            self.assertEqual(sessions[column].dtype, processor.vocabulary.dtype(column))
+        later = processor.process_user_activity(make_activities(seed=3))
+        self.assertTrue(np.array_equal(
+            later['action_type'].cat.categories, sessions['action_type'].cat.categories
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()